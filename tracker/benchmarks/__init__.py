@@ -0,0 +1,3 @@
+""" Бенчмарки проекта. Запускаются из папки tracker/, например:
+        python -m benchmarks.habitlog_indexes --logs 2000000
+    Каждый скрипт работает с отдельной SQLite-базой и не трогает db.sqlite3 """
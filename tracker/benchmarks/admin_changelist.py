@@ -0,0 +1,83 @@
+""" Время открытия списка логов в админке на большой базе.
+
+    python -m benchmarks.admin_changelist --logs 5000000 --db /tmp/logs.sqlite3
+    python -m benchmarks.admin_changelist --db /tmp/logs.sqlite3 --compare
+
+    База заполняется так же, как в benchmarks.habitlog_indexes, и её можно
+    переиспользовать. --compare дополнительно меряет HabitLogAdmin со штатными
+    настройками: точный COUNT(*), DISTINCT в date_hierarchy, без habit__user """
+import argparse
+
+from benchmarks.common import setup_django, report
+from benchmarks.habitlog_indexes import seed
+
+
+PAGES = {
+    'Первая страница': {},
+    'Год в date_hierarchy': {'date__year': None},
+    'Месяц в date_hierarchy': {'date__year': None, 'date__month': None},
+    'Фильтр is_done': {'is_done__exact': '1'},
+    'Страница 50': {'p': '50'},
+}
+
+
+def plain_admin(model_admin):
+    """ Возвращает HabitLogAdmin к штатному поведению Django """
+    from django.core.paginator import Paginator
+
+    model_admin.paginator = Paginator
+    model_admin.show_full_result_count = True
+    model_admin.list_select_related = ('habit',)
+    model_admin.change_list_template = 'admin/change_list.html'
+
+
+def measure_pages(title, client, url, today, repeat):
+    print(f'\n=== {title} ===')
+    for name, params in PAGES.items():
+        params = {
+            key: value or (today.year if key == 'date__year' else today.month)
+            for key, value in params.items()
+        }
+
+        def open_page():
+            response = client.get(url, params)
+            assert response.status_code == 200, response.status_code
+
+        report(name, open_page, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='путь к SQLite-базе (переиспользуется между запусками)')
+    parser.add_argument('--logs', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', action='store_true', help='замерить и штатную админку')
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    print(f'База: {db_path}')
+    seed(args.logs)
+
+    from datetime import date
+    from django.conf import settings
+    from django.contrib import admin
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.urls import reverse
+    from main.models import HabitLog
+
+    settings.ALLOWED_HOSTS = ['*']
+    user, _ = User.objects.get_or_create(username='bench-admin', defaults={'is_staff': True, 'is_superuser': True})
+    client = Client()
+    client.force_login(user)
+    url = reverse('admin:main_habitlog_changelist')
+    today = date.today()
+
+    measure_pages('HabitLogAdmin', client, url, today, args.repeat)
+    if args.compare:
+        plain_admin(admin.site._registry[HabitLog])
+        measure_pages('Штатная админка', client, url, today, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+""" Синхронизация клиента: HTML-страницы против JSON API.
+
+    python -m benchmarks.api --tasks 1000 --habits 30
+
+    Клиент забирает все задачи и привычки пользователя: обходом HTML-списков
+    по ссылкам «Вперед» (так делает скрейпер) или через /api/tasks/ и
+    /api/habits/. Кэш очищается перед каждым проходом — данные «изменились».
+    Колонка «API ?fields=» — только поля, которые видны в HTML-списке.
+    Отдельно — повторный запрос API с If-None-Match, когда данных не меняли """
+import argparse
+import re
+
+from benchmarks.common import setup_django, report
+
+
+PREFIX = 'apibench'
+# поля, которые показывают карточки HTML-списков
+LIST_FIELDS = {
+    'задачи': 'slug,title,status,priority,deadline',
+    'привычки': 'slug,title,frequency,is_active',
+}
+NEXT_LINK = re.compile(r'href="\?([^"]*cursor=[^"]*)"[^>]*>Вперед')
+
+
+def walk_html(client, url):
+    """ Байт ответов при обходе всех страниц списка """
+    size, query = 0, ''
+    while query is not None:
+        response = client.get(f'{url}?{query}')
+        assert response.status_code == 200, response.status_code
+        size += len(response.content)
+        match = NEXT_LINK.search(response.content.decode())
+        query = match.group(1).replace('&amp;', '&') if match else None
+    return size
+
+
+def walk_api(client, url, params=None):
+    size, params = 0, {'limit': 500, **(params or {})}
+    while True:
+        response = client.get(url, params)
+        assert response.status_code == 200, response.status_code
+        size += len(response.content)
+        cursor = response.json()['next']
+        if not cursor:
+            return size
+        params['cursor'] = cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='база для замера (по умолчанию временный файл)')
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--habits', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    print(f'База: {db_path}')
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+    from main.seeding import seed_users
+
+    settings.ALLOWED_HOSTS = ['*']
+    user = User.objects.filter(username=f'{PREFIX}0').first()
+    if user is None:
+        seed_users(1, args.tasks, args.habits, 1, prefix=PREFIX, seed=1)
+        user = User.objects.get(username=f'{PREFIX}0')
+    client = Client()
+    client.force_login(user)
+
+    cases = {
+        'задачи': (reverse('task'), reverse('api_tasks')),
+        'привычки': (reverse('habit'), reverse('api_habits')),
+    }
+    print(f'\n{"":<12}{"HTML, КБ":>12}{"API, КБ":>12}{"API ?fields=, КБ":>20}')
+    for name, (html_url, api_url) in cases.items():
+        cache.clear()
+        sizes = (
+            walk_html(client, html_url),
+            walk_api(client, api_url),
+            walk_api(client, api_url, {'fields': LIST_FIELDS[name]}),
+        )
+        print(f'{name:<12}{sizes[0] / 1024:12.1f}{sizes[1] / 1024:12.1f}{sizes[2] / 1024:20.1f}')
+
+    print()
+    for name, (html_url, api_url) in cases.items():
+        report(f'{name}: обход HTML-страниц', lambda: (cache.clear(), walk_html(client, html_url)), args.repeat)
+        report(f'{name}: API', lambda: (cache.clear(), walk_api(client, api_url)), args.repeat)
+        report(f'{name}: API ?fields=', lambda: (cache.clear(), walk_api(
+            client, api_url, {'fields': LIST_FIELDS[name]})), args.repeat)
+
+    etag = client.get(reverse('api_tasks'), {'limit': 500})['ETag']
+    report('задачи: API, 304 по If-None-Match', lambda: client.get(
+        reverse('api_tasks'), {'limit': 500}, HTTP_IF_NONE_MATCH=etag), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
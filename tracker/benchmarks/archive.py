@@ -0,0 +1,80 @@
+""" Архив старых логов: размер горячей таблицы до и после, время прогона
+    archive_habit_logs и чтение истории из архива.
+
+    python -m benchmarks.archive --logs 2000000 --db /tmp/archive.sqlite3
+
+    База заполняется как в benchmarks.habitlog_indexes (1000 дней истории на
+    привычку) и архивируется на месте: для повторного замера нужна новая база """
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import setup_django, report
+from benchmarks.habitlog_indexes import seed
+
+
+def table_sizes():
+    """ {таблица или индекс: байт} из виртуальной таблицы dbstat """
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat "
+            "WHERE name LIKE 'main_habitlog%%' OR name LIKE 'habitlog_%%' "
+            "OR name LIKE 'main_habityearbitmap%%' OR name LIKE 'unique_habit%%' "
+            "OR name LIKE 'sqlite_autoindex_main_habit%%' GROUP BY name ORDER BY name"
+        )
+        return dict(cursor.fetchall())
+
+
+def print_sizes(title):
+    print(f'\n{title}:')
+    for name, size in table_sizes().items():
+        print(f'  {name:<45} {size / 1024 / 1024:9.1f} МБ')
+
+
+def measure_readers(title, repeat):
+    from main.heatmap import build_heatmap
+    from main.models import Habit
+    from main.streaks import get_habit_stats
+
+    habits = list(Habit.objects.order_by('?')[:200])
+    today = date.today()
+    print(f'\n{title}:')
+    report('  тепловая карта за 3 года', lambda: build_heatmap(
+        random.choice(habits), today - timedelta(days=3 * 365), today
+    ), repeat)
+    report('  серии привычки за всю историю', lambda: get_habit_stats([random.choice(habits)], today=today), repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='путь к SQLite-базе')
+    parser.add_argument('--logs', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    print(f'База: {db_path}')
+    seed(args.logs)
+
+    from django.db import connection
+    from main.bitmaps import archive_cutoff, run
+
+    print_sizes('До архивации')
+    measure_readers('Чтение до архивации', args.repeat)
+
+    started = time.perf_counter()
+    users, logs = run(archive_cutoff(date.today()), restart=True)
+    print(f'\nВ архив: {logs} логов {users} пользователей за {time.perf_counter() - started:.1f} с')
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+        cursor.execute('ANALYZE')
+
+    print_sizes('После архивации и VACUUM')
+    measure_readers('Чтение после архивации', args.repeat)
+
+
+if __name__ == '__main__':
+    main()
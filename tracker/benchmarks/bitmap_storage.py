@@ -0,0 +1,116 @@
+""" Строка на день против битовых масок по годам: размер на диске, память
+    при чтении истории и время типичных операций.
+
+    python -m benchmarks.bitmap_storage --habits 2000 --days 1095
+
+    Одни и те же истории записываются дважды: у половины привычек строками
+    HabitLog, у другой половины — в HabitYearBitmap (storage_mode='bitmap').
+    Каждый запуск создаёт новую временную базу """
+import argparse
+import random
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks.common import setup_django, report
+from benchmarks.archive import table_sizes
+
+
+def seed(habits_count, days, seed_value=42):
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from main.bitmaps import HabitBitmap
+    from main.models import Habit
+
+    rnd = random.Random(seed_value)
+    start = date.today() - timedelta(days=days - 1)
+    with transaction.atomic():
+        user = User.objects.create(username='bitmap-bench', password='!')
+        habits = Habit.objects.bulk_create(
+            Habit(
+                title=f'Привычка {i}', slug=f'habit-{i}', user=user, start_date=start,
+                storage_mode='bitmap' if i % 2 else 'rows',
+            )
+            for i in range(habits_count * 2)
+        )
+        histories = []
+        with connection.cursor() as cursor:
+            for habit in habits:
+                marks = [(start + timedelta(days=d), rnd.random() < 0.8) for d in range(days)]
+                if habit.storage_mode == 'rows':
+                    cursor.executemany(
+                        'INSERT INTO main_habitlog (habit_id, date, is_done) VALUES (%s, %s, %s)',
+                        [(habit.pk, day, is_done) for day, is_done in marks]
+                    )
+                    continue
+                history = HabitBitmap(habit.pk)
+                for day, is_done in marks:
+                    history.set_day(day, is_done)
+                histories.append(history)
+        HabitBitmap.save_many(histories)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return [habit for habit in habits if habit.storage_mode == 'rows'], [habit for habit in habits if habit.storage_mode == 'bitmap']
+
+
+def peak_memory(func):
+    """ Пик памяти Python (КБ) за вызов func """
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--habits', type=int, default=1000, help='привычек в каждом режиме')
+    parser.add_argument('--days', type=int, default=365 * 3)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / 'bitmap_storage.sqlite3'
+    setup_django(db_path)
+    print(f'База: {db_path}')
+    rows_habits, bitmap_habits = seed(args.habits, args.days)
+
+    from main.bitmaps import HabitBitmap
+    from main.models import HabitLog
+
+    sizes = table_sizes()
+    rows_size = sum(size for name, size in sizes.items() if 'habitlog' in name)
+    bitmap_size = sum(size for name, size in sizes.items() if 'habityearbitmap' in name)
+    print(f'\nНа диске ({args.habits} привычек x {args.days} дней):')
+    print(f'  HabitLog с индексами        {rows_size / 1024 / 1024:9.1f} МБ  ({rows_size / args.habits:9.0f} байт на привычку)')
+    print(f'  HabitYearBitmap с индексами {bitmap_size / 1024 / 1024:9.1f} МБ  ({bitmap_size / args.habits:9.0f} байт на привычку)')
+
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    rows_habit, bitmap_habit = rows_habits[0], bitmap_habits[0]
+
+    print('\nПамять на чтение всей истории одной привычки:')
+    print(f'  объекты HabitLog            {peak_memory(lambda: list(HabitLog.objects.filter(habit=rows_habit))):9.1f} КБ')
+    print(f'  values_list (date, is_done) {peak_memory(lambda: list(HabitLog.objects.filter(habit=rows_habit).values_list("date", "is_done"))):9.1f} КБ')
+    print(f'  HabitBitmap                 {peak_memory(lambda: HabitBitmap.load(bitmap_habit.pk)):9.1f} КБ')
+
+    def pick(habits):
+        return random.choice(habits).pk
+
+    print('\nОперации:')
+    report('  отмечен ли день: строка', lambda: HabitLog.objects.filter(
+        habit_id=pick(rows_habits), date=today, is_done=True).exists(), args.repeat)
+    report('  отмечен ли день: маска', lambda: HabitBitmap.load(
+        pick(bitmap_habits), today, today).test_day(today), args.repeat)
+    report('  отметки за 30 дней: строки', lambda: HabitLog.objects.filter(
+        habit_id=pick(rows_habits), date__gte=month_ago).values_list('date', 'is_done')[:31].count(), args.repeat)
+    report('  отметки за 30 дней: маска', lambda: HabitBitmap.load(
+        pick(bitmap_habits), month_ago, today).count(month_ago, today), args.repeat)
+    report('  серия до сегодня: строки', lambda: len(list(HabitLog.objects.filter(
+        habit_id=pick(rows_habits), is_done=True).values_list('date', flat=True))), args.repeat)
+    report('  серия до сегодня: маска', lambda: HabitBitmap.load(pick(bitmap_habits)).streak(today), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import django
+
+
+TRACKER_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path=None):
+    """ Настраивает Django на отдельную базу и применяет миграции.
+        Возвращает путь к базе """
+    if str(TRACKER_DIR) not in sys.path:
+        sys.path.insert(0, str(TRACKER_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tracker.settings')
+
+    if db_path is None:
+        db_path = Path(tempfile.gettempdir()) / 'tracker_bench.sqlite3'
+
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = str(db_path)
+    # В DEBUG Django копит все запросы в connection.queries
+    settings.DEBUG = False
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def measure(func, repeat=20):
+    """ Запускает func repeat раз, возвращает (медиана, p95) в миллисекундах """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings), p95
+
+
+def report(name, func, repeat=20):
+    median, p95 = measure(func, repeat)
+    print(f'{name:<45} median {median:9.3f} ms   p95 {p95:9.3f} ms')
@@ -0,0 +1,124 @@
+""" Планы запросов и время горячих запросов к HabitLog на большой базе.
+
+    python -m benchmarks.habitlog_indexes --logs 2000000
+    python -m benchmarks.habitlog_indexes --db /tmp/logs.sqlite3 --compare
+
+    --compare дополнительно прогоняет те же запросы без составного индекса
+    и уникального ограничения (habit, date): откатывает миграцию 0003,
+    после замеров накатывает её обратно """
+import argparse
+import random
+import textwrap
+from datetime import date, timedelta
+
+from benchmarks.common import setup_django, report
+
+
+HABITS_PER_USER = 10
+
+
+def seed(logs_count, seed_value=42):
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from main.models import Habit, HabitLog
+
+    if HabitLog.objects.exists():
+        print(f'База уже заполнена: {HabitLog.objects.count()} логов')
+        return
+
+    rnd = random.Random(seed_value)
+    days = 1000
+    habits_count = max(1, logs_count // days)
+    users_count = max(1, habits_count // HABITS_PER_USER)
+    start = date.today() - timedelta(days=days - 1)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            User(username=f'bench{i}', password='!') for i in range(users_count)
+        )
+        habits = Habit.objects.bulk_create(
+            Habit(title=f'Привычка {i}', slug=f'habit-{i}', user=users[i % users_count], start_date=start)
+            for i in range(habits_count)
+        )
+        # Логи вставляем напрямую: ORM-объекты на миллионы строк слишком дороги
+        with connection.cursor() as cursor:
+            for habit in habits:
+                cursor.executemany(
+                    'INSERT INTO main_habitlog (habit_id, date, is_done) VALUES (%s, %s, %s)',
+                    [(habit.pk, start + timedelta(days=d), rnd.random() < 0.8) for d in range(days)]
+                )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f'Создано: {users_count} пользователей, {habits_count} привычек, {habits_count * days} логов')
+
+
+def run_queries(title):
+    from django.db.models import Count, Q
+    from main.models import Habit, HabitLog
+
+    print(f'\n=== {title} ===')
+    habit_ids = list(Habit.objects.values_list('pk', 'user_id'))
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    week_ago = today - timedelta(days=7)
+
+    def pick():
+        return random.choice(habit_ids)
+
+    queries = {
+        'Логи привычки за 30 дней (детальная)': lambda: HabitLog.objects.filter(
+            habit_id=pick()[0], date__gte=month_ago).order_by('date'),
+        'Отмечена ли сегодня (exists)': lambda: HabitLog.objects.filter(
+            habit_id=pick()[0], date=today, is_done=True),
+        'Поиск лога (habit, date) для get_or_create': lambda: HabitLog.objects.filter(
+            habit_id=pick()[0], date=today),
+        'Логи пользователя за неделю': lambda: HabitLog.objects.filter(
+            habit__user_id=pick()[1], date__gte=week_ago),
+    }
+
+    for name, build in queries.items():
+        print(f'\n{name}:\n{textwrap.indent(build().explain(), "  ")}')
+
+    print()
+    report('Агрегат за 30 дней', lambda: HabitLog.objects.filter(
+        habit_id=pick()[0], date__gte=month_ago
+    ).aggregate(total=Count('pk'), done=Count('pk', filter=Q(is_done=True))), repeat=200)
+    report('Отмечена ли сегодня', lambda: queries['Отмечена ли сегодня (exists)']().exists(), repeat=200)
+    report('Поиск (habit, date)', lambda: queries['Поиск лога (habit, date) для get_or_create']().first(), repeat=200)
+    report('Агрегат пользователя за неделю', lambda: queries['Логи пользователя за неделю']().aggregate(
+        total=Count('pk'), done=Count('pk', filter=Q(is_done=True))), repeat=200)
+
+
+def compare_without_indexes():
+    from django.core.management import call_command
+    from django.db import connection
+
+    # Откатываем миграцию с индексом и ограничением, меряем и накатываем обратно
+    call_command('migrate', 'main', '0002', verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    try:
+        run_queries('Без составного индекса и уникального ограничения')
+    finally:
+        call_command('migrate', verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', help='путь к SQLite-базе (переиспользуется между запусками)')
+    parser.add_argument('--logs', type=int, default=2_000_000, help='сколько логов создать')
+    parser.add_argument('--compare', action='store_true', help='сравнить с базой без новых индексов')
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    print(f'База: {db_path}')
+    seed(args.logs)
+    run_queries('С индексом (habit, date, is_done)')
+    if args.compare:
+        compare_without_indexes()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+""" Нагрузочный тест: пропускная способность и задержки WSGI против ASGI.
+
+    Серверы запускаются отдельно на одной машине и одной базе, например:
+
+        gunicorn tracker.wsgi -w 1 --threads 16 -b 127.0.0.1:8000
+        TRACKER_ASYNC_VIEWS=1 uvicorn tracker.asgi:application --port 8001
+
+    python -m benchmarks.load_test --target wsgi=http://127.0.0.1:8000 \\
+                                   --target asgi=http://127.0.0.1:8001 \\
+                                   --concurrency 32 --requests 2000
+
+    Пользователь loadtest с задачами и привычками создаётся в базе --db
+    (по умолчанию tracker/db.sqlite3 — та же, что у серверов), сессия
+    берётся прямо из базы, без формы входа """
+import argparse
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.common import TRACKER_DIR, setup_django
+
+
+USERNAME = 'loadtest'
+
+
+def prepare_user(tasks_count, habits_count, days):
+    """ Пользователь с данными и cookie его сессии """
+    from django.contrib.auth.models import User
+    from django.conf import settings
+    from django.test import Client
+    from main.models import Task, Habit, HabitLog
+    from main.rollups import rebuild_daily_stats
+
+    user, created = User.objects.get_or_create(username=USERNAME)
+    if created:
+        today = date.today()
+        for i in range(tasks_count):
+            Task.objects.create(title=f'Load task {i}', user=user, deadline=today + timedelta(days=i % 30))
+        habits = [
+            Habit.objects.create(title=f'Load habit {i}', user=user, start_date=today - timedelta(days=days))
+            for i in range(habits_count)
+        ]
+        HabitLog.objects.bulk_create(
+            HabitLog(habit=habit, date=today - timedelta(days=d), is_done=d % 3 != 0)
+            for habit in habits for d in range(days)
+        )
+        rebuild_daily_stats(user_ids=[user.pk])
+
+    client = Client()
+    client.force_login(user)
+    slug = Habit.objects.filter(user=user).values_list('slug', flat=True).first()
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}', slug
+
+
+def fetch(url, cookie):
+    request = urllib.request.Request(url, headers={'Cookie': cookie})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except OSError:
+        ok = False
+    return (time.perf_counter() - started) * 1000, ok
+
+
+def run(base_url, paths, cookie, concurrency, requests_count):
+    urls = [base_url.rstrip('/') + paths[i % len(paths)] for i in range(requests_count)]
+    # прогрев: соединения с базой, кэш шаблонов и данных
+    for path in paths:
+        fetch(base_url.rstrip('/') + path, cookie)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda url: fetch(url, cookie), urls))
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(timing for timing, _ in results)
+    errors = sum(not ok for _, ok in results)
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+    return {
+        'rps': requests_count / elapsed,
+        'p50': statistics.median(timings),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', metavar='NAME=URL',
+                        help='сервер для замера, можно несколько раз')
+    parser.add_argument('--db', default=str(TRACKER_DIR / 'db.sqlite3'), help='база, с которой работают серверы')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--habits', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    targets = [target.split('=', 1) for target in (args.target or [
+        'wsgi=http://127.0.0.1:8000', 'asgi=http://127.0.0.1:8001'
+    ])]
+
+    setup_django(args.db)
+    cookie, slug = prepare_user(args.tasks, args.habits, args.days)
+    paths = ['/', '/tasks/', '/tasks/?sort=deadline', f'/habits/{urllib.request.quote(slug)}/']
+
+    print(f'{args.requests} запросов, {args.concurrency} потоков, страницы: {", ".join(paths)}')
+    for name, url in targets:
+        result = run(url, paths, cookie, args.concurrency, args.requests)
+        print(
+            f'{name:<6} {url:<28} {result["rps"]:8.1f} req/s   '
+            f'p50 {result["p50"]:8.1f} ms   p95 {result["p95"]:8.1f} ms   '
+            f'p99 {result["p99"]:8.1f} ms   ошибок {result["errors"]}'
+        )
+
+
+if __name__ == '__main__':
+    main()
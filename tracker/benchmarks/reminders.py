@@ -0,0 +1,105 @@
+""" Обход напоминаний о дедлайнах на большой таблице задач.
+
+    python -m benchmarks.reminders --tasks 10000000 --db /tmp/reminders.sqlite3
+
+    Задачи вставляются напрямую: дедлайны на два года назад и вперёд, часть
+    сделана, о прошедших дедлайнах уже напомнили — как в рабочей базе после
+    миграции. Меряется обход за один день (новые «скоро дедлайн» и «просрочено»)
+    и время самой долгой пачки; база переиспользуется между запусками """
+import argparse
+import random
+import tempfile
+import textwrap
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks.common import setup_django
+
+
+USERS = 10000
+DAYS = 730
+
+
+def seed(tasks_count, seed_value=42):
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from main.models import Task
+
+    if Task.objects.exists():
+        print(f'База уже заполнена: {Task.objects.count()} задач')
+        return
+
+    rnd = random.Random(seed_value)
+    today = date.today()
+    statuses = ('todo', 'in_progress', 'done', 'done', 'done')
+    users_count = min(USERS, max(1, tasks_count // 100))
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            User(username=f'remind{i}', password='!') for i in range(users_count)
+        )
+        user_ids = [user.pk for user in users]
+        with connection.cursor() as cursor:
+            chunk = 100_000
+            for offset in range(0, tasks_count, chunk):
+                rows = []
+                for i in range(offset, min(offset + chunk, tasks_count)):
+                    deadline = today + timedelta(days=rnd.randint(-DAYS, DAYS))
+                    status = rnd.choice(statuses)
+                    stage = Task.REMINDER_OVERDUE if deadline < today and status != 'done' else Task.REMINDER_NONE
+                    rows.append((f'Задача {i}', '', status, 1, deadline, today, f'task-{i}', rnd.choice(user_ids), stage))
+                cursor.executemany(
+                    'INSERT INTO main_task (title, description, status, priority, deadline, created_at, slug, user_id, reminder_stage) '
+                    'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)', rows
+                )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f'Создано задач: {tasks_count} у {users_count} пользователей')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='путь к SQLite-базе (переиспользуется между запусками)')
+    parser.add_argument('--tasks', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=3, help='сколько дней подряд прогнать обход')
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    print(f'База: {db_path}')
+    seed(args.tasks)
+
+    from django.db import transaction
+    from main.models import Task
+    from main.notifications import deliver_pending, FileBackend
+    from main.reminders import due_batch, sweep, sweep_segments
+
+    today = date.today()
+    status, stage, until = sweep_segments(today, 1)[0]
+    print(textwrap.indent(
+        Task.objects.filter(status=status, reminder_stage=stage, deadline__lte=until)
+        .order_by('deadline', 'pk')[:args.batch_size].explain(), '  '
+    ))
+
+    outbox = Path(tempfile.gettempdir()) / 'reminders_bench.log'
+    for day in range(args.days):
+        current = today + timedelta(days=day)
+        # Каждый день в откатываемой транзакции: база остаётся в исходном виде
+        with transaction.atomic():
+            started = time.perf_counter()
+            result = sweep(current, batch_size=args.batch_size)
+            swept = time.perf_counter() - started
+            started = time.perf_counter()
+            sent, _ = deliver_pending(FileBackend(outbox))
+            delivered = time.perf_counter() - started
+            transaction.set_rollback(True)
+        print(
+            f'{current}: просмотрено {result["scanned"]} за {result["batches"]} пачек, '
+            f'{swept * 1000:.0f} мс (самая долгая пачка {result["max_batch_ms"]:.1f} мс); '
+            f'напоминаний {result["due"]} + {result["overdue"]}, доставка {sent} за {delivered * 1000:.0f} мс'
+        )
+
+
+if __name__ == '__main__':
+    main()
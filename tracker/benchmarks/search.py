@@ -0,0 +1,90 @@
+""" Поиск по задачам: FTS5 (и запасной инвертированный индекс) против icontains.
+
+    python -m benchmarks.search --tasks 1000000 --users 10
+    python -m benchmarks.search --db /tmp/search.sqlite3 --inverted
+
+    База заполняется один раз; повторный запуск с тем же --db сразу меряет """
+import argparse
+import random
+from datetime import date
+
+from benchmarks.common import setup_django, report
+
+
+WORDS = (
+    'отчёт план встреча звонок письмо бюджет проект задача релиз тест ревью '
+    'документ договор счёт оплата клиент дизайн макет сервер база миграция '
+    'спринт демо презентация аналитика метрика отпуск покупка ремонт врач спорт'
+).split()
+
+
+def seed(tasks_count, users_count, inverted, seed_value=42):
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from main.models import Task
+    from main.search import FTSBackend, InvertedIndexBackend
+
+    if Task.objects.exists():
+        print(f'База уже заполнена: {Task.objects.count()} задач')
+        return
+
+    rnd = random.Random(seed_value)
+    users = User.objects.bulk_create(User(username=f'search{i}', password='!') for i in range(users_count))
+    backend = InvertedIndexBackend() if inverted else FTSBackend()
+    batch_size = 10000
+
+    for offset in range(0, tasks_count, batch_size):
+        with transaction.atomic():
+            # bulk_create не шлёт сигналы, поэтому индексируем пачку сами
+            tasks = Task.objects.bulk_create(
+                Task(
+                    title=' '.join(rnd.choices(WORDS, k=3)),
+                    description=' '.join(rnd.choices(WORDS, k=12)),
+                    user=users[i % users_count],
+                    deadline=date.today(),
+                    slug=f'task-{i}',
+                )
+                for i in range(offset, min(offset + batch_size, tasks_count))
+            )
+            backend.index('task', tasks)
+    print(f'Создано задач: {tasks_count}, пользователей: {users_count}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', help='путь к SQLite-базе (переиспользуется между запусками)')
+    parser.add_argument('--tasks', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--inverted', action='store_true', help='мерить запасной инвертированный индекс')
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    print(f'База: {db_path}')
+    seed(args.tasks, args.users, args.inverted)
+
+    from unittest import mock
+    from django.db.models import Q
+    from main import search
+    from main.models import Task
+
+    backend = search.InvertedIndexBackend() if args.inverted else search.FTSBackend()
+    user_id = Task.objects.values_list('user_id', flat=True).first()
+
+    with mock.patch.object(search, 'get_backend', return_value=backend):
+        for query in ('отчёт', 'миграц', 'релиз ревью', 'несуществующее'):
+            print(f'\nЗапрос «{query}»:')
+            report('  icontains по названию (как было)', lambda: list(
+                Task.objects.filter(user_id=user_id, title__icontains=query)[:search.SEARCH_RESULT_LIMIT]
+            ), repeat=5)
+            report('  icontains по названию и описанию', lambda: list(
+                Task.objects.filter(user_id=user_id).filter(
+                    Q(title__icontains=query) | Q(description__icontains=query)
+                )[:search.SEARCH_RESULT_LIMIT]
+            ), repeat=5)
+            report(f'  {type(backend).__name__} (ранжированный, префиксный)', lambda: search.search_ids(
+                user_id, 'task', query
+            ), repeat=5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+""" Стресс-тест параллельных отметок «Выполнено» на SQLite.
+
+    Потоки одновременно отправляют HabitMarkDoneView (get_or_create лога и
+    пересчёт дневной статистики в одной транзакции) и читают список привычек.
+    Каждый профиль запускается в отдельном процессе на своей свежей базе:
+
+        default — настройки SQLite по умолчанию: журнал DELETE, отложенные
+                  транзакции, новое соединение на каждый запрос
+        tuned   — профиль из settings.py: WAL, busy_timeout, synchronous=NORMAL,
+                  mmap, BEGIN IMMEDIATE и постоянные соединения
+
+    python -m benchmarks.sqlite_concurrency --threads 16 --iterations 50 """
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks.common import TRACKER_DIR, setup_django
+
+
+PROFILES = ('default', 'tuned')
+
+
+def configure(profile):
+    """ Настройки профиля до первого соединения с базой """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tracker.settings')
+    from django.conf import settings
+
+    if profile == 'default':
+        settings.SQLITE_PRAGMAS = {}
+        settings.DATABASES['default']['OPTIONS'] = {}
+        settings.DATABASES['default']['CONN_MAX_AGE'] = 0
+    settings.ALLOWED_HOSTS = ['testserver']
+
+
+def prepare_users(threads, iterations):
+    """ По пользователю на поток, у каждого iterations привычек:
+        каждая отметка — новая запись, а не повтор get_or_create """
+    from django.contrib.auth.models import User
+    from main.models import Habit
+
+    today = date.today()
+    users = []
+    for i in range(threads):
+        user = User.objects.create(username=f'stress{i}')
+        Habit.objects.bulk_create(
+            Habit(title=f'Stress {j}', slug=f'stress-{j}', user=user, start_date=today - timedelta(days=30))
+            for j in range(iterations)
+        )
+        users.append(user)
+    return users
+
+
+def worker(user, iterations, results):
+    from django.db import connections, OperationalError
+    from django.test import Client
+    from django.urls import reverse
+
+    client = Client()
+    client.force_login(user)
+    timings, locked, failed = [], 0, 0
+    try:
+        for j in range(iterations):
+            started = time.perf_counter()
+            try:
+                response = client.post(reverse('habit_mark_done', kwargs={'slug': f'stress-{j}'}))
+                if response.status_code != 302:
+                    failed += 1
+                client.get(reverse('habit'))
+            except OperationalError as error:
+                if 'locked' in str(error):
+                    locked += 1
+                else:
+                    failed += 1
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        connections.close_all()
+    results.append((timings, locked, failed))
+
+
+def run_profile(profile, threads, iterations):
+    configure(profile)
+    db_path = Path(tempfile.mkdtemp()) / f'stress_{profile}.sqlite3'
+    setup_django(db_path)
+
+    from django.db import connections
+    from main.models import HabitLog
+
+    users = prepare_users(threads, iterations)
+    connections.close_all()
+
+    results = []
+    pool = [threading.Thread(target=worker, args=(user, iterations, results)) for user in users]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(timing for thread_timings, _, _ in results for timing in thread_timings)
+    locked = sum(locked for _, locked, _ in results)
+    failed = sum(failed for _, _, failed in results)
+    written = HabitLog.objects.count()
+    print(
+        f'{profile:<8} {len(timings) / elapsed:8.1f} итераций/с   '
+        f'p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:8.1f} мс   '
+        f'database is locked: {locked:<5} других ошибок: {failed:<5} '
+        f'логов записано {written} из {threads * iterations}'
+    )
+    return locked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', choices=PROFILES, help='запустить один профиль в этом процессе')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--iterations', type=int, default=50, help='отметок на поток')
+    args = parser.parse_args()
+
+    if args.profile:
+        locked = run_profile(args.profile, args.threads, args.iterations)
+        sys.exit(1 if locked and args.profile == 'tuned' else 0)
+
+    print(f'{args.threads} потоков по {args.iterations} отметок')
+    codes = [
+        subprocess.call(
+            [sys.executable, '-m', 'benchmarks.sqlite_concurrency', '--profile', profile,
+             '--threads', str(args.threads), '--iterations', str(args.iterations)],
+            cwd=TRACKER_DIR,
+        )
+        for profile in PROFILES
+    ]
+    sys.exit(max(codes))
+
+
+if __name__ == '__main__':
+    main()
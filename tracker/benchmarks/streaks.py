@@ -0,0 +1,72 @@
+""" Скорость движка серий на синтетической многолетней истории.
+
+    python -m benchmarks.streaks --habits 5000 --years 3
+
+    Сравнивает векторный compute_streaks с построчным подсчётом на Python
+    (так считалось бы без NumPy) и проверяет, что результаты совпадают """
+import argparse
+
+import numpy as np
+
+from benchmarks.common import setup_django, report
+
+
+def synthetic_history(habits, years, done_ratio, seed=42):
+    rnd = np.random.default_rng(seed)
+    days = 365 * years
+    today = 800_000
+    start_days = today - rnd.integers(30, days, size=habits)
+    periods = rnd.choice([1, 2, 7], size=habits)
+
+    log_habits = np.repeat(np.arange(habits), days)
+    log_days = np.tile(np.arange(today - days + 1, today + 1), habits)
+    keep = (rnd.random(len(log_days)) < done_ratio) & (log_days >= start_days[log_habits])
+    return start_days, periods, log_habits[keep], log_days[keep], today
+
+
+def python_streaks(start_days, periods, log_habits, log_days, today):
+    """ Построчный эталон: множество периодов на привычку и проход по ним """
+    buckets = [set() for _ in start_days]
+    for habit, day in zip(log_habits.tolist(), log_days.tolist()):
+        if start_days[habit] <= day <= today:
+            buckets[habit].add((day - start_days[habit]) // periods[habit])
+
+    result = []
+    for habit, done in enumerate(buckets):
+        current_bucket = (today - start_days[habit]) // periods[habit]
+        longest = run = 0
+        previous = None
+        for bucket in sorted(done):
+            run = run + 1 if previous is not None and bucket == previous + 1 else 1
+            longest = max(longest, run)
+            previous = bucket
+        current = run if previous is not None and previous >= current_bucket - 1 else 0
+        result.append((current, longest))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--habits', type=int, default=5000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--done-ratio', type=float, default=0.7)
+    args = parser.parse_args()
+
+    setup_django()
+    from main.streaks import compute_streaks
+
+    history = synthetic_history(args.habits, args.years, args.done_ratio)
+    print(f'Привычек: {args.habits}, лет истории: {args.years}, отметок: {len(history[2])}')
+
+    current, longest, _, _ = compute_streaks(*history)
+    start_days, periods = history[0].tolist(), history[1].tolist()
+    expected = python_streaks(start_days, periods, history[2], history[3], history[4])
+    assert list(zip(current.tolist(), longest.tolist())) == expected, 'результаты расходятся'
+
+    report('compute_streaks (NumPy, одна пачка)', lambda: compute_streaks(*history), repeat=10)
+    report('построчно на Python', lambda: python_streaks(
+        start_days, periods, history[2], history[3], history[4]), repeat=3)
+
+
+if __name__ == '__main__':
+    main()
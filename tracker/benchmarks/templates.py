@@ -0,0 +1,112 @@
+""" Время рендера каждого шаблона из main/templates/main/.
+
+    Контекст берётся из настоящего ответа view (тестовый клиент сохраняет его),
+    затем шаблон рендерится отдельно в трёх режимах:
+
+        без кэша   — шаблон заново читается и компилируется на каждый рендер
+        cached     — cached.Loader, фрагменты {% cache %} каждый раз пустые
+        фрагменты  — cached.Loader и уже заполненный кэш фрагментов
+
+    python -m benchmarks.templates [--db /tmp/tracker_bench.sqlite3] """
+import argparse
+
+from benchmarks.common import setup_django, report
+
+
+PREFIX = 'tplbench'
+
+# шаблон -> (имя маршрута, нужен ли slug, нужен ли вход)
+PAGES = {
+    'main/home.html': ('home', None, True),
+    'main/tasks.html': ('task', None, True),
+    'main/task_detail.html': ('task_detail', 'task', True),
+    'main/add_task.html': ('task_add', None, True),
+    'main/habits.html': ('habit', None, True),
+    'main/habit_detail.html': ('habit_detail', 'habit', True),
+    'main/add_habit.html': ('habit_add', None, True),
+    'main/login.html': ('login', None, False),
+    'main/signup.html': ('signup', None, False),
+}
+
+
+def capture_contexts():
+    """ Контекст и запрос, с которыми view рендерит каждый шаблон """
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.urls import reverse
+    from main.models import Task, Habit
+    from main.seeding import seed_users
+
+    seed_users(1, 200, 14, 1, prefix=PREFIX, seed=1)
+    user = User.objects.get(username=f'{PREFIX}0')
+    slugs = {
+        'task': Task.objects.filter(user=user).values_list('slug', flat=True).first(),
+        'habit': Habit.objects.filter(user=user).values_list('slug', flat=True).first(),
+    }
+
+    contexts = {}
+    for template_name, (route, slug, login) in PAGES.items():
+        client = Client()
+        if login:
+            client.force_login(user)
+        url = reverse(route, kwargs={'slug': slugs[slug]} if slug else None)
+        response = client.get(url)
+        assert template_name in [t.name for t in response.templates], (template_name, response.status_code)
+        contexts[template_name] = (response.context[0].flatten(), response.wsgi_request)
+    return contexts
+
+
+def uncached_engine():
+    """ Тот же движок, но без cached.Loader """
+    from django.template import engines, Engine
+
+    configured = engines['django'].engine
+    return Engine(
+        dirs=configured.dirs,
+        context_processors=configured.context_processors,
+        loaders=[
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ],
+        libraries=configured.libraries,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='база для замера (по умолчанию временный файл)')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.core.cache import cache
+    from django.template import RequestContext, engines
+    from django.test.utils import setup_test_environment
+
+    # тестовое окружение: клиент сохраняет контекст ответа
+    setup_test_environment()
+    contexts = capture_contexts()
+    cached = engines['django']
+    plain = uncached_engine()
+
+    for template_name, (context, request) in contexts.items():
+        print(template_name)
+
+        def render_uncached():
+            cache.clear()
+            plain.get_template(template_name).render(RequestContext(request, context))
+
+        def render_cached():
+            cache.clear()
+            cached.get_template(template_name).render(context, request)
+
+        def render_fragments():
+            cached.get_template(template_name).render(context, request)
+
+        report('  без кэша шаблонов', render_uncached, args.repeat)
+        report('  cached.Loader', render_cached, args.repeat)
+        report('  cached.Loader + фрагменты', render_fragments, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
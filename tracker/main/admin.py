@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import *
+from .pagination import EstimatedCountPaginator
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
@@ -58,7 +59,8 @@ class HabitAdmin(admin.ModelAdmin):
     )
     list_filter = (
         'frequency',
-        'is_active'
+        'is_active',
+        'storage_mode'
     )
     prepopulated_fields = {'slug': ('title',)}
     ordering = (
@@ -70,13 +72,17 @@ class HabitAdmin(admin.ModelAdmin):
 
 @admin.register(HabitLog)
 class HabitLogAdmin(admin.ModelAdmin):
+    """ Логов десятки миллионов: точного COUNT(*) нет (EstimatedCountPaginator,
+        show_full_result_count), date_hierarchy и сортировка идут по индексу
+        даты, привычка выбирается автодополнением вместо списка всех привычек """
     list_display = (
         'id',
         'habit',
         'date',
         'is_done'
     )
-    list_select_related = ('habit',)
+    # Habit.__str__ читает и пользователя
+    list_select_related = ('habit__user',)
     list_display_links = (
         'id',
         'habit'
@@ -91,6 +97,81 @@ class HabitLogAdmin(admin.ModelAdmin):
         'is_done',
     )
     ordering = (
+        '-date',
+        '-id',
+    )
+    readonly_fields = ('id',)
+    autocomplete_fields = ('habit',)
+    date_hierarchy = 'date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(HabitYearBitmap)
+class HabitYearBitmapAdmin(admin.ModelAdmin):
+    """ Только просмотр: маски пишут archive_habit_logs и отметки
+        привычек со storage_mode='bitmap' """
+    list_display = (
         'id',
+        'habit',
+        'year',
+        'updated_at'
+    )
+    list_select_related = ('habit__user',)
+    search_fields = (
+        'habit__title',
+    )
+    ordering = (
+        'habit',
+        'year',
+    )
+    readonly_fields = ('habit', 'year', 'done', 'missed', 'updated_at')
+
+@admin.register(HabitDailyStat)
+class HabitDailyStatAdmin(admin.ModelAdmin):
+    """ Только просмотр: счётчики ведутся сигналами и командой rebuild_habit_stats """
+    list_display = (
+        'id',
+        'user',
+        'date',
+        'total',
+        'done',
+        'updated_at'
+    )
+    list_select_related = ('user',)
+    list_filter = (
+        'date',
+    )
+    ordering = (
+        '-date',
+    )
+    readonly_fields = ('user', 'date', 'total', 'done', 'updated_at')
+
+@admin.register(JobCheckpoint)
+class JobCheckpointAdmin(admin.ModelAdmin):
+    """ Только просмотр: точки пишут пакетные задачи вроде generate_missed_logs """
+    list_display = (
+        'name',
+        'target_date',
+        'last_user_id',
+        'finished',
+        'updated_at'
+    )
+    readonly_fields = ('name', 'target_date', 'last_user_id', 'finished', 'updated_at')
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    """ Очередь уведомлений: пишут send_reminders и другие задачи """
+    list_display = (
+        'id',
+        'user',
+        'kind',
+        'deadline',
+        'created_at',
+        'sent_at',
+        'attempts'
+    )
+    list_select_related = ('user',)
+    list_filter = (
+        'kind',
     )
-    readonly_fields = ('id',)
\ No newline at end of file
+    readonly_fields = ('user', 'task', 'kind', 'message', 'created_at', 'sent_at', 'attempts', 'last_error')
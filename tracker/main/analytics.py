@@ -0,0 +1,155 @@
+""" Отчёты по неделям и месяцам: выполнение привычек и задачи по приоритетам.
+
+    Каждый отчёт — один SQL-запрос: группировка по TruncWeek/TruncMonth и
+    оконные функции поверх уже сгруппированных строк (предыдущий период,
+    скользящее окно, нарастающий итог). Проценты считаются в Python из сумм """
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DateField, F, Func, Q, RowRange, Sum, Window
+from django.db.models.functions import Lag, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .cache import cached_for_user
+from .models import Task, HabitDailyStat
+
+
+# Гранулярность -> (функция усечения даты, сколько периодов показывать)
+REPORT_PERIODS = {
+    'week': (TruncWeek, 12),
+    'month': (TruncMonth, 12),
+}
+REPORT_PERIOD_LABELS = {
+    'week': 'По неделям',
+    'month': 'По месяцам',
+}
+DEFAULT_REPORT_PERIOD = 'week'
+# Скользящее окно для выполнения привычек (в периодах)
+ROLLING_PERIODS = 4
+
+
+class WindowSum(Func):
+    """ SUM(...) OVER (...) поверх сгруппированных значений.
+        Агрегат Sum не принимает другой агрегат внутри, а оконная функция может """
+    function = 'SUM'
+    window_compatible = True
+
+
+def period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def shift_periods(day, period, count):
+    """ Начало периода на count периодов раньше day (day — начало периода) """
+    if period == 'week':
+        return day - timedelta(weeks=count)
+    month = day.year * 12 + day.month - 1 - count
+    return day.replace(year=month // 12, month=month % 12 + 1)
+
+
+def report_since(today, period):
+    """ Первый показываемый период и первый период запроса: для оконных
+        значений в начале отчёта нужны ещё ROLLING_PERIODS - 1 периодов до него """
+    shown = shift_periods(period_start(today, period), period, REPORT_PERIODS[period][1] - 1)
+    return shown, shift_periods(shown, period, ROLLING_PERIODS - 1)
+
+
+def percent(part, whole):
+    return round(part * 100 / whole, 1) if whole else None
+
+
+def habit_completion_report(user, period, today):
+    """ Выполнение привычек по периодам из дневной статистики: отметок,
+        выполнено, процент, изменение к прошлому периоду и скользящий процент """
+    trunc = REPORT_PERIODS[period][0]
+    shown, since = report_since(today, period)
+    order = F('period').asc()
+    rolling = RowRange(start=-(ROLLING_PERIODS - 1), end=0)
+
+    rows = HabitDailyStat.objects.filter(
+        user=user,
+        date__gte=since,
+        date__lte=today,
+    ).annotate(
+        period=trunc('date')
+    ).values('period').annotate(
+        planned=Sum('total'),
+        completed=Sum('done'),
+    ).annotate(
+        previous_planned=Window(Lag('planned'), order_by=order),
+        previous_completed=Window(Lag('completed'), order_by=order),
+        rolling_planned=Window(WindowSum('planned'), order_by=order, frame=rolling),
+        rolling_completed=Window(WindowSum('completed'), order_by=order, frame=rolling),
+    ).order_by('period')
+
+    report = []
+    for row in rows:
+        if row['period'] < shown:
+            continue
+        rate = percent(row['completed'], row['planned'])
+        previous_rate = percent(row['previous_completed'] or 0, row['previous_planned'] or 0)
+        report.append({
+            'period': row['period'].isoformat(),
+            'planned': row['planned'],
+            'completed': row['completed'],
+            'rate': rate,
+            'rate_change': round(rate - previous_rate, 1) if rate is not None and previous_rate is not None else None,
+            'rolling_rate': percent(row['rolling_completed'], row['rolling_planned']),
+        })
+    return report
+
+
+def task_cohort_report(user, period, today):
+    """ Задачи, созданные в каждом периоде, по приоритетам: сколько из них
+        уже сделано, доля приоритета среди созданных за период и нарастающие
+        итоги с начала отчёта """
+    trunc = REPORT_PERIODS[period][0]
+    shown, _ = report_since(today, period)
+    by_priority = {'partition_by': F('priority'), 'order_by': F('period').asc()}
+
+    rows = Task.objects.filter(
+        user=user,
+        created_at__gte=timezone.make_aware(datetime.combine(shown, time.min)),
+    ).annotate(
+        period=trunc('created_at', output_field=DateField())
+    ).values('period', 'priority').annotate(
+        created=Count('pk'),
+        finished=Count('pk', filter=Q(status='done')),
+    ).annotate(
+        period_created=Window(WindowSum('created'), partition_by=F('period')),
+        cumulative_created=Window(WindowSum('created'), **by_priority),
+        cumulative_finished=Window(WindowSum('finished'), **by_priority),
+    ).order_by('period', 'priority')
+
+    return [
+        {
+            'period': row['period'].isoformat(),
+            'priority': row['priority'],
+            'priority_label': Task.PRIORITY_LABELS.get(row['priority'], row['priority']),
+            'created': row['created'],
+            'done': row['finished'],
+            'done_rate': percent(row['finished'], row['created']),
+            'share': percent(row['created'], row['period_created']),
+            'cumulative_created': row['cumulative_created'],
+            'cumulative_done': row['cumulative_finished'],
+        }
+        for row in rows
+    ]
+
+
+def build_report(user, period, today):
+    return {
+        'period': period,
+        'habits': habit_completion_report(user, period, today),
+        'tasks': task_cohort_report(user, period, today),
+    }
+
+
+def get_report(user, period, today):
+    """ Отчёт из кэша пользователя: пересчитывается после любой записи """
+    return cached_for_user(
+        user.pk, 'analytics',
+        lambda: build_report(user, period, today),
+        period, today
+    )
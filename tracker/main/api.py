@@ -0,0 +1,236 @@
+""" JSON API для мобильного клиента: задачи, привычки и логи.
+
+    GET /api/tasks/?fields=id,title,deadline&status=todo&limit=100
+    GET /api/habits/?active=true
+    GET /api/logs/?habit=бег&since=2026-01-01&cursor=...
+
+    Ответ: {"results": [...], "next": "<курсор>" или null}.
+    Строки читаются через values(): объекты моделей не создаются, из базы
+    берутся только поля из ?fields= (по умолчанию все). Страницы курсорные,
+    как в HTML-списках. ETag строится из версии данных пользователя: пока
+    они не менялись, запрос с If-None-Match получает 304, не трогая таблицы.
+
+    Логи — строки HabitLog вместе с отметками из масок годов (архив и режим
+    bitmap), по порядку (привычка, дата); у отметок из масок id — null.
+
+    Всё читается из основной базы, не с реплики: ETag — версия данных на
+    основной базе, и тело ответа должно ей соответствовать """
+import hashlib
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.views import View
+
+from .bitmaps import iter_days
+from .cache import get_user_version
+from .models import Task, Habit, HabitLog, HabitYearBitmap
+from .pagination import CursorPaginator, InvalidCursor
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+# Сколько масок годов читает один запрос при обходе логов
+BITMAP_CHUNK_SIZE = 100
+
+
+class ApiError(ValueError):
+    """ Неверные параметры запроса: отвечаем 400 с текстом ошибки """
+
+
+class ApiListView(LoginRequiredMixin, View):
+    """ Список объектов пользователя в JSON.
+        fields — {имя в ответе: поле для values()}, ordering — сортировка курсора """
+    fields = {}
+    ordering = ['pk']
+
+    def handle_no_permission(self):
+        # без входа — 401, а не редирект на HTML-страницу входа
+        response = HttpResponse('Требуется вход', status=401)
+        response['WWW-Authenticate'] = 'Session'
+        return response
+
+    def get_queryset(self, params):
+        raise NotImplementedError
+
+    def get(self, request):
+        try:
+            fields = self.get_fields(request.GET.get('fields'))
+            limit = self.get_limit(request.GET.get('limit'))
+        except ApiError as error:
+            return HttpResponseBadRequest(str(error))
+
+        # Версия меняется при любой записи пользователя: совпал ETag — данные те же
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                response = JsonResponse(self.get_page(request, fields, limit))
+            except ApiError as error:
+                return HttpResponseBadRequest(str(error))
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_fields(self, value):
+        if not value:
+            return self.fields
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f'Неизвестные поля: {", ".join(unknown)}. Доступны: {", ".join(self.fields)}')
+        return {name: self.fields[name] for name in names}
+
+    @staticmethod
+    def get_limit(value):
+        try:
+            limit = int(value or DEFAULT_LIMIT)
+        except ValueError:
+            raise ApiError('limit должен быть числом')
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ApiError(f'limit должен быть от 1 до {MAX_LIMIT}')
+        return limit
+
+    def get_etag(self, request):
+        key = f'{request.user.pk}:{get_user_version(request.user.pk)}:{request.get_full_path()}'
+        return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+    def get_page(self, request, fields, limit):
+        queryset = self.get_queryset(request.GET)
+        ordering = CursorPaginator.resolve_ordering(queryset, self.ordering)
+        # поля сортировки нужны курсору, даже если их не запросили
+        lookups = dict.fromkeys([*fields.values(), *(field.lstrip('-') for field in ordering)])
+        paginator = CursorPaginator(queryset.values(*lookups), limit, ordering=ordering)
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            raise ApiError('Неверный курсор страницы')
+        return {
+            'results': [{name: row[lookup] for name, lookup in fields.items()} for row in page],
+            'next': page.next_cursor,
+        }
+
+
+class TaskApiView(ApiListView):
+    """ Задачи: ?status=todo|in_progress|done """
+    fields = {
+        'id': 'id', 'slug': 'slug', 'title': 'title', 'description': 'description',
+        'status': 'status', 'priority': 'priority', 'deadline': 'deadline', 'created_at': 'created_at',
+    }
+
+    def get_queryset(self, params):
+        queryset = Task.objects.filter(user=self.request.user)
+        if params.get('status'):
+            if params['status'] not in Task.STATUS_LABELS:
+                raise ApiError('Неверный статус')
+            queryset = queryset.filter(status=params['status'])
+        return queryset
+
+
+class HabitApiView(ApiListView):
+    """ Привычки: ?active=true|false """
+    fields = {
+        'id': 'id', 'slug': 'slug', 'title': 'title', 'frequency': 'frequency',
+        'start_date': 'start_date', 'is_active': 'is_active', 'storage_mode': 'storage_mode',
+    }
+
+    def get_queryset(self, params):
+        queryset = Habit.objects.filter(user=self.request.user)
+        if params.get('active') in ('true', 'false'):
+            queryset = queryset.filter(is_active=params['active'] == 'true')
+        return queryset
+
+
+class HabitLogApiView(ApiListView):
+    """ Логи: ?habit=<slug>&since=YYYY-MM-DD, по привычкам и датам.
+        Отметки из строк HabitLog и из масок годов (архив и режим bitmap)
+        идут одним списком; у отметок из масок id — null """
+    fields = {'id': 'id', 'habit': 'habit', 'date': 'date', 'is_done': 'is_done'}
+
+    def get_page(self, request, fields, limit):
+        params = request.GET
+        habits = Habit.objects.filter(user=request.user)
+        if params.get('habit'):
+            habits = habits.filter(slug=params['habit'])
+        slugs = dict(habits.values_list('pk', 'slug'))
+        since = self.get_since(params.get('since'))
+        after = self.get_after(params.get('cursor'))
+
+        # Оба источника отсортированы по (habit_id, date) и обрезаны до limit + 1:
+        # первые limit ключей объединения есть среди них. Строка HabitLog
+        # перекрывает бит маски за тот же день, как в bitmaps.archived_logs
+        marks = {}
+        for habit_id, day, is_done in self.masked_logs(slugs, since, after, limit + 1):
+            marks[habit_id, day] = (None, is_done)
+        for habit_id, day, is_done, pk in self.hot_logs(slugs, since, after, limit + 1):
+            marks[habit_id, day] = (pk, is_done)
+
+        keys = sorted(marks)
+        rows = [
+            {'id': marks[key][0], 'habit': slugs[key[0]], 'date': key[1], 'is_done': marks[key][1]}
+            for key in keys[:limit]
+        ]
+        return {
+            'results': [{name: row[name] for name in fields} for row in rows],
+            'next': CursorPaginator.encode_values(keys[limit - 1]) if len(keys) > limit else None,
+        }
+
+    @staticmethod
+    def get_since(value):
+        if not value:
+            return None
+        try:
+            since = parse_date(value)
+        except ValueError:
+            since = None
+        if since is None:
+            raise ApiError('Неверная дата since')
+        return since
+
+    @staticmethod
+    def get_after(cursor):
+        """ (habit_id, дата) последней отметки предыдущей страницы """
+        if not cursor:
+            return None
+        habit_id = day = None
+        try:
+            (habit_id, day), _ = CursorPaginator.decode_values(cursor, 2)
+            day = parse_date(day) if isinstance(day, str) else None
+        except (InvalidCursor, ValueError):
+            day = None
+        if not isinstance(habit_id, int) or day is None:
+            raise ApiError('Неверный курсор страницы')
+        return habit_id, day
+
+    @staticmethod
+    def hot_logs(slugs, since, after, limit):
+        logs = HabitLog.objects.filter(habit_id__in=slugs)
+        if since is not None:
+            logs = logs.filter(date__gte=since)
+        if after is not None:
+            logs = logs.filter(Q(habit_id__gt=after[0]) | Q(habit_id=after[0], date__gt=after[1]))
+        # порядок уникального индекса (habit, date)
+        return list(logs.order_by('habit_id', 'date').values_list('habit_id', 'date', 'is_done', 'id')[:limit])
+
+    @staticmethod
+    def masked_logs(slugs, since, after, limit):
+        """ Первые limit отметок из масок годов после after """
+        bitmaps = HabitYearBitmap.objects.filter(habit_id__in=slugs)
+        if since is not None:
+            bitmaps = bitmaps.filter(year__gte=since.year)
+        if after is not None:
+            bitmaps = bitmaps.filter(Q(habit_id__gt=after[0]) | Q(habit_id=after[0], year__gte=after[1].year))
+        rows = bitmaps.order_by('habit_id', 'year').values_list('habit_id', 'year', 'done', 'missed')
+
+        marks = []
+        for habit_id, year, done, missed in rows.iterator(chunk_size=BITMAP_CHUNK_SIZE):
+            days = sorted([(day, True) for day in iter_days(done, year)] + [(day, False) for day in iter_days(missed, year)])
+            for day, is_done in days:
+                if since is not None and day < since or after is not None and (habit_id, day) <= after:
+                    continue
+                marks.append((habit_id, day, is_done))
+                if len(marks) == limit:
+                    return marks
+        return marks
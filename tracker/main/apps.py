@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     name = 'main'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (счётчики статистики и т.д.)
+        from . import signals
@@ -0,0 +1,181 @@
+""" Async-версии страниц, которые чаще всего читают: главная, список задач,
+    привычка и отметка «Выполнено». Подключаются вместо обычных при
+    USE_ASYNC_VIEWS = True и запуске через ASGI (tracker/asgi.py).
+
+    Независимые запросы идут через asyncio.gather. Django выполняет async ORM
+    в одном потоке на запрос (thread_sensitive), поэтому к базе они всё равно
+    уходят по очереди; выигрыш — в том, что воркер не держит поток на каждый
+    запрос и переключается между ними, пока идут обращения к кэшу и базе """
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import redirect, render, resolve_url
+from django.utils import timezone
+from django.views import View
+
+from .bitmaps import HabitBitmap
+from .cache import acached_for_user
+from .checkins import mark_done
+from .dashboard import aget_dashboard_context, alist
+from .forms import TaskFilterForm
+from .mixins import TaskFilterMixin, CursorPaginationMixin, ReplicaReadMixin
+from .models import Task, Habit, HabitLog
+from .search import SEARCH_RESULT_LIMIT
+from .streaks import get_habit_stats
+
+
+class AsyncLoginRequiredMixin:
+    """ LoginRequiredMixin для async-views: пользователь загружается через
+        request.auser(), без синхронного обращения к базе в event loop """
+    login_url = None
+
+    def dispatch(self, request, *args, **kwargs):
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), resolve_url(self.login_url or settings.LOGIN_URL))
+        # Шаблоны и формы читают request.user — отдаём уже загруженного
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+async def arender(request, template_name, context):
+    # Рендер шаблона синхронный: контекстные процессоры читают сессию и сообщения
+    return await sync_to_async(render)(request, template_name, context)
+
+
+class AsyncTaskListMixin(TaskFilterMixin, CursorPaginationMixin):
+    paginate_by = 7
+    form_class = TaskFilterForm
+
+    async def aget_task_page(self):
+        # Фильтр может обратиться к поисковому индексу — это синхронный код
+        queryset = await sync_to_async(self.get_filtered_queryset)(
+            Task.objects.filter(user=self.request.user)
+        )
+        page = await self.aget_page(queryset, self.paginate_by)
+        return {
+            'tasks': page.object_list,
+            'object_list': page.object_list,
+            'page_obj': page,
+            'paginator': None,
+            'is_paginated': page.has_other_pages(),
+            'form': self.form_class(self.request.GET),
+            'search_truncated': self.search_truncated,
+            'search_limit': SEARCH_RESULT_LIMIT,
+        }
+
+
+class AsyncHomeListView(ReplicaReadMixin, AsyncLoginRequiredMixin, AsyncTaskListMixin, View):
+    """ Главная страница (async): страница задач и данные привычек параллельно """
+    template_name = 'main/home.html'
+
+    async def get(self, request):
+        tasks, dashboard = await asyncio.gather(
+            self.aget_task_page(),
+            aget_dashboard_context(request.user),
+        )
+        context = {'title': 'Главная страница', **tasks, **dashboard}
+        return await arender(request, self.template_name, context)
+
+
+class AsyncTasksListView(ReplicaReadMixin, AsyncLoginRequiredMixin, AsyncTaskListMixin, View):
+    """ Список задач (async) """
+    template_name = 'main/tasks.html'
+
+    async def get(self, request):
+        context = {'title': 'Задачи', **await self.aget_task_page()}
+        return await arender(request, self.template_name, context)
+
+
+class AsyncHabitsDetailView(ReplicaReadMixin, AsyncLoginRequiredMixin, View):
+    """ Страница привычки (async) """
+    template_name = 'main/habit_detail.html'
+    period_days = 30
+
+    async def get(self, request, slug):
+        habit = await aget_habit_or_404(request.user, slug)
+        today = timezone.now().date()
+
+        context = await acached_for_user(
+            habit.user_id, 'habit_detail',
+            lambda: self.aget_habit_history(habit, today),
+            habit.pk, today
+        )
+        context = {
+            **context,
+            'habit': habit,
+            'object': habit,
+            'title': f'История привычки: {habit.title}',
+        }
+        return await arender(request, self.template_name, context)
+
+    async def aget_habit_history(self, habit, today):
+        """ Те же данные, что HabitsDetailView.get_habit_history,
+            но независимые запросы отправляются одновременно """
+        start_date = today - timedelta(days=self.period_days)
+        if habit.storage_mode == 'bitmap':
+            history, stats = await asyncio.gather(
+                sync_to_async(HabitBitmap.load)(habit.pk, start_date, today),
+                sync_to_async(get_habit_stats)([habit], today=today),
+            )
+            log_list = [HabitLog(habit=habit, date=day, is_done=is_done) for day, is_done in history.days(start_date, today)]
+            total_days, done_days = history.count(start_date, today)
+            done_today = history.test_day(today) is True
+        else:
+            logs = HabitLog.objects.filter(
+                habit=habit,
+                date__gte=start_date
+            ).order_by('date')
+
+            log_list, stats = await asyncio.gather(
+                alist(logs),
+                sync_to_async(get_habit_stats)([habit], today=today),
+            )
+            # как в HabitsDetailView: цифры по тем же строкам, что идут в историю
+            total_days = len(log_list)
+            done_days = sum(log.is_done for log in log_list)
+            done_today = any(log.date == today and log.is_done for log in log_list)
+
+        return {
+            'stats': stats[habit.pk],
+            'logs': log_list,
+            'total_days': total_days,
+            'done_days': done_days,
+            'progress_percent': int(done_days / total_days * 100) if total_days else 0,
+            'period_days': self.period_days,
+            'done_today': done_today,
+        }
+
+
+class AsyncHabitMarkDoneView(AsyncLoginRequiredMixin, View):
+    """ Кнопка «Выполнено» (async) """
+
+    async def post(self, request, slug):
+        habit = await aget_habit_or_404(request.user, slug)
+        today = timezone.now().date()
+
+        # transaction.atomic не работает в async-коде: отметка и дневная
+        # статистика пишутся одной синхронной функцией в одной транзакции
+        created = await sync_to_async(mark_done)(habit, today)
+        if not created:
+            messages.info(request, "Вы уже отметили эту привычку сегодня!")
+        else:
+            messages.success(request, f"Привычка '{habit.title}' отмечена как выполненная сегодня!")
+
+        return redirect('habit_detail', slug=habit.slug)
+
+
+async def aget_habit_or_404(user, slug):
+    try:
+        return await Habit.objects.aget(slug=slug, user=user)
+    except Habit.DoesNotExist:
+        raise Http404('Привычка не найдена')
+
@@ -0,0 +1,404 @@
+""" История привычек в битовых масках: архив старых логов и режим
+    хранения storage_mode='bitmap'.
+
+    Год истории привычки — две битовые маски по 46 байт в HabitYearBitmap:
+    done (выполнено) и missed (отметка «пропуск»). Бит на день года, младший
+    бит байта — более ранний день, как в тепловой карте.
+
+    archive_users переносит логи старше горизонта из HabitLog в маски и
+    удаляет строки: в горячей таблице остаются последние
+    HABITLOG_ARCHIVE_AFTER_DAYS дней, и её индексы помещаются в память.
+    Habit.archived_until — до какой даты (не включая) логи привычки могут
+    лежать в архиве. Дневная статистика при переносе не меняется: дни и
+    отметки те же.
+
+    Читатели всей истории — тепловая карта, серии, пересборка статистики,
+    выгрузка — добавляют к строкам HabitLog дни из archived_logs. Если за
+    архивный день снова появилась строка в HabitLog (загрузка файла, API
+    отметок), побеждает строка; следующий прогон архивации перенесёт и её.
+
+    Привычки со storage_mode='bitmap' хранят в масках всю историю, строк
+    HabitLog у них нет: отметки ставит HabitBitmap (checkins.mark_done),
+    режим меняет convert_storage (команда habit_storage) """
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import F, Q
+
+from .cache import bump_user_version
+from .models import Habit, HabitLog, HabitYearBitmap, JobCheckpoint
+
+
+JOB_NAME = 'archive_habit_logs'
+# Логи старше стольких дней уезжают в архив
+ARCHIVE_AFTER_DAYS = getattr(settings, 'HABITLOG_ARCHIVE_AFTER_DAYS', 400)
+# Сколько пользователей архивируется в одной транзакции
+USER_CHUNK_SIZE = 100
+# Байт на маску года: 366 дней
+YEAR_BYTES = 46
+# Сколько масок пишет один bulk_create
+BITMAP_BATCH_SIZE = 2000
+# Сколько строк HabitLog удаляет один DELETE (лимит параметров SQLite — 999)
+LOG_DELETE_BATCH_SIZE = 500
+
+
+def set_bit(bits, offset):
+    # Бит offset: байт offset // 8, внутри байта младший бит — первый день
+    bits[offset >> 3] |= 1 << (offset & 7)
+
+
+def day_of_year(day):
+    """ Номер бита дня в маске года """
+    return day.timetuple().tm_yday - 1
+
+
+def iter_days(bits, year):
+    """ Даты установленных битов маски года по возрастанию """
+    first = date(year, 1, 1)
+    for index, byte in enumerate(bits):
+        while byte:
+            low = byte & -byte
+            yield first + timedelta(days=index * 8 + low.bit_length() - 1)
+            byte ^= low
+
+
+def archive_cutoff(today, after_days=ARCHIVE_AFTER_DAYS):
+    """ Первый день, который остаётся в HabitLog """
+    return today - timedelta(days=after_days)
+
+
+def archived_logs(habit_ids=None, user_ids=None, start=None, end=None):
+    """ Архивные отметки (habit_id, user_id, дата, is_done) привычек habit_ids
+        или всех привычек пользователей user_ids за [start, end].
+        Дни, за которые есть строка в HabitLog, пропускаются. Два запроса """
+    bitmaps = HabitYearBitmap.objects.order_by('habit_id', 'year')
+    stragglers = HabitLog.objects.filter(date__lt=F('habit__archived_until'))
+    if habit_ids is not None:
+        bitmaps = bitmaps.filter(habit_id__in=habit_ids)
+        stragglers = stragglers.filter(habit_id__in=habit_ids)
+    if user_ids is not None:
+        bitmaps = bitmaps.filter(habit__user_id__in=user_ids)
+        stragglers = stragglers.filter(habit__user_id__in=user_ids)
+    if start is not None:
+        bitmaps = bitmaps.filter(year__gte=start.year)
+        stragglers = stragglers.filter(date__gte=start)
+    if end is not None:
+        bitmaps = bitmaps.filter(year__lte=end.year)
+        stragglers = stragglers.filter(date__lte=end)
+
+    rows = list(bitmaps.values_list('habit_id', 'habit__user_id', 'year', 'done', 'missed'))
+    if not rows:
+        return
+    hot = set(stragglers.order_by().values_list('habit_id', 'date'))
+
+    for habit_id, user_id, year, done, missed in rows:
+        for bits, is_done in ((done, True), (missed, False)):
+            for day in iter_days(bits, year):
+                if start is not None and day < start or end is not None and day > end:
+                    continue
+                if (habit_id, day) not in hot:
+                    yield habit_id, user_id, day, is_done
+
+
+def archived_day_counts(user_ids, since=None, dates=None):
+    """ {(user_id, дата): [всего, выполнено]} по архиву пользователей —
+        то, что HabitDailyStat добавляет к счётчикам по HabitLog """
+    start = min(dates) if dates else since
+    end = max(dates) if dates else None
+    counts = {}
+    for _, user_id, day, is_done in archived_logs(user_ids=user_ids, start=start, end=end):
+        if dates is not None and day not in dates:
+            continue
+        row = counts.setdefault((user_id, day), [0, 0])
+        row[0] += 1
+        row[1] += int(is_done)
+    return counts
+
+
+def archive_users(user_ids, cutoff):
+    """ Переносит логи пользователей до cutoff (не включая) в маски годов.
+        Возвращает число перенесённых логов """
+    archived, habit_ids = move_to_bitmaps(HabitLog.objects.filter(
+        habit__user_id__in=user_ids,
+        date__lt=cutoff,
+    ))
+    if archived:
+        Habit.objects.filter(pk__in=habit_ids).filter(
+            Q(archived_until__isnull=True) | Q(archived_until__lt=cutoff)
+        ).update(archived_until=cutoff)
+        # у перенесённых отметок больше нет id строк (JSON API отдаёт их иначе)
+        for user_id in set(Habit.objects.filter(pk__in=habit_ids).values_list('user_id', flat=True)):
+            transaction.on_commit(lambda user_id=user_id: bump_user_version(user_id))
+    return archived
+
+
+def move_to_bitmaps(logs):
+    """ Переносит логи из queryset в маски годов и удаляет строки.
+        Строки читаются под блокировкой, а удаляются только прочитанные —
+        по id: отметка, записанная после чтения, остаётся в HabitLog до
+        следующего прогона. Возвращает (число логов, id привычек) """
+    with transaction.atomic(using=logs.db):
+        rows = logs.select_for_update(of=('self',)).order_by().values_list('pk', 'habit_id', 'date', 'is_done')
+        histories = {}
+        ids = []
+        for pk, habit_id, day, is_done in rows.iterator(chunk_size=BITMAP_BATCH_SIZE):
+            if habit_id not in histories:
+                histories[habit_id] = HabitBitmap(habit_id)
+            histories[habit_id].set_day(day, is_done)
+            ids.append(pk)
+        if not histories:
+            return 0, set()
+
+        # Год мог быть заархивирован частично прошлым прогоном: объединяем.
+        # Строка из HabitLog новее архива, поэтому её отметка побеждает
+        years = {year for history in histories.values() for year in history.years}
+        for habit_id, existing in HabitBitmap.load_many(histories, years, for_update=True).items():
+            histories[habit_id].fill_from(existing)
+        HabitBitmap.save_many(histories.values())
+
+        moved = _delete_logs(ids, logs.db)
+    return moved, set(histories)
+
+
+def _delete_logs(ids, using):
+    """ DELETE строк HabitLog по id обычным SQL. QuerySet.delete() выбрал бы
+        строки заново и отправил post_delete на каждую, а тот пересчитывает
+        дневную статистику — при переносе в архив она не меняется.
+        Возвращает число удалённых строк """
+    connection = connections[using]
+    table = connection.ops.quote_name(HabitLog._meta.db_table)
+    column = connection.ops.quote_name(HabitLog._meta.pk.column)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for offset in range(0, len(ids), LOG_DELETE_BATCH_SIZE):
+            chunk = ids[offset:offset + LOG_DELETE_BATCH_SIZE]
+            cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({", ".join(["%s"] * len(chunk))})', chunk)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def convert_storage(habit, mode):
+    """ Переводит привычку в другой режим хранения вместе с историей.
+        Дневная статистика не меняется. Возвращает число перенесённых дней """
+    if habit.storage_mode == mode:
+        return 0
+    with transaction.atomic():
+        if mode == 'bitmap':
+            moved, _ = move_to_bitmaps(HabitLog.objects.filter(habit=habit))
+        else:
+            logs = [
+                HabitLog(habit_id=habit.pk, date=day, is_done=is_done)
+                for _, _, day, is_done in archived_logs([habit.pk])
+            ]
+            HabitLog.objects.bulk_create(logs, batch_size=BITMAP_BATCH_SIZE, ignore_conflicts=True)
+            HabitYearBitmap.objects.filter(habit=habit).delete()
+            habit.archived_until = None
+            moved = len(logs)
+        habit.storage_mode = mode
+        Habit.objects.filter(pk=habit.pk).update(storage_mode=mode, archived_until=habit.archived_until)
+        transaction.on_commit(lambda: bump_user_version(habit.user_id))
+    return moved
+
+
+class HabitBitmap:
+    """ История одной привычки в масках годов: отметить день, проверить день,
+        посчитать отметки за период, найти серию. Маски загружаются одним
+        запросом, save() пишет изменённые годы одним upsert.
+
+        Маска года как int (int.from_bytes, младший бит — 1 января), поэтому
+        подсчёт за период — сдвиг, маска и int.bit_count(), без цикла по дням """
+
+    def __init__(self, habit_id, years=None):
+        self.habit_id = habit_id
+        # год -> [done, missed] (bytearray по YEAR_BYTES)
+        self.years = years or {}
+        self.changed = set()
+
+    @classmethod
+    def load(cls, habit_id, start=None, end=None, for_update=False):
+        """ Маски привычки за годы [start.year, end.year] (все, если не заданы) """
+        bitmaps = HabitYearBitmap.objects.filter(habit_id=habit_id)
+        if start is not None:
+            bitmaps = bitmaps.filter(year__gte=start.year)
+        if end is not None:
+            bitmaps = bitmaps.filter(year__lte=end.year)
+        if for_update:
+            bitmaps = bitmaps.select_for_update()
+        return cls(habit_id, {
+            year: [bytearray(done), bytearray(missed)]
+            for year, done, missed in bitmaps.values_list('year', 'done', 'missed')
+        })
+
+    @classmethod
+    def load_many(cls, habit_ids, years, for_update=False):
+        """ {habit_id: HabitBitmap} для многих привычек одним запросом.
+            for_update — если маски будут изменены и сохранены в той же транзакции """
+        histories = {habit_id: cls(habit_id) for habit_id in habit_ids}
+        bitmaps = HabitYearBitmap.objects.filter(habit_id__in=histories, year__in=years)
+        if for_update:
+            bitmaps = bitmaps.select_for_update()
+        for habit_id, year, done, missed in bitmaps.values_list('habit_id', 'year', 'done', 'missed'):
+            histories[habit_id].years[year] = [bytearray(done), bytearray(missed)]
+        return histories
+
+    @staticmethod
+    def save_many(histories):
+        HabitYearBitmap.objects.bulk_create(
+            [
+                HabitYearBitmap(habit_id=history.habit_id, year=year, done=bytes(done), missed=bytes(missed))
+                for history in histories
+                for year, (done, missed) in history.years.items()
+                if year in history.changed
+            ],
+            batch_size=BITMAP_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['habit', 'year'],
+            update_fields=['done', 'missed', 'updated_at'],
+        )
+        for history in histories:
+            history.changed.clear()
+
+    def save(self):
+        if self.changed:
+            self.save_many([self])
+
+    def fill_from(self, other):
+        """ Добавляет отметки other за дни, где своей отметки нет """
+        for year, (other_done, other_missed) in other.years.items():
+            if year not in self.years:
+                self.years[year] = [bytearray(other_done), bytearray(other_missed)]
+                self.changed.add(year)
+                continue
+            done, missed = self.years[year]
+            for index in range(YEAR_BYTES):
+                free = ~(done[index] | missed[index]) & 0xFF
+                done[index] |= other_done[index] & free
+                missed[index] |= other_missed[index] & free
+            self.changed.add(year)
+
+    def test_day(self, day):
+        """ True — выполнено, False — пропуск, None — отметки нет """
+        if day.year not in self.years:
+            return None
+        done, missed = self.years[day.year]
+        offset = day_of_year(day)
+        if done[offset >> 3] >> (offset & 7) & 1:
+            return True
+        if missed[offset >> 3] >> (offset & 7) & 1:
+            return False
+        return None
+
+    def set_day(self, day, is_done=True):
+        """ Ставит отметку дня (или снимает при is_done=None).
+            Возвращает прежнюю отметку, как test_day """
+        previous = self.test_day(day)
+        if previous is is_done:
+            return previous
+        if day.year not in self.years:
+            self.years[day.year] = [bytearray(YEAR_BYTES), bytearray(YEAR_BYTES)]
+        done, missed = self.years[day.year]
+        offset = day_of_year(day)
+        bit = 1 << (offset & 7)
+        done[offset >> 3] &= ~bit & 0xFF
+        missed[offset >> 3] &= ~bit & 0xFF
+        if is_done is not None:
+            set_bit(done if is_done else missed, offset)
+        self.changed.add(day.year)
+        return previous
+
+    def count(self, start, end):
+        """ (дней с отметкой, выполнено) за [start, end] """
+        marked = done_count = 0
+        for year in range(start.year, end.year + 1):
+            if year not in self.years:
+                continue
+            first = day_of_year(start) if year == start.year else 0
+            last = day_of_year(end) if year == end.year else YEAR_BYTES * 8 - 1
+            window = (1 << (last - first + 1)) - 1
+            done, missed = (int.from_bytes(bits, 'little') >> first & window for bits in self.years[year])
+            marked += (done | missed).bit_count()
+            done_count += done.bit_count()
+        return marked, done_count
+
+    def days(self, start, end):
+        """ (дата, is_done) отмеченных дней за [start, end] по возрастанию """
+        marks = []
+        for year in range(start.year, end.year + 1):
+            if year not in self.years:
+                continue
+            done, missed = self.years[year]
+            marks.extend((day, True) for day in iter_days(done, year))
+            marks.extend((day, False) for day in iter_days(missed, year))
+        return sorted(mark for mark in marks if start <= mark[0] <= end)
+
+    def streak(self, end):
+        """ Сколько дней подряд выполнено, заканчивая днём end включительно """
+        length = 0
+        year, position = end.year, day_of_year(end)
+        while year in self.years:
+            window = (1 << (position + 1)) - 1
+            gaps = ~int.from_bytes(self.years[year][0], 'little') & window
+            if gaps:
+                # самый поздний невыполненный день до end
+                return length + position - (gaps.bit_length() - 1)
+            length += position + 1
+            year -= 1
+            position = day_of_year(date(year, 12, 31))
+        return length
+
+    def longest_streak(self):
+        """ Самая длинная серия выполненных дней за всю историю """
+        if not self.years:
+            return 0
+        first_year = min(self.years)
+        history = 0
+        for year in sorted(self.years):
+            # год ставится на своё место от 1 января первого года
+            offset = (date(year, 1, 1) - date(first_year, 1, 1)).days
+            history |= int.from_bytes(self.years[year][0], 'little') << offset
+        # x & (x >> 1) укорачивает каждую серию на день: сколько шагов до нуля
+        longest = 0
+        while history:
+            history &= history >> 1
+            longest += 1
+        return longest
+
+
+def run(cutoff, chunk_size=USER_CHUNK_SIZE, restart=False, stdout=None):
+    """ Проходит всех пользователей пачками по возрастанию id с контрольной
+        точкой, как missed.run. Возвращает (пользователей, логов) """
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(
+        name=JOB_NAME,
+        defaults={'target_date': cutoff}
+    )
+    if restart or checkpoint.target_date != cutoff:
+        checkpoint.target_date = cutoff
+        checkpoint.last_user_id = 0
+        checkpoint.finished = False
+        checkpoint.save()
+    elif checkpoint.finished:
+        return 0, 0
+
+    users_total = logs_total = 0
+    while True:
+        user_ids = list(User.objects.filter(
+            pk__gt=checkpoint.last_user_id
+        ).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not user_ids:
+            break
+
+        with transaction.atomic():
+            archived = archive_users(user_ids, cutoff)
+            checkpoint.last_user_id = user_ids[-1]
+            checkpoint.save(update_fields=['last_user_id', 'updated_at'])
+
+        users_total += len(user_ids)
+        logs_total += archived
+        if stdout is not None:
+            stdout.write(f'пользователи до id {user_ids[-1]}: в архив {archived} логов')
+
+    checkpoint.finished = True
+    checkpoint.save(update_fields=['finished', 'updated_at'])
+    return users_total, logs_total
@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import record_cache
+
+
+# Сколько живут закэшированные данные пользователя (секунды)
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+
+# Сколько секунд после записи страницы пользователя читаются из основной базы,
+# а не с реплики (ReplicaReadMixin). Должно быть не меньше отставания реплики:
+# иначе устаревшее чтение попадёт в кэш под новой версией
+REPLICA_MAX_LAG = getattr(settings, 'REPLICA_MAX_LAG', 60)
+
+_MISSING = object()
+_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def _version_key(user_id):
+    return f'user-version:{user_id}'
+
+
+def _written_key(user_id):
+    return f'user-written:{user_id}'
+
+
+def _fresh_version():
+    # Если ключ версии вытеснили из кэша, новая версия всё равно больше любой старой
+    return int(time.time() * 1000)
+
+
+def get_user_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = _fresh_version()
+        # add не перезапишет версию, если её успел создать параллельный запрос
+        if not cache.add(_version_key(user_id), version, timeout=None):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def bump_user_version(user_id):
+    """ Делает все закэшированные данные пользователя устаревшими.
+        Старые записи не удаляются — их просто больше никто не спросит """
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), _fresh_version(), timeout=None)
+    cache.set(_written_key(user_id), True, timeout=REPLICA_MAX_LAG)
+
+
+def recently_written(user_id):
+    """ Пользователь менял данные за последние REPLICA_MAX_LAG секунд:
+        реплика могла ещё не получить эти изменения """
+    return cache.get(_written_key(user_id), False)
+
+
+async def arecently_written(user_id):
+    return await cache.aget(_written_key(user_id), False)
+
+
+def cached_for_user(user_id, name, builder, *parts, timeout=USER_CACHE_TIMEOUT):
+    """ Значение builder() из кэша с ключом пользователя и его текущей версией.
+        parts — всё, от чего ещё зависит результат (параметры фильтра, дата) """
+    key = _user_key(user_id, name, parts)
+    version = get_user_version(user_id)
+
+    value = cache.get(key, _MISSING, version=version)
+    if value is not _MISSING:
+        _record(_hits, name)
+        return value
+
+    _record(_misses, name)
+    value = builder()
+    cache.set(key, value, timeout, version=version)
+    return value
+
+
+async def acached_for_user(user_id, name, builder, *parts, timeout=USER_CACHE_TIMEOUT):
+    """ То же для async-views: builder — корутинная функция """
+    key = _user_key(user_id, name, parts)
+    version = await sync_to_async(get_user_version)(user_id)
+
+    value = await cache.aget(key, _MISSING, version=version)
+    if value is not _MISSING:
+        _record(_hits, name)
+        return value
+
+    _record(_misses, name)
+    value = await builder()
+    await cache.aset(key, value, timeout, version=version)
+    return value
+
+
+def _user_key(user_id, name, parts):
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'user:{user_id}:{name}:{digest}'
+
+
+def _record(counter, name):
+    with _lock:
+        counter[name] += 1
+    record_cache(hit=counter is _hits)
+
+
+def cache_stats():
+    """ Счётчики попаданий и промахов по имени фрагмента (в пределах процесса) """
+    with _lock:
+        names = sorted(set(_hits) | set(_misses))
+        return {name: {'hits': _hits[name], 'misses': _misses[name]} for name in names}
@@ -0,0 +1,212 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+
+# Хранилища LRU общие для всех потоков процесса: Django создаёт
+# свой экземпляр бэкенда на поток, а данные должны быть одни
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Store:
+    def __init__(self):
+        self.data = OrderedDict()  # ключ -> (истекает, pickle значения)
+        self.size = 0
+        self.lock = threading.Lock()
+
+
+class LRUCache(BaseCache):
+    """ Кэш в памяти процесса: вытеснение давно не используемых записей,
+        TTL и ограничения по числу записей (MAX_ENTRIES) и размеру (MAX_BYTES).
+
+        CACHES = {'default': {
+            'BACKEND': 'main.cache_backends.LRUCache',
+            'LOCATION': 'tracker',
+            'OPTIONS': {'MAX_ENTRIES': 10000, 'MAX_BYTES': 64 * 1024 * 1024},
+        }} """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        with _stores_lock:
+            self._store = _stores.setdefault(location, _Store())
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._store.lock:
+            if self._get_entry(key) is not None:
+                return False
+            self._put(key, pickled, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                return default
+            self._store.data.move_to_end(key)
+            pickled = entry[1]
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._store.lock:
+            self._put(key, pickled, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                return False
+            self._store.data[key] = (self.get_backend_timeout(timeout), entry[1])
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(entry[1]) + delta
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            # Время жизни не меняется, как и у остальных бэкендов Django
+            self._remove(key)
+            self._insert(key, entry[0], pickled)
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            return self._get_entry(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            return self._remove(key)
+
+    def clear(self):
+        with self._store.lock:
+            self._store.data.clear()
+            self._store.size = 0
+
+    # Внутренние методы вызываются под self._store.lock
+
+    def _get_entry(self, key):
+        entry = self._store.data.get(key)
+        if entry is None:
+            return None
+        expires = entry[0]
+        if expires is not None and expires <= time.time():
+            self._remove(key)
+            return None
+        return entry
+
+    def _put(self, key, pickled, timeout):
+        self._remove(key)
+        self._insert(key, self.get_backend_timeout(timeout), pickled)
+
+    def _insert(self, key, expires, pickled):
+        store = self._store
+        store.data[key] = (expires, pickled)
+        store.size += len(pickled)
+        # Вытесняем с «холодного» конца, пока не уложимся в оба лимита
+        while len(store.data) > 1 and (
+            len(store.data) > self._max_entries or store.size > self._max_bytes
+        ):
+            _, (_, evicted) = store.data.popitem(last=False)
+            store.size -= len(evicted)
+
+    def _remove(self, key):
+        entry = self._store.data.pop(key, None)
+        if entry is None:
+            return False
+        self._store.size -= len(entry[1])
+        return True
+
+
+class TieredCache(BaseCache):
+    """ Двухуровневый кэш: быстрый локальный (обычно LRUCache) перед общим
+        (Redis и т.п.). Записи идут в оба уровня, чтение — сначала из локального.
+        Локальная копия живёт не дольше LOCAL_TIMEOUT секунд: столько другой
+        процесс может видеть устаревшее значение после изменения.
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'main.cache_backends.TieredCache',
+                'OPTIONS': {'LOCAL': 'local', 'SHARED': 'shared', 'LOCAL_TIMEOUT': 5},
+            },
+            'local': {...},
+            'shared': {...},
+        } """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._local_alias = options.get('LOCAL', 'local')
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+
+    @property
+    def local(self):
+        return caches[self._local_alias]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_ttl(self, timeout):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        self.local.delete(key, version=version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        missing = object()
+        value = self.local.get(key, missing, version=version)
+        if value is not missing:
+            return value
+        value = self.shared.get(key, missing, version=version)
+        if value is missing:
+            return default
+        self.local.set(key, value, self._local_ttl(DEFAULT_TIMEOUT), version=version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self.local.set(key, value, self._local_ttl(timeout), version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self.local.delete(key, version=version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.local.has_key(key, version=version) or self.shared.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version=version)
+        return self.shared.delete(key, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
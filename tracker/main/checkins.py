@@ -0,0 +1,194 @@
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from .bitmaps import HabitBitmap
+from .cache import bump_user_version
+from .models import Habit, HabitLog
+from .rollups import refresh_daily_stats
+
+
+# Сколько отметок можно прислать одним запросом
+CHECK_IN_MAX_ITEMS = 500
+
+# Результаты по отдельным отметкам
+CREATED = 'created'          # лога не было — создан
+UPDATED = 'updated'          # лог был, поменялся is_done
+EXISTS = 'exists'            # такой же лог уже есть
+DUPLICATE = 'duplicate'      # та же привычка и дата уже были выше в запросе
+NOT_FOUND = 'not_found'      # привычки с таким slug у пользователя нет
+INVALID = 'invalid'          # ошибка в самой отметке
+
+
+class CheckInError(ValueError):
+    """ Запрос целиком неверный (не список, слишком много отметок) """
+
+
+def bulk_check_in(user, items, today):
+    """ Отмечает много (привычка, дата) за раз — например, неделю офлайн-отметок
+        с телефона. Запросов к базе одинаково мало при любом числе отметок:
+        привычки пользователя, существующие логи, один upsert и пересчёт статистики.
+
+        items — список словарей {'habit': slug, 'date': 'YYYY-MM-DD', 'is_done': true}.
+        Возвращает список результатов в том же порядке """
+    if not isinstance(items, list):
+        raise CheckInError('Ожидается список отметок')
+    if len(items) > CHECK_IN_MAX_ITEMS:
+        raise CheckInError(f'Не больше {CHECK_IN_MAX_ITEMS} отметок за запрос')
+
+    results = []
+    parsed = []
+    for item in items:
+        result, entry = parse_item(item, today)
+        results.append(result)
+        parsed.append(entry)
+
+    # Владение проверяем одним запросом по всем slug из запроса
+    slugs = {entry[0] for entry in parsed if entry}
+    habits = {
+        slug: (pk, start_date, archived_until, storage_mode)
+        for slug, pk, start_date, archived_until, storage_mode in Habit.objects.filter(
+            user=user, slug__in=slugs
+        ).values_list('slug', 'pk', 'start_date', 'archived_until', 'storage_mode')
+    }
+
+    # (habit_id, дата) -> (результат, is_done): отдельно для привычек
+    # со строками HabitLog и для привычек с историей в масках годов
+    wanted = {}
+    wanted_bits = {}
+    with_archive = False
+    for result, entry in zip(results, parsed):
+        if entry is None:
+            continue
+        slug, date, is_done = entry
+        if slug not in habits:
+            result['status'] = NOT_FOUND
+            continue
+        habit_id, start_date, archived_until, storage_mode = habits[slug]
+        if date < start_date:
+            result.update(status=INVALID, error='Дата раньше начала привычки')
+            continue
+        key = (habit_id, date)
+        if key in wanted or key in wanted_bits:
+            result['status'] = DUPLICATE
+            continue
+        if storage_mode == 'bitmap':
+            wanted_bits[key] = (result, is_done)
+            with_archive = True
+        else:
+            wanted[key] = (result, is_done)
+            # день уже в архиве: счётчики дня складываются из лога и архива
+            with_archive = with_archive or (archived_until is not None and date < archived_until)
+
+    # Маски сохраняются целиком, поэтому читаются под блокировкой в той же
+    # транзакции, что и запись: параллельная отметка не будет затёрта
+    with transaction.atomic():
+        logs = check_in_rows(wanted) if wanted else []
+        histories = check_in_bits(wanted_bits) if wanted_bits else []
+        days = {date for (_, date), (result, _) in wanted_bits.items() if result['status'] != EXISTS}
+        days.update(log.date for log in logs)
+
+        if days:
+            # bulk_create не шлёт сигналы: статистику и версию кэша обновляем сами.
+            # Upsert, а не ignore_conflicts — параллельная отметка за тот же день
+            # не потеряет is_done из этого запроса
+            if logs:
+                HabitLog.objects.bulk_create(
+                    logs,
+                    update_conflicts=True,
+                    unique_fields=['habit', 'date'],
+                    update_fields=['is_done'],
+                )
+            HabitBitmap.save_many(histories)
+            refresh_daily_stats({(user.pk, date) for date in days}, with_archive=with_archive)
+            transaction.on_commit(lambda: bump_user_version(user.pk))
+
+    return results
+
+
+def check_in_rows(wanted):
+    """ Статусы отметок привычек со строками HabitLog и логи для записи """
+    existing = {
+        (habit_id, date): is_done
+        for habit_id, date, is_done in HabitLog.objects.filter(
+            habit_id__in={habit_id for habit_id, _ in wanted},
+            date__in={date for _, date in wanted},
+        ).values_list('habit_id', 'date', 'is_done')
+    }
+
+    logs = []
+    for (habit_id, date), (result, is_done) in wanted.items():
+        if (habit_id, date) not in existing:
+            result['status'] = CREATED
+        elif existing[(habit_id, date)] != is_done:
+            result['status'] = UPDATED
+        else:
+            result['status'] = EXISTS
+            continue
+        logs.append(HabitLog(habit_id=habit_id, date=date, is_done=is_done))
+    return logs
+
+
+def check_in_bits(wanted):
+    """ То же для привычек с историей в масках: маски загружаются одним
+        запросом под блокировкой и меняются в памяти; вызывать внутри транзакции.
+        Возвращает изменённые HabitBitmap """
+    histories = HabitBitmap.load_many(
+        {habit_id for habit_id, _ in wanted},
+        {date.year for _, date in wanted},
+        for_update=True,
+    )
+    for (habit_id, date), (result, is_done) in wanted.items():
+        previous = histories[habit_id].set_day(date, is_done)
+        result['status'] = CREATED if previous is None else UPDATED if previous is not is_done else EXISTS
+    return [history for history in histories.values() if history.changed]
+
+
+def mark_done(habit, today):
+    """ Кнопка «Выполнено»: отметка за сегодня, если её ещё нет.
+        Лог (или бит в маске) и дневная статистика пишутся в одной транзакции.
+        Возвращает True, если отметка создана """
+    with transaction.atomic():
+        if habit.storage_mode != 'bitmap':
+            # статистику и кэш обновляет сигнал post_save
+            _, created = HabitLog.objects.get_or_create(
+                habit=habit,
+                date=today,
+                defaults={'is_done': True}
+            )
+            return created
+
+        history = HabitBitmap.load(habit.pk, today, today, for_update=True)
+        if history.test_day(today) is not None:
+            return False
+        history.set_day(today, True)
+        history.save()
+        refresh_daily_stats({(habit.user_id, today)}, with_archive=True)
+        transaction.on_commit(lambda: bump_user_version(habit.user_id))
+    return True
+
+
+def parse_item(item, today):
+    """ (результат, (slug, дата, is_done)) или (результат с ошибкой, None) """
+    if not isinstance(item, dict):
+        return {'status': INVALID, 'error': 'Ожидается объект'}, None
+
+    slug, raw_date = item.get('habit'), item.get('date')
+    result = {'habit': slug, 'date': raw_date}
+    is_done = item.get('is_done', True)
+    if not isinstance(slug, str) or not slug:
+        result.update(status=INVALID, error='Не указана привычка')
+        return result, None
+    if not isinstance(is_done, bool):
+        result.update(status=INVALID, error='is_done должен быть true или false')
+        return result, None
+    try:
+        date = parse_date(raw_date) if isinstance(raw_date, str) else None
+    except ValueError:
+        date = None
+    if date is None:
+        result.update(status=INVALID, error='Неверная дата')
+        return result, None
+    if date > today:
+        result.update(status=INVALID, error='Дата в будущем')
+        return result, None
+    return result, (slug, date, is_done)
@@ -0,0 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_user_version, USER_CACHE_TIMEOUT
+
+
+def fragment_cache(request):
+    """ Для {% cache %} в шаблонах: версия пользователя в ключе фрагмента
+        делает его устаревшим при любом изменении данных, как и cached_for_user.
+        Версия читается из кэша, только если шаблон её использует """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {
+        'cache_version': SimpleLazyObject(lambda: get_user_version(user.pk)),
+        'cache_timeout': USER_CACHE_TIMEOUT,
+    }
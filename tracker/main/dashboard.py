@@ -0,0 +1,107 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import Task, Habit
+from .cache import cached_for_user, acached_for_user
+from .progress import fill_progress, with_progress
+from .rollups import get_period_counts
+from .streaks import get_habit_stats
+
+
+# За сколько дней считаем прогресс привычек на главной
+PROGRESS_PERIOD_DAYS = 7
+# Сколько ближайших дедлайнов показываем
+NEAR_DEADLINES_LIMIT = 5
+
+
+def get_habit_progress(user, today=None):
+    """ Процент выполнения привычек за неделю.
+        Один запрос к дневной статистике, а не к логам """
+    today = today or timezone.now().date()
+    week_ago = today - timedelta(days=PROGRESS_PERIOD_DAYS)
+
+    total, done = get_period_counts(user, week_ago)
+
+    if total == 0:
+        return 0
+
+    return int(done / total * 100)
+
+
+def get_dashboard_context(user):
+    """ Данные для главной страницы.
+        Привычки с сериями и прогресс берутся из кэша пользователя """
+    today = timezone.now().date()
+    context = dict(cached_for_user(
+        user.pk, 'dashboard',
+        lambda: build_habit_dashboard(user, today),
+        today
+    ))
+    # ленивый queryset: запрос будет, только если шаблон его покажет
+    context['near_deadlines'] = get_near_deadlines(user)
+    return context
+
+
+async def aget_dashboard_context(user):
+    """ То же для async-views. Дедлайны и данные привычек не зависят
+        друг от друга, поэтому запрашиваются одновременно """
+    today = timezone.now().date()
+    dashboard, near_deadlines = await asyncio.gather(
+        acached_for_user(
+            user.pk, 'dashboard',
+            lambda: abuild_habit_dashboard(user, today),
+            today
+        ),
+        alist(get_near_deadlines(user)),
+    )
+    context = dict(dashboard)
+    context['near_deadlines'] = near_deadlines
+    return context
+
+
+def get_near_deadlines(user):
+    return Task.objects.filter(
+        user=user,
+        status__in=Task.OPEN_STATUSES
+    ).order_by('deadline')[:NEAR_DEADLINES_LIMIT]
+
+
+def build_habit_dashboard(user, today):
+    """ Списки сразу вычисляются, чтобы шаблон не делал своих запросов """
+    habits = list(with_progress(Habit.objects.filter(
+        user=user,
+        is_active=True
+    ), today))
+    fill_progress(habits, today)
+    # серии по всем активным привычкам — одним запросом и одним вызовом движка
+    stats = get_habit_stats(habits, today=today)
+    for habit in habits:
+        habit.stats = stats[habit.pk]
+
+    return {
+        'habits': habits,
+        'habit_progress': get_habit_progress(user, today=today),
+    }
+
+
+async def abuild_habit_dashboard(user, today):
+    habits, habit_progress = await asyncio.gather(
+        alist(with_progress(Habit.objects.filter(user=user, is_active=True), today)),
+        sync_to_async(get_habit_progress)(user, today=today),
+    )
+    await sync_to_async(fill_progress)(habits, today)
+    stats = await sync_to_async(get_habit_stats)(habits, today=today)
+    for habit in habits:
+        habit.stats = stats[habit.pk]
+
+    return {
+        'habits': habits,
+        'habit_progress': habit_progress,
+    }
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
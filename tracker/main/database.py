@@ -0,0 +1,61 @@
+""" Настройка SQLite под параллельные запросы и необязательная реплика для чтения.
+
+    PRAGMA применяются к каждому новому соединению (сигнал connection_created
+    в signals.py): WAL позволяет читать во время записи, busy_timeout заставляет
+    писателя ждать блокировку вместо мгновенного «database is locked»,
+    synchronous=NORMAL в режиме WAL безопасен и не делает fsync на каждый коммит.
+
+    Реплика — копия базы в отдельном файле (DATABASES['replica'], например
+    litestream или периодический .backup). ReplicaRouter отправляет на неё
+    чтение только внутри read_from_replica(); всё остальное идёт в default """
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+REPLICA_ALIAS = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def apply_pragmas(connection):
+    """ Выставляет SQLITE_PRAGMAS из settings на соединение SQLite """
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через sqlite3, мимо счётчиков запросов: это не запросы приложения
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def read_from_replica():
+    """ Чтение внутри блока уходит на реплику, если она настроена """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """ Подключается в DATABASE_ROUTERS, только если задан TRACKER_REPLICA.
+        На реплику уходят только модели приложения main """
+
+    def db_for_read(self, model, **hints):
+        # Сессии и пользователи читаются из основной базы: только что
+        # выполненный вход мог ещё не дойти до реплики
+        if _use_replica.get() and model._meta.app_label == 'main':
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — та же база, объекты из обеих можно связывать
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплика получает вместе с копией файла
+        return db != REPLICA_ALIAS
@@ -13,7 +13,7 @@ class TaskFilterForm(forms.Form):
         required=False,
         label='',
         widget=forms.TextInput(attrs={
-            'placeholder': 'Поиск по названию задачи'
+            'placeholder': 'Поиск по названию и описанию задачи'
         })
     )
 
@@ -0,0 +1,84 @@
+import base64
+import hashlib
+from datetime import timedelta
+from itertools import chain
+
+from django.db.models import Max
+
+from .bitmaps import archived_logs, set_bit
+from .models import HabitLog, HabitDailyStat
+
+
+# Период по умолчанию и максимальный период одного запроса
+HEATMAP_DEFAULT_DAYS = 365
+HEATMAP_MAX_DAYS = 366 * 10
+# Размер пачки при чтении логов через iterator()
+HEATMAP_CHUNK_SIZE = 2000
+
+
+def encode_bits(bits):
+    return base64.b64encode(bytes(bits)).decode('ascii')
+
+
+def build_heatmap(habit, start, end):
+    """ История привычки за [start, end] в виде двух битовых масок:
+        done — выполненные дни, missed — дни с отметкой «пропуск».
+        ORM-объекты не создаются: читаем только пары (date, is_done),
+        а дни старше Habit.archived_until — из архива (bitmaps.py) """
+    days = (end - start).days + 1
+    done = bytearray((days + 7) // 8)
+    missed = bytearray((days + 7) // 8)
+    done_count = 0
+
+    rows = HabitLog.objects.filter(
+        habit=habit,
+        date__range=(start, end)
+    ).order_by().values_list('date', 'is_done')
+
+    if habit.storage_mode == 'bitmap':
+        # Вся история в масках годов, строк нет
+        archived = archived_logs([habit.pk], start=start, end=end)
+        rows = chain(((day, is_done) for _, _, day, is_done in archived), rows.iterator(chunk_size=HEATMAP_CHUNK_SIZE))
+    elif habit.archived_until is not None and start < habit.archived_until:
+        # Начало периода уже в архиве: дни из масок годов
+        archived = archived_logs([habit.pk], start=start, end=min(end, habit.archived_until - timedelta(days=1)))
+        rows = chain(((day, is_done) for _, _, day, is_done in archived), rows.iterator(chunk_size=HEATMAP_CHUNK_SIZE))
+    else:
+        rows = rows.iterator(chunk_size=HEATMAP_CHUNK_SIZE)
+
+    for day, is_done in rows:
+        offset = (day - start).days
+        if is_done:
+            set_bit(done, offset)
+            done_count += 1
+        else:
+            set_bit(missed, offset)
+
+    return {
+        'habit': habit.slug,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': days,
+        'encoding': 'bitset-lsb-base64',
+        'done': encode_bits(done),
+        'missed': encode_bits(missed),
+        'done_count': done_count,
+    }
+
+
+def get_heatmap_validators(habit, start, end):
+    """ (etag, last_modified) для условного GET.
+        Любая запись лога обновляет дневную статистику пользователя,
+        поэтому её updated_at — дешёвая отметка «данные менялись» """
+    last_modified = HabitDailyStat.objects.filter(
+        user_id=habit.user_id
+    ).aggregate(last=Max('updated_at'))['last']
+
+    stamp = last_modified.isoformat() if last_modified else 'empty'
+    key = f'{habit.pk}:{habit.slug}:{start}:{end}:{stamp}'
+    etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+    return etag, last_modified
+
+
+def default_period(today):
+    return today - timedelta(days=HEATMAP_DEFAULT_DAYS - 1), today
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from main.bitmaps import archive_cutoff, run, ARCHIVE_AFTER_DAYS, USER_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Переносит логи привычек старше горизонта из HabitLog в годовые '
+            'битовые маски (HabitYearBitmap). Запускается по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', type=parse_date,
+            help='Архивировать логи раньше этой даты YYYY-MM-DD '
+                 f'(по умолчанию сегодня минус {ARCHIVE_AFTER_DAYS} дней)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=USER_CHUNK_SIZE,
+            help='пользователей в одной транзакции'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='начать с первого пользователя, даже если есть незавершённый прогон'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = options['before'] or archive_cutoff(timezone.now().date())
+        started = time.perf_counter()
+        users, logs = run(
+            cutoff, chunk_size=options['chunk_size'], restart=options['restart'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'В архив до {cutoff}: {logs} логов, пользователей {users}, '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main.transfer import export_lines, FORMATS, KINDS, TransferError
+
+
+class Command(BaseCommand):
+    help = 'Выгружает задачи, привычки и логи пользователя в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='имя пользователя')
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--kind', choices=KINDS, help='что выгружать (для CSV обязательно)')
+        parser.add_argument('--output', '-o', help='файл (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['username']} не найден")
+
+        try:
+            lines = export_lines(user, options['format'], options['kind'])
+        except TransferError as error:
+            raise CommandError(str(error))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+        else:
+            self.stdout.ending = ''
+            for line in lines:
+                self.stdout.write(line)
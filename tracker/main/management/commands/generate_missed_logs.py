@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from main.missed import run, USER_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Проставляет пропуски (логи с is_done=False) по активным привычкам '
+            'за прошедшие периоды без отметок. Запускается по расписанию раз в сутки')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date', type=parse_date,
+            help='Последний проверяемый день YYYY-MM-DD (по умолчанию вчера)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=USER_CHUNK_SIZE,
+            help='пользователей в одной транзакции'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='начать с первого пользователя, даже если есть незавершённый прогон'
+        )
+
+    def handle(self, *args, **options):
+        until = options['date'] or timezone.now().date() - timedelta(days=1)
+        started = time.perf_counter()
+        users, logs = run(
+            until, chunk_size=options['chunk_size'], restart=options['restart'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пропусков по {until}: {logs}, пользователей {users}, '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
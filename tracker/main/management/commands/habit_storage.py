@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.bitmaps import convert_storage
+from main.models import Habit
+
+
+class Command(BaseCommand):
+    help = ('Переводит привычки между хранением истории строками HabitLog '
+            'и битовыми масками по годам (HabitYearBitmap)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'mode', choices=[mode for mode, _ in Habit.STORAGE_CHOICES],
+            help='новый режим хранения'
+        )
+        parser.add_argument('--habits', nargs='*', type=int, help='id привычек')
+        parser.add_argument('--users', nargs='*', type=int, help='все привычки этих пользователей')
+
+    def handle(self, *args, **options):
+        if not options['habits'] and not options['users']:
+            raise CommandError('Укажите --habits или --users')
+        habits = Habit.objects.exclude(storage_mode=options['mode']).order_by('pk')
+        if options['habits']:
+            habits = habits.filter(pk__in=options['habits'])
+        if options['users']:
+            habits = habits.filter(user_id__in=options['users'])
+
+        converted = days = 0
+        for habit in habits.iterator():
+            days += convert_storage(habit, options['mode'])
+            converted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Привычек переведено в режим {options["mode"]}: {converted}, перенесено дней {days}'
+        ))
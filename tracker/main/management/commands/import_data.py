@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main.transfer import import_records, read_records, FORMATS, KINDS, TransferError
+
+
+class Command(BaseCommand):
+    help = 'Загружает задачи, привычки и логи пользователю из NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='имя пользователя')
+        parser.add_argument('path', help='файл для загрузки')
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--kind', choices=KINDS, help='что в файле (для CSV обязательно)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['username']} не найден")
+
+        with open(options['path'], 'rb') as stream:
+            try:
+                summary = import_records(user, read_records(stream, options['format'], options['kind']))
+            except TransferError as error:
+                raise CommandError(str(error))
+
+        for error in summary['errors']:
+            self.stderr.write(f"строка {error['line']}: {error['error']}")
+        imported = summary['imported']
+        self.stdout.write(self.style.SUCCESS(
+            f"Загружено задач: {imported['tasks']}, привычек: {imported['habits']}, логов: {imported['logs']}; "
+            f"ошибок: {summary['error_count']}"
+        ))
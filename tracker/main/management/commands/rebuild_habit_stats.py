@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from main.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает дневную статистику привычек (HabitDailyStat) по логам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя (можно указать несколько раз)'
+        )
+        parser.add_argument(
+            '--since', type=parse_date,
+            help='Пересчитать только дни начиная с даты YYYY-MM-DD'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = rebuild_daily_stats(user_ids=options['users'], since=options['since'])
+        self.stdout.write(self.style.SUCCESS(f'Записано строк статистики: {written}'))
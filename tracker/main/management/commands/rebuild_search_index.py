@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import Task, Habit
+from main.search import get_backend
+
+
+# Сколько объектов индексируется за раз
+BATCH_SIZE = 2000
+# Тип в индексе, модель и поля, которые нужны для индексации
+SOURCES = (
+    ('task', Task, ('user_id', 'title', 'description')),
+    ('habit', Habit, ('user_id', 'title')),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс задач и привычек'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        with transaction.atomic():
+            backend.clear()
+            for kind, model, fields in SOURCES:
+                batch = []
+                indexed = 0
+                queryset = model.objects.order_by('pk').only(*fields)
+                for obj in queryset.iterator(chunk_size=BATCH_SIZE):
+                    batch.append(obj)
+                    if len(batch) >= BATCH_SIZE:
+                        backend.index(kind, batch)
+                        indexed += len(batch)
+                        batch = []
+                backend.index(kind, batch)
+                indexed += len(batch)
+                self.stdout.write(f'{kind}: {indexed}')
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран'))
@@ -0,0 +1,195 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from main import metrics, urls
+from main.models import Task, Habit
+
+
+# Маршруты, которые не меряем: выход разлогинит клиента посреди прогона
+SKIP = {'logout'}
+# Дополнительные варианты GET-запросов: (имя маршрута, параметры)
+VARIANTS = (
+    ('task', {'sort': 'deadline'}),
+    ('task', {'sort': '-priority'}),
+    ('task', {'search': 'отчёт'}),
+    ('habit', {'active': 'true'}),
+    ('export', {'format': 'csv', 'kind': 'logs'}),
+    ('analytics_api', {'period': 'month'}),
+)
+# Порог регрессии p95 при сравнении с --baseline: во сколько раз и на сколько мс
+P95_REGRESSION = 1.25
+P95_REGRESSION_MIN_MS = 2
+
+
+def post_payloads(habit_slug, today):
+    """ Аргументы client.post для маршрутов, которые принимают только POST.
+        Функции, а не словари: загружаемый файл читается один раз """
+    check_ins = [{'habit': habit_slug, 'date': str(today - timedelta(days=d))} for d in range(7)]
+    import_lines = ''.join(
+        json.dumps({'type': 'task', 'title': f'Импорт {i}', 'deadline': str(today)}, ensure_ascii=False) + '\n'
+        for i in range(50)
+    ).encode()
+    return {
+        'habit_mark_done': lambda: {},
+        'habit_check_in': lambda: {
+            'data': json.dumps({'items': check_ins}),
+            'content_type': 'application/json',
+        },
+        'import': lambda: {'data': {'file': SimpleUploadedFile('bench.ndjson', import_lines)}},
+    }
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все маршруты main/urls.py через тестовый клиент и выводит JSON: '
+            'запросы к БД, p50/p95 и пиковую память. Изменения в базе откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='пользователь, от имени которого идут запросы (по умолчанию seed0)')
+        parser.add_argument('--repeat', type=int, default=20, help='повторов на маршрут')
+        parser.add_argument('--output', '-o', help='записать JSON в файл')
+        parser.add_argument('--baseline', help='JSON прошлого прогона: показать регрессии')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='код выхода 1, если есть регрессии')
+
+    def handle(self, *args, **options):
+        username = options['user'] or 'seed0'
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден — сначала manage.py seed_data')
+
+        # DEBUG выключен, как в продакшене: без debug_toolbar и накопления connection.queries
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            results = self.run_all(user, options['repeat'])
+
+        report = {
+            'meta': {
+                'user': username,
+                'repeat': options['repeat'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'tasks': Task.objects.filter(user=user).count(),
+                'habits': Habit.objects.filter(user=user).count(),
+                'created': timezone.now().isoformat(),
+            },
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            regressions = self.compare(options['baseline'], results)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def run_all(self, user, repeat):
+        client = Client()
+        client.force_login(user)
+        today = timezone.now().date()
+        task_slug = Task.objects.filter(user=user).values_list('slug', flat=True).first()
+        habit_slug = Habit.objects.filter(user=user).values_list('slug', flat=True).first()
+        payloads = post_payloads(habit_slug, today)
+
+        targets = []
+        for pattern in urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or pattern.name in SKIP:
+                continue
+            kwargs = {}
+            if 'slug' in pattern.pattern.converters:
+                kwargs['slug'] = habit_slug if 'habit' in pattern.name else task_slug
+                if kwargs['slug'] is None:
+                    continue
+            targets.append((pattern.name, reverse(pattern.name, kwargs=kwargs), {}))
+        targets += [(name, reverse(name), params) for name, params in VARIANTS]
+
+        results = {}
+        for name, url, params in targets:
+            key = f'{name}?{"&".join(f"{k}={v}" for k, v in params.items())}' if params else name
+            results[key] = self.measure(client, name, url, params, payloads, repeat)
+            self.stderr.write(
+                f"{key:<35} {results[key]['status']}  запросов {results[key]['queries']:>3} "
+                f"(холодный кэш {results[key]['queries_cold']:>3})  "
+                f"p50 {results[key]['p50_ms']:8.2f} мс  p95 {results[key]['p95_ms']:8.2f} мс"
+            )
+        return results
+
+    def measure(self, client, name, url, params, payloads, repeat):
+        def request():
+            # Каждый запрос в своей транзакции с откатом: прогон не меняет базу
+            with transaction.atomic(), metrics.collect() as stats:
+                if name in payloads:
+                    response = client.post(url, **payloads[name]())
+                else:
+                    response = client.get(url, params)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                transaction.set_rollback(True)
+            return response, stats
+
+        cache.clear()
+        _, cold = request()
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response, warm = request()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': warm.queries,
+            'queries_cold': cold.queries,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, baseline_path, results):
+        with open(baseline_path, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+
+        regressions = []
+        for key, current in results.items():
+            previous = baseline.get(key)
+            if previous is None:
+                continue
+            if current['queries'] > previous['queries'] or current['queries_cold'] > previous['queries_cold']:
+                regressions.append(
+                    f"{key}: запросов {previous['queries']}/{previous['queries_cold']} -> "
+                    f"{current['queries']}/{current['queries_cold']}"
+                )
+            if (current['p95_ms'] > previous['p95_ms'] * P95_REGRESSION
+                    and current['p95_ms'] - previous['p95_ms'] > P95_REGRESSION_MIN_MS):
+                regressions.append(f"{key}: p95 {previous['p95_ms']} -> {current['p95_ms']} мс")
+
+        for line in regressions:
+            self.stderr.write(self.style.WARNING(line))
+        if not regressions:
+            self.stderr.write(self.style.SUCCESS('Регрессий относительно baseline нет'))
+        return regressions
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.seeding import seed_users, SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу пользователями с задачами, привычками и историей отметок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tasks', type=int, default=200, help='задач на пользователя')
+        parser.add_argument('--habits', type=int, default=10, help='привычек на пользователя')
+        parser.add_argument('--years', type=int, default=3, help='глубина истории отметок')
+        parser.add_argument('--prefix', default='seed', help='префикс имён пользователей')
+        parser.add_argument('--seed', type=int, default=42, help='зерно генератора (одинаковые данные)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        logs = seed_users(
+            options['users'], options['tasks'], options['habits'], options['years'],
+            prefix=options['prefix'], seed=options['seed'], stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Логов создано: {logs} за {time.perf_counter() - started:.1f} с. '
+            f"Пароль пользователей {options['prefix']}N: {SEED_PASSWORD}"
+        ))
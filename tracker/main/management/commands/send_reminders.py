@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from main.notifications import deliver_pending
+from main.reminders import sweep, REMINDER_LEAD_DAYS, SWEEP_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Находит задачи с близким и прошедшим дедлайном у всех пользователей, '
+            'ставит напоминания в очередь уведомлений и отправляет очередь. '
+            'Запускается по расписанию, например раз в час')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=parse_date, help='Считать сегодняшней дату YYYY-MM-DD')
+        parser.add_argument('--lead-days', type=int, default=REMINDER_LEAD_DAYS,
+                            help='за сколько дней до дедлайна напоминать')
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help='задач в пачке обхода')
+        parser.add_argument('--no-deliver', action='store_true', help='только поставить в очередь')
+
+    def handle(self, *args, **options):
+        today = options['date'] or timezone.now().date()
+        result = sweep(
+            today, options['lead_days'], options['batch_size'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(
+            f"Просмотрено задач: {result['scanned']} за {result['batches']} пачек "
+            f"(самая долгая {result['max_batch_ms']:.1f} мс). "
+            f"Напоминаний: о дедлайне {result['due']}, о просрочке {result['overdue']}"
+        )
+        if not options['no_deliver']:
+            sent, failed = deliver_pending()
+            style = self.style.WARNING if failed else self.style.SUCCESS
+            self.stdout.write(style(f'Отправлено уведомлений: {sent}, с ошибкой: {failed}'))
@@ -0,0 +1,189 @@
+""" Метрики запросов без DEBUG и debug_toolbar: число и время SQL-запросов,
+    попадания в кэш пользователя и общее время по каждому view.
+
+    RequestMetricsMiddleware считает их для каждого запроса, пишет заголовок
+    Server-Timing и складывает последние METRICS_WINDOW замеров каждого view
+    в память процесса — из них MetricsView отдаёт перцентили """
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних запросов каждого view хранится для перцентилей
+METRICS_WINDOW = getattr(settings, 'METRICS_WINDOW', 1000)
+# Сколько SQL-запросов допустимо на HTTP-запрос, если в settings нет QUERY_BUDGET
+DEFAULT_QUERY_BUDGET = 30
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+# Счётчики текущего запроса. В async-views ORM работает в отдельном потоке,
+# но контекст туда копируется, и объект счётчиков остаётся тем же
+_current = ContextVar('request_stats', default=None)
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=METRICS_WINDOW))  # view -> (время, запросы, время БД)
+_totals = defaultdict(int)            # view -> число запросов за всё время
+_over_budget = defaultdict(int)       # view -> сколько раз превышен бюджет
+
+
+def record_cache(hit):
+    """ Вызывается из cache.py при каждом обращении к кэшу пользователя """
+    stats = _current.get()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+
+
+def install_query_counter(connection):
+    """ Счётчик стоит на соединении постоянно и пишет в счётчики текущего
+        запроса, если они есть. Соединения у Django свои в каждом потоке, а
+        async ORM работает в рабочем потоке — поэтому счётчик ставится при
+        создании соединения (сигнал connection_created), а не на время запроса """
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@contextmanager
+def collect():
+    """ Считает запросы ко всем базам и обращения к кэшу внутри блока.
+        Вложенный блок (middleware внутри замера) добавляет свои счётчики к внешнему """
+    for connection in connections.all(initialized_only=True):
+        install_query_counter(connection)
+    parent = _current.get()
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if parent is not None:
+            parent.queries += stats.queries
+            parent.db_time += stats.db_time
+            parent.cache_hits += stats.cache_hits
+            parent.cache_misses += stats.cache_misses
+
+
+def query_budget(view_name):
+    """ Бюджет view: QUERY_BUDGETS[имя view] или общий QUERY_BUDGET """
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(view_name, getattr(settings, 'QUERY_BUDGET', DEFAULT_QUERY_BUDGET))
+
+
+def record(view_name, wall_time, stats):
+    with _lock:
+        _samples[view_name].append((wall_time, stats.queries, stats.db_time))
+        _totals[view_name] += 1
+        budget = query_budget(view_name)
+        over_budget = stats.queries > budget
+        if over_budget:
+            _over_budget[view_name] += 1
+    if over_budget:
+        logger.warning(
+            'View %s: %d SQL-запросов при бюджете %d (%.1f мс в БД)',
+            view_name, stats.queries, budget, stats.db_time * 1000
+        )
+
+
+def snapshot():
+    """ Сводка по view: число запросов, перцентили времени (мс), средние по БД """
+    with _lock:
+        samples = {name: list(values) for name, values in _samples.items()}
+        totals = dict(_totals)
+        over_budget = dict(_over_budget)
+
+    result = {}
+    for name, values in sorted(samples.items()):
+        wall_times = sorted(wall for wall, _, _ in values)
+        result[name] = {
+            'count': totals[name],
+            'over_budget': over_budget.get(name, 0),
+            'quantiles': {q: _percentile(wall_times, q) * 1000 for q in QUANTILES},
+            'avg_queries': sum(queries for _, queries, _ in values) / len(values),
+            'avg_db_ms': sum(db for _, _, db in values) / len(values) * 1000,
+        }
+    return result
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _totals.clear()
+        _over_budget.clear()
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def server_timing(wall_time, stats):
+    return ', '.join([
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'cache;desc="hit={stats.cache_hits} miss={stats.cache_misses}"',
+        f'total;dur={wall_time * 1000:.1f}',
+    ])
+
+
+class RequestMetricsMiddleware:
+    """ Ставится первым в MIDDLEWARE, чтобы время включало остальные middleware.
+        Работает и с обычными, и с async-views """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with collect() as stats:
+            response = self.get_response(request)
+        return self.finish(request, response, time.perf_counter() - started, stats)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with collect() as stats:
+            response = await self.get_response(request)
+        return self.finish(request, response, time.perf_counter() - started, stats)
+
+    def finish(self, request, response, wall_time, stats):
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name or match._func_path) if match else 'unresolved'
+        record(view_name, wall_time, stats)
+        response['Server-Timing'] = server_timing(wall_time, stats)
+        return response
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_daily_stats(apps, schema_editor):
+    # Заполняем статистику по уже существующим логам
+    HabitLog = apps.get_model('main', 'HabitLog')
+    HabitDailyStat = apps.get_model('main', 'HabitDailyStat')
+    rows = HabitLog.objects.order_by().values_list('habit__user_id', 'date').annotate(
+        total=Count('pk'),
+        done=Count('pk', filter=Q(is_done=True))
+    )
+    HabitDailyStat.objects.bulk_create(
+        (HabitDailyStat(user_id=user_id, date=date, total=total, done=done)
+         for user_id, date, total, done in rows.iterator()),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего отметок')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Выполнено')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='habit_daily_stat', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Статистика за день',
+                'verbose_name_plural': 'Статистика за день',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_habit_daily_stat')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
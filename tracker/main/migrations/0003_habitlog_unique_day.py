@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:31
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def remove_duplicate_logs(apps, schema_editor):
+    # Перед уникальным ограничением убираем дубли (habit, date):
+    # оставляем одну запись, выполненная важнее пропуска
+    HabitLog = apps.get_model('main', 'HabitLog')
+    HabitDailyStat = apps.get_model('main', 'HabitDailyStat')
+
+    duplicates = HabitLog.objects.order_by().values('habit_id', 'date').annotate(
+        rows=Count('pk')
+    ).filter(rows__gt=1)
+
+    touched = set()
+    for row in list(duplicates):
+        logs = HabitLog.objects.filter(habit_id=row['habit_id'], date=row['date'])
+        keep = logs.order_by('-is_done', 'pk').values_list('pk', flat=True).first()
+        logs.exclude(pk=keep).delete()
+        touched.add((row['habit_id'], row['date']))
+
+    # Дневная статистика считалась с дублями — пересчитываем затронутые дни
+    for habit_id, date in touched:
+        user_id = HabitLog.objects.filter(habit_id=habit_id).values_list('habit__user_id', flat=True).first()
+        counts = HabitLog.objects.filter(habit__user_id=user_id, date=date).aggregate(
+            total=Count('pk'),
+            done=Count('pk', filter=Q(is_done=True))
+        )
+        HabitDailyStat.objects.update_or_create(user_id=user_id, date=date, defaults=counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_habitdailystat'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_logs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='habitlog',
+            index=models.Index(fields=['habit', 'date', 'is_done'], name='habitlog_habit_date_done_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='habitlog',
+            constraint=models.UniqueConstraint(fields=('habit', 'date'), name='unique_habit_log_per_day'),
+        ),
+    ]
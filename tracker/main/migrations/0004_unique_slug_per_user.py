@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_slugs(apps, schema_editor):
+    # Перед ограничением (user, slug) переименовываем повторы: base-1, base-2 ...
+    for model_name in ('Task', 'Habit'):
+        Model = apps.get_model('main', model_name)
+        duplicates = Model.objects.order_by().values('user_id', 'slug').annotate(
+            rows=Count('pk')
+        ).filter(rows__gt=1)
+        for row in list(duplicates):
+            taken = set(Model.objects.filter(user_id=row['user_id']).values_list('slug', flat=True))
+            objects = Model.objects.filter(user_id=row['user_id'], slug=row['slug']).order_by('pk')
+            counter = 1
+            for obj in objects[1:]:
+                while f"{row['slug']}-{counter}" in taken:
+                    counter += 1
+                obj.slug = f"{row['slug']}-{counter}"
+                taken.add(obj.slug)
+                obj.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_habitlog_unique_day'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='habit',
+            constraint=models.UniqueConstraint(fields=('user', 'slug'), name='unique_habit_slug_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('user', 'slug'), name='unique_task_slug_per_user'),
+        ),
+    ]
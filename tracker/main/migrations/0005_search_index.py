@@ -0,0 +1,93 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:39
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+FTS_TABLE = 'main_search_index'
+KINDS = {'task': 0, 'habit': 1}
+TITLE_WEIGHT = 3
+
+
+def normalize(text):
+    return (text or '').casefold().replace('ё', 'е')
+
+
+def documents(apps):
+    # (тип, id, владелец, название, описание) всех задач и привычек
+    Task = apps.get_model('main', 'Task')
+    Habit = apps.get_model('main', 'Habit')
+    for pk, user_id, title, description in Task.objects.values_list('pk', 'user_id', 'title', 'description').iterator():
+        yield 'task', pk, user_id, normalize(title), normalize(description)
+    for pk, user_id, title in Habit.objects.values_list('pk', 'user_id', 'title').iterator():
+        yield 'habit', pk, user_id, normalize(title), ''
+
+
+def create_search_index(apps, schema_editor):
+    # На SQLite — виртуальная таблица FTS5, на остальных базах — SearchTerm
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            'owner, title, description, tokenize="unicode61 remove_diacritics 2")'
+        )
+        rows = [
+            (pk * 2 + KINDS[kind], f'u{user_id}', title, description)
+            for kind, pk, user_id, title, description in documents(apps)
+        ]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, owner, title, description) VALUES (%s, %s, %s, %s)',
+                rows
+            )
+        return
+
+    SearchTerm = apps.get_model('main', 'SearchTerm')
+    word = re.compile(r'\w+')
+    terms = []
+    for kind, pk, user_id, title, description in documents(apps):
+        weights = {}
+        for term in word.findall(description):
+            weights[term] = weights.get(term, 0) + 1
+        for term in word.findall(title):
+            weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+        terms.extend(
+            SearchTerm(user_id=user_id, kind=kind, object_id=pk, term=term[:64], weight=weight)
+            for term, weight in weights.items()
+        )
+    SearchTerm.objects.bulk_create(terms, batch_size=2000)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_unique_slug_per_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Задача'), ('habit', 'Привычка')], max_length=10, verbose_name='Тип объекта')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='Вес')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_term', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Поисковый термин',
+                'verbose_name_plural': 'Поисковые термины',
+                'indexes': [models.Index(fields=['user', 'kind', 'term'], name='searchterm_user_kind_term_idx'), models.Index(fields=['kind', 'object_id'], name='searchterm_kind_object_idx')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Задача')),
+                ('target_date', models.DateField(verbose_name='Обрабатываемая дата')),
+                ('last_user_id', models.BigIntegerField(default=0, verbose_name='Последний обработанный пользователь')),
+                ('finished', models.BooleanField(default=False, verbose_name='Завершена')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка задачи',
+                'verbose_name_plural': 'Контрольные точки задач',
+            },
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='missed_checked_until',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Пропуски проставлены по'),
+        ),
+    ]
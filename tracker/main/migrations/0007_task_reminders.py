@@ -0,0 +1,85 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Значения, которые раньше записывались по умолчанию и не совпадали с choices
+LEGACY_STATUSES = {'Todo': 'todo', 'In_progress': 'in_progress', 'Done': 'done'}
+
+
+def fix_statuses(apps, schema_editor):
+    Task = apps.get_model('main', 'Task')
+    for old, new in LEGACY_STATUSES.items():
+        Task.objects.filter(status=old).update(status=new)
+    # Об уже просроченных задачах не напоминаем задним числом
+    Task.objects.filter(
+        status__in=('todo', 'in_progress'),
+        deadline__lt=timezone.now().date()
+    ).update(reminder_stage=2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_missed_logs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task_due', 'Скоро дедлайн'), ('task_overdue', 'Дедлайн прошёл')], max_length=30, verbose_name='Тип')),
+                ('message', models.TextField(verbose_name='Текст')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток отправки')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Уведомление',
+                'verbose_name_plural': 'Уведомления',
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='reminder_stage',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Нет'), (1, 'О близком дедлайне'), (2, 'О просрочке')], default=0, editable=False, verbose_name='Напоминание'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='status',
+            field=models.CharField(choices=[('todo', 'Не начал'), ('in_progress', 'В процессе'), ('done', 'Сделано')], default='todo', max_length=30, verbose_name='Статус'),
+        ),
+        migrations.RunPython(fix_statuses, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'status', 'deadline'], name='task_user_status_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'reminder_stage', 'deadline', 'id'], name='task_reminder_sweep_idx'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='task',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='main.task', verbose_name='Задача'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['id'], name='notification_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('task', 'kind'), name='unique_task_notification'),
+        ),
+    ]
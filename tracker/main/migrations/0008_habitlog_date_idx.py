@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_task_reminders'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habitlog',
+            index=models.Index(fields=['date'], name='habitlog_date_idx'),
+        ),
+    ]
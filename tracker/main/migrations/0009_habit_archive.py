@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_habitlog_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='archived_until',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Логи до этой даты в архиве'),
+        ),
+        migrations.CreateModel(
+            name='HabitYearBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год')),
+                ('done', models.BinaryField(verbose_name='Выполненные дни')),
+                ('missed', models.BinaryField(verbose_name='Пропущенные дни')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='year_bitmaps', to='main.habit', verbose_name='Привычка')),
+            ],
+            options={
+                'verbose_name': 'Архив привычки за год',
+                'verbose_name_plural': 'Архив привычек',
+                'constraints': [models.UniqueConstraint(fields=('habit', 'year'), name='unique_habit_year_bitmap')],
+            },
+        ),
+    ]
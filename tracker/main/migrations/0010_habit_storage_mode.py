@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_habit_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='storage_mode',
+            field=models.CharField(choices=[('rows', 'Лог на каждый день'), ('bitmap', 'Битовые маски по годам')], default='rows', editable=False, max_length=10, verbose_name='Хранение истории'),
+        ),
+    ]
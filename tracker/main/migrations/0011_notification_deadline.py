@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_habit_storage_mode'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='notification',
+            name='unique_task_notification',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='deadline',
+            field=models.DateField(blank=True, null=True, verbose_name='Дедлайн'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('task', 'kind', 'deadline'), name='unique_task_notification'),
+        ),
+    ]
@@ -0,0 +1,192 @@
+""" Пропуски привычек: за каждый прошедший период частоты без отметки
+    пишется лог с is_done=False. Без них прогресс считался бы только по
+    дням с отметками и был бы завышен.
+
+    Периоды отсчитываются от start_date, как в streaks.py: для Weekly это
+    недели от начала привычки. Пропуск ставится на последний день периода.
+    Habit.missed_checked_until — по какую дату привычка уже проверена,
+    поэтому каждую ночь смотрятся только новые периоды; у выключенных
+    привычек она тоже сдвигается, без пропусков. У привычек со
+    storage_mode='bitmap' пропуск — бит в маске года (bitmaps.py). Отметки
+    из архива (archived_until) тоже закрывают период: иначе пропуск-строка
+    перекрыла бы выполненный день из маски """
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .bitmaps import archived_logs, HabitBitmap
+from .cache import bump_user_version
+from .models import Habit, HabitLog, JobCheckpoint
+from .rollups import rebuild_daily_stats
+from .streaks import FREQUENCY_PERIODS
+
+
+JOB_NAME = 'generate_missed_logs'
+# Сколько пользователей обрабатывается в одной транзакции
+USER_CHUNK_SIZE = 500
+# Сколько логов пишет один bulk_create
+LOG_BATCH_SIZE = 5000
+
+
+def missed_periods(start_date, period, checked_until, until):
+    """ (первый день, последний день) периодов, закончившихся после
+        checked_until и не позже until """
+    first = start_date if checked_until is None else max(start_date, checked_until + timedelta(days=1))
+    # первый период, который заканчивается не раньше first
+    k_min = (first - start_date).days // period
+    # последний период, который целиком уже прошёл
+    k_max = ((until - start_date).days + 1) // period - 1
+    return [
+        (start_date + timedelta(days=k * period), start_date + timedelta(days=(k + 1) * period - 1))
+        for k in range(k_min, k_max + 1)
+    ]
+
+
+def generate_for_users(user_ids, until):
+    """ Пропуски по активным привычкам пользователей по дату until включительно.
+        Запросы: привычки, отметка выключенных, логи за проверяемый диапазон,
+        вставка пачками, пересчёт счётчиков и отметка проверенной даты.
+        Возвращает число новых логов """
+    habits = list(Habit.objects.filter(
+        user_id__in=user_ids,
+        is_active=True,
+        start_date__lte=until,
+    ).exclude(
+        missed_checked_until__gte=until
+    ).values_list(
+        'pk', 'user_id', 'start_date', 'frequency', 'missed_checked_until', 'storage_mode', 'archived_until'
+    ))
+    # Выключенные привычки тоже считаются проверенными: после включения
+    # пропуски пойдут с этого дня, а не за всё время, пока она была выключена
+    Habit.objects.filter(
+        user_id__in=user_ids,
+        is_active=False,
+    ).exclude(
+        missed_checked_until__gte=until
+    ).update(missed_checked_until=until)
+    if not habits:
+        return 0
+
+    plans = {}
+    bitmap_habits = set()
+    # привычки, часть истории которых лежит в масках
+    masked_habits = set()
+    for habit_id, user_id, start_date, frequency, checked_until, storage_mode, archived_until in habits:
+        periods = missed_periods(start_date, FREQUENCY_PERIODS.get(frequency, 1), checked_until, until)
+        if periods:
+            plans[habit_id] = (user_id, periods)
+            if storage_mode == 'bitmap':
+                bitmap_habits.add(habit_id)
+            if storage_mode == 'bitmap' or archived_until is not None:
+                masked_habits.add(habit_id)
+
+    created = 0
+    since = None
+    if plans:
+        since = min(periods[0][0] for _, periods in plans.values())
+        # Какие периоды уже закрыты отметкой (выполненной или нет)
+        covered = set()
+        logs = HabitLog.objects.filter(habit_id__in=plans, date__gte=since, date__lte=until)
+        for habit_id, day in logs.values_list('habit_id', 'date').iterator(chunk_size=LOG_BATCH_SIZE):
+            covered.add((habit_id, _period_start(plans[habit_id][1], day)))
+        if masked_habits:
+            for habit_id, _, day, _ in archived_logs(masked_habits, start=since, end=until):
+                covered.add((habit_id, _period_start(plans[habit_id][1], day)))
+
+        batch = []
+        bits = []
+        for habit_id, (user_id, periods) in plans.items():
+            for first, last in periods:
+                if (habit_id, first) not in covered:
+                    if habit_id in bitmap_habits:
+                        bits.append((habit_id, last))
+                    else:
+                        batch.append(HabitLog(habit_id=habit_id, date=last, is_done=False))
+        for offset in range(0, len(batch), LOG_BATCH_SIZE):
+            created += _insert_missing(batch[offset:offset + LOG_BATCH_SIZE])
+        if bits:
+            # маски меняются целиком: читаем под блокировкой и пишем в той же транзакции
+            with transaction.atomic():
+                histories = HabitBitmap.load_many(
+                    {habit_id for habit_id, _ in bits}, {day.year for _, day in bits}, for_update=True
+                )
+                for habit_id, day in bits:
+                    if histories[habit_id].test_day(day) is None:
+                        histories[habit_id].set_day(day, False)
+                        created += 1
+                HabitBitmap.save_many(histories.values())
+
+    Habit.objects.filter(pk__in=[habit[0] for habit in habits]).update(missed_checked_until=until)
+
+    if created:
+        # bulk_create не шлёт сигналы: счётчики и кэш обновляем сами
+        touched = {user_id for user_id, _ in plans.values()}
+        rebuild_daily_stats(user_ids=touched, since=since)
+        for user_id in touched:
+            transaction.on_commit(lambda user_id=user_id: bump_user_version(user_id))
+    return created
+
+
+def _insert_missing(logs):
+    """ Вставляет логи пропусков и возвращает, сколько строк добавлено.
+        ignore_conflicts: отметку, сделанную за этот же день параллельно, не
+        трогаем. Пропущенные строки bulk_create не различает, поэтому число
+        берётся из rowcount каждого INSERT """
+    inserted = 0
+
+    def count_rows(execute, sql, params, many, context):
+        nonlocal inserted
+        result = execute(sql, params, many, context)
+        inserted += max(context['cursor'].rowcount, 0)
+        return result
+
+    with connection.execute_wrapper(count_rows):
+        HabitLog.objects.bulk_create(logs, ignore_conflicts=True)
+    return inserted
+
+
+def _period_start(periods, day):
+    """ Начало периода из periods, в который попадает day (периоды идут подряд) """
+    first_start = periods[0][0]
+    period = (periods[0][1] - first_start).days + 1
+    return first_start + timedelta(days=(day - first_start).days // period * period)
+
+
+def run(until, chunk_size=USER_CHUNK_SIZE, restart=False, stdout=None):
+    """ Проходит всех пользователей пачками по возрастанию id. После каждой
+        пачки сохраняет контрольную точку: повторный запуск за ту же дату
+        продолжит с места остановки. Возвращает (пользователей, логов) """
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(
+        name=JOB_NAME,
+        defaults={'target_date': until}
+    )
+    if restart or checkpoint.target_date != until:
+        checkpoint.target_date = until
+        checkpoint.last_user_id = 0
+        checkpoint.finished = False
+        checkpoint.save()
+    elif checkpoint.finished:
+        return 0, 0
+
+    users_total = logs_total = 0
+    while True:
+        user_ids = list(User.objects.filter(
+            pk__gt=checkpoint.last_user_id
+        ).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not user_ids:
+            break
+
+        with transaction.atomic():
+            created = generate_for_users(user_ids, until)
+            checkpoint.last_user_id = user_ids[-1]
+            checkpoint.save(update_fields=['last_user_id', 'updated_at'])
+
+        users_total += len(user_ids)
+        logs_total += created
+        if stdout is not None:
+            stdout.write(f'пользователи до id {user_ids[-1]}: пропусков {created}')
+
+    checkpoint.finished = True
+    checkpoint.save(update_fields=['finished', 'updated_at'])
+    return users_total, logs_total
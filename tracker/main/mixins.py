@@ -1,17 +1,93 @@
 from .models import *
 from .forms import *
+from .search import search_queryset
+from .pagination import CursorPaginator, InvalidCursor
+from .cache import arecently_written, recently_written
+from .database import read_from_replica
+from django.http import Http404
 
 class TaskFilterMixin:
     form_class = TaskFilterForm
+    # Совпадений больше SEARCH_RESULT_LIMIT: страница показывает, что список неполный
+    search_truncated = False
 
     def get_filtered_queryset(self, base_queryset):
         form = self.form_class(self.request.GET)
         if form.is_valid():
             cd = form.cleaned_data
             if cd.get('search'):
-                base_queryset = base_queryset.filter(title__icontains=cd['search'])
+                # Полнотекстовый поиск по названию и описанию, лучшие совпадения первыми
+                base_queryset, self.search_truncated = search_queryset(
+                    base_queryset, 'task', cd['search'], self.request.user.pk
+                )
+                base_queryset = base_queryset.order_by('search_rank')
             if cd.get('status'):
                 base_queryset = base_queryset.filter(status=cd['status'])
             if cd.get('sort'):
                 base_queryset = base_queryset.order_by(cd['sort'])
         return base_queryset
+
+
+class CursorPaginationMixin:
+    """ Курсорная пагинация для ListView вместо номера страницы:
+        ?cursor=... вместо ?page=N, без COUNT(*) и OFFSET """
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        page = self.get_page(queryset, page_size)
+        return None, page, page.object_list, page.has_other_pages()
+
+    def get_page(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Неверный курсор страницы')
+        return self.link_page(page)
+
+    async def aget_page(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Неверный курсор страницы')
+        return self.link_page(page)
+
+    def link_page(self, page):
+        # Ссылки на соседние страницы сохраняют фильтры и сортировку
+        page.next_query = self.cursor_query(page.next_cursor)
+        page.previous_query = self.cursor_query(page.previous_cursor)
+        return page
+
+    def cursor_query(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params[self.cursor_kwarg] = cursor
+        return params.urlencode()
+
+
+class ReplicaReadMixin:
+    """ Страница только читает: запросы уходят на реплику, если она настроена.
+        Ставится первым в списке родителей, чтобы на реплику шли все запросы view.
+        Сессия и пользователь всё равно читаются из основной базы (ReplicaRouter).
+
+        Пользователь, который только что что-то изменил, читает из основной
+        базы REPLICA_MAX_LAG секунд: иначе отставшая реплика попала бы в кэш
+        под уже новой версией его данных """
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch_from_replica(request, *args, **kwargs)
+        user = request.user
+        if user.is_authenticated and recently_written(user.pk):
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+    async def adispatch_from_replica(self, request, *args, **kwargs):
+        user = await request.auser()
+        if user.is_authenticated and await arecently_written(user.pk):
+            return await super().dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            return await super().dispatch(request, *args, **kwargs)
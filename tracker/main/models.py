@@ -1,11 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.utils.text import slugify
 from django.urls import reverse
 from django.conf import settings
 
+from .slugs import UserSlugMixin
 
-class Task(models.Model):
+
+class Task(UserSlugMixin, models.Model):
     title = models.CharField(
         verbose_name='Название',
         max_length=200
@@ -20,17 +21,22 @@ class Task(models.Model):
         ('in_progress', 'В процессе'),
         ('done', 'Сделано')
     )
+    # Подписи считаются один раз: get_FOO_display собирает словарь на каждый вызов
+    STATUS_LABELS = dict(STATUS_CHOICES)
+    # Незавершённые задачи: ближайшие дедлайны и напоминания
+    OPEN_STATUSES = ('todo', 'in_progress')
     status = models.CharField(
         verbose_name='Статус',
         choices=STATUS_CHOICES,
         max_length=30,
-        default='Todo',
+        default='todo',
     )
     PRIORITY_CHOICES = (
         (1, 'Низкий'),
         (2, 'Средний'),
         (3, 'Высокий'),
     )
+    PRIORITY_LABELS = dict(PRIORITY_CHOICES)
     priority = models.IntegerField(
         choices=PRIORITY_CHOICES,
         default=1,
@@ -55,21 +61,31 @@ class Task(models.Model):
         related_name='user_task',
         db_index=True
     )
-
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title, allow_unicode=True)
-            slug = base_slug
-            counter = 1
-            while Task.objects.filter(user=self.user, slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    # Какое напоминание уже отправлено (reminders.py)
+    REMINDER_NONE, REMINDER_DUE, REMINDER_OVERDUE = 0, 1, 2
+    REMINDER_CHOICES = (
+        (REMINDER_NONE, 'Нет'),
+        (REMINDER_DUE, 'О близком дедлайне'),
+        (REMINDER_OVERDUE, 'О просрочке'),
+    )
+    reminder_stage = models.PositiveSmallIntegerField(
+        verbose_name='Напоминание',
+        choices=REMINDER_CHOICES,
+        default=REMINDER_NONE,
+        editable=False
+    )
 
     def __str__(self):
         return f"{self.title}, {self.user}"
 
+    @property
+    def status_label(self):
+        return self.STATUS_LABELS.get(self.status, self.status)
+
+    @property
+    def priority_label(self):
+        return self.PRIORITY_LABELS.get(self.priority, self.priority)
+
     def get_absolute_url(self):
         return reverse('task', kwargs={'slug': self.slug})
 
@@ -78,9 +94,19 @@ class Task(models.Model):
         verbose_name_plural = "Задачи"
         ordering = ["-created_at"]
         db_table_comment = "Задачи пользователя"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'slug'], name='unique_task_slug_per_user'),
+        ]
+        indexes = [
+            # Ближайшие дедлайны пользователя без сортировки всех его задач
+            models.Index(fields=['user', 'status', 'deadline'], name='task_user_status_deadline_idx'),
+            # Обход напоминаний по всем пользователям: для каждой пары
+            # (статус, стадия напоминания) — диапазон по дедлайну в порядке индекса
+            models.Index(fields=['status', 'reminder_stage', 'deadline', 'id'], name='task_reminder_sweep_idx'),
+        ]
 
 
-class Habit(models.Model):
+class Habit(UserSlugMixin, models.Model):
     title = models.CharField(
         verbose_name='Название',
         max_length=200
@@ -90,6 +116,7 @@ class Habit(models.Model):
         ('Weekly', 'Каждую неделю'),
         ('Day_about', 'Через день')
     )
+    FREQUENCY_LABELS = dict(FREQUENCY_CHOICES)
     frequency = models.CharField(
         verbose_name='Частота выполнения',
         choices=FREQUENCY_CHOICES,
@@ -116,20 +143,43 @@ class Habit(models.Model):
         blank=True,
         verbose_name='URL'
     )
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title, allow_unicode=True)
-            slug = base_slug
-            counter = 1
-            while Habit.objects.filter(user=self.user, slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    missed_checked_until = models.DateField(
+        verbose_name='Пропуски проставлены по',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    archived_until = models.DateField(
+        verbose_name='Логи до этой даты в архиве',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    STORAGE_CHOICES = (
+        ('rows', 'Лог на каждый день'),
+        ('bitmap', 'Битовые маски по годам'),
+    )
+    # Меняется командой habit_storage: история переносится вместе с режимом
+    storage_mode = models.CharField(
+        verbose_name='Хранение истории',
+        choices=STORAGE_CHOICES,
+        max_length=10,
+        default='rows',
+        editable=False
+    )
 
     def __str__(self):
         return f"{self.title}, {self.user}"
 
+    @property
+    def frequency_label(self):
+        return self.FREQUENCY_LABELS.get(self.frequency, self.frequency)
+
+    @property
+    def uses_bitmaps(self):
+        """ Часть истории (или вся) лежит в HabitYearBitmap """
+        return self.storage_mode == 'bitmap' or self.archived_until is not None
+
     def get_absolute_url(self):
         return reverse('habit', kwargs={'slug': self.slug})
 
@@ -138,6 +188,9 @@ class Habit(models.Model):
         verbose_name_plural = "Привычки"
         ordering = ["title"]
         db_table_comment = "Привычки пользователя"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'slug'], name='unique_habit_slug_per_user'),
+        ]
 
 
 class HabitLog(models.Model):
@@ -164,3 +217,227 @@ class HabitLog(models.Model):
         verbose_name = "Привычка"
         verbose_name_plural = "Привычки"
         ordering = ["habit"]
+        constraints = [
+            # Одна отметка на привычку в день: двойной клик не создаст дубль
+            models.UniqueConstraint(fields=['habit', 'date'], name='unique_habit_log_per_day'),
+        ]
+        indexes = [
+            # Покрывает все горячие запросы: привычка + диапазон дат + is_done
+            models.Index(fields=['habit', 'date', 'is_done'], name='habitlog_habit_date_done_idx'),
+            # Админка: сортировка по дате и date_hierarchy по всем привычкам сразу
+            models.Index(fields=['date'], name='habitlog_date_idx'),
+        ]
+
+
+class HabitYearBitmap(models.Model):
+    """ Год истории привычки: по биту на день года (bitmaps.py).
+        Здесь вся история привычек со storage_mode='bitmap'
+        и логи остальных старше HABITLOG_ARCHIVE_AFTER_DAYS """
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.PROTECT,
+        verbose_name='Привычка',
+        related_name='year_bitmaps'
+    )
+    year = models.PositiveSmallIntegerField(
+        verbose_name='Год'
+    )
+    done = models.BinaryField(
+        verbose_name='Выполненные дни'
+    )
+    missed = models.BinaryField(
+        verbose_name='Пропущенные дни'
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Обновлено',
+        auto_now=True
+    )
+
+    def __str__(self):
+        return f"{self.habit_id}: {self.year}"
+
+    class Meta:
+        verbose_name = "Архив привычки за год"
+        verbose_name_plural = "Архив привычек"
+        constraints = [
+            models.UniqueConstraint(fields=['habit', 'year'], name='unique_habit_year_bitmap'),
+        ]
+
+
+class HabitDailyStat(models.Model):
+    """ Предпосчитанные счётчики логов пользователя за день.
+        Обновляются сигналами в той же транзакции, что и сам лог """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name='habit_daily_stat',
+    )
+    date = models.DateField(
+        verbose_name='Дата',
+    )
+    total = models.PositiveIntegerField(
+        verbose_name='Всего отметок',
+        default=0
+    )
+    done = models.PositiveIntegerField(
+        verbose_name='Выполнено',
+        default=0
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата обновления',
+        auto_now=True
+    )
+
+    def __str__(self):
+        return f"{self.user} — {self.date}: {self.done}/{self.total}"
+
+    class Meta:
+        verbose_name = "Статистика за день"
+        verbose_name_plural = "Статистика за день"
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_habit_daily_stat'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """ Инвертированный индекс для поиска на базах без FTS5 (на SQLite не используется) """
+    KIND_CHOICES = (
+        ('task', 'Задача'),
+        ('habit', 'Привычка'),
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name='search_term',
+    )
+    kind = models.CharField(
+        verbose_name='Тип объекта',
+        choices=KIND_CHOICES,
+        max_length=10
+    )
+    object_id = models.BigIntegerField(
+        verbose_name='id объекта'
+    )
+    term = models.CharField(
+        verbose_name='Слово',
+        max_length=64
+    )
+    weight = models.PositiveSmallIntegerField(
+        verbose_name='Вес',
+        default=1
+    )
+
+    def __str__(self):
+        return f"{self.term} → {self.kind} {self.object_id}"
+
+    class Meta:
+        verbose_name = "Поисковый термин"
+        verbose_name_plural = "Поисковые термины"
+        indexes = [
+            models.Index(fields=['user', 'kind', 'term'], name='searchterm_user_kind_term_idx'),
+            models.Index(fields=['kind', 'object_id'], name='searchterm_kind_object_idx'),
+        ]
+
+
+class JobCheckpoint(models.Model):
+    """ Место, где остановилась пакетная задача: после сбоя
+        она продолжает со следующего пользователя, а не с начала """
+    name = models.CharField(
+        verbose_name='Задача',
+        max_length=100,
+        unique=True
+    )
+    target_date = models.DateField(
+        verbose_name='Обрабатываемая дата'
+    )
+    last_user_id = models.BigIntegerField(
+        verbose_name='Последний обработанный пользователь',
+        default=0
+    )
+    finished = models.BooleanField(
+        verbose_name='Завершена',
+        default=False
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата обновления',
+        auto_now=True
+    )
+
+    def __str__(self):
+        return f"{self.name} за {self.target_date}: {'готово' if self.finished else self.last_user_id}"
+
+    class Meta:
+        verbose_name = "Контрольная точка задачи"
+        verbose_name_plural = "Контрольные точки задач"
+
+
+class Notification(models.Model):
+    """ Исходящее уведомление. Планировщик только складывает их сюда,
+        доставку делает бэкенд из NOTIFICATION_BACKEND (notifications.py) """
+    KIND_CHOICES = (
+        ('task_due', 'Скоро дедлайн'),
+        ('task_overdue', 'Дедлайн прошёл'),
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name='notifications'
+    )
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        verbose_name='Задача',
+        related_name='notifications',
+        null=True,
+        blank=True
+    )
+    kind = models.CharField(
+        verbose_name='Тип',
+        choices=KIND_CHOICES,
+        max_length=30
+    )
+    message = models.TextField(
+        verbose_name='Текст'
+    )
+    # Дедлайн задачи, о котором напоминание: после переноса — новое уведомление
+    deadline = models.DateField(
+        verbose_name='Дедлайн',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True
+    )
+    sent_at = models.DateTimeField(
+        verbose_name='Отправлено',
+        null=True,
+        blank=True
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток отправки',
+        default=0
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True
+    )
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.user}"
+
+    class Meta:
+        verbose_name = "Уведомление"
+        verbose_name_plural = "Уведомления"
+        constraints = [
+            # Повторный обход не создаёт второе такое же напоминание о том же дедлайне
+            models.UniqueConstraint(fields=['task', 'kind', 'deadline'], name='unique_task_notification'),
+        ]
+        indexes = [
+            # Очередь на отправку: только неотправленные
+            models.Index(fields=['id'], name='notification_pending_idx', condition=models.Q(sent_at__isnull=True)),
+        ]
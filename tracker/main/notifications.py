@@ -0,0 +1,103 @@
+""" Доставка уведомлений из исходящей таблицы Notification.
+
+    Кто угодно (например, планировщик напоминаний) только добавляет строки в
+    Notification; deliver_pending забирает неотправленные пачками по id и
+    отдаёт бэкенду из settings.NOTIFICATION_BACKEND — так же, как EMAIL_BACKEND.
+    Для локальной работы есть ConsoleBackend и FileBackend, для тестов —
+    LocmemBackend """
+import json
+import sys
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+
+# Сколько уведомлений отдаётся бэкенду за раз
+DELIVERY_BATCH_SIZE = 500
+# После стольких неудачных попыток уведомление больше не отправляется
+MAX_ATTEMPTS = 5
+# Отправленное через LocmemBackend
+outbox = []
+
+
+class BaseBackend:
+    def send_messages(self, notifications):
+        """ Отправляет пачку; исключение означает, что не отправлено ничего """
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    """ Печатает уведомления в stdout """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send_messages(self, notifications):
+        for notification in notifications:
+            self.stream.write(f'[{notification.kind}] user={notification.user_id}: {notification.message}\n')
+        self.stream.flush()
+
+
+class LocmemBackend(BaseBackend):
+    """ Складывает уведомления в notifications.outbox, как locmem у почты """
+
+    def send_messages(self, notifications):
+        outbox.extend(notifications)
+
+
+class FileBackend(BaseBackend):
+    """ Дописывает уведомления в NOTIFICATIONS_FILE_PATH, по JSON-объекту на строку """
+
+    def __init__(self, path=None):
+        self.path = path or settings.NOTIFICATIONS_FILE_PATH
+
+    def send_messages(self, notifications):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            for notification in notifications:
+                file.write(json.dumps({
+                    'id': notification.pk,
+                    'user': notification.user_id,
+                    'task': notification.task_id,
+                    'kind': notification.kind,
+                    'message': notification.message,
+                    'created_at': notification.created_at.isoformat(),
+                }, ensure_ascii=False) + '\n')
+
+
+def get_backend(path=None, **kwargs):
+    return import_string(path or settings.NOTIFICATION_BACKEND)(**kwargs)
+
+
+def deliver_pending(backend=None, batch_size=DELIVERY_BATCH_SIZE):
+    """ Отправляет все неотправленные уведомления. Возвращает (отправлено, ошибок).
+        При ошибке бэкенда пачка остаётся в очереди с увеличенным счётчиком попыток """
+    backend = backend or get_backend()
+    sent = failed = 0
+    last_id = 0
+    while True:
+        batch = list(Notification.objects.filter(
+            sent_at__isnull=True,
+            attempts__lt=MAX_ATTEMPTS,
+            pk__gt=last_id,
+        ).order_by('pk')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].pk
+        ids = [notification.pk for notification in batch]
+
+        try:
+            backend.send_messages(batch)
+        except Exception as error:
+            Notification.objects.filter(pk__in=ids).update(
+                attempts=F('attempts') + 1,
+                last_error=str(error)[:1000],
+            )
+            failed += len(batch)
+            continue
+        Notification.objects.filter(pk__in=ids).update(sent_at=timezone.now(), attempts=F('attempts') + 1)
+        sent += len(batch)
+    return sent, failed
@@ -0,0 +1,188 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """ Страница курсорной пагинации. Интерфейс близок к django Page,
+        но без номера страницы и общего количества: COUNT(*) не нужен """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class CursorPaginator:
+    """ Keyset-пагинация: следующая страница — это строки «после» последней
+        показанной по полям сортировки, а не OFFSET. Глубокие страницы стоят
+        столько же, сколько первая, если сортировка опирается на индекс.
+
+        Сортировка берётся из queryset (или Meta.ordering модели);
+        pk добавляется в конец, чтобы порядок был однозначным.
+        queryset может быть и values(): поля сортировки должны быть в нём """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = self.resolve_ordering(queryset, ordering)
+
+    @staticmethod
+    def resolve_ordering(queryset, ordering=None):
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        names = {field.lstrip('-') for field in ordering}
+        if not names & {'pk', 'id', queryset.model._meta.pk.name}:
+            ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+        return ordering
+
+    def page(self, cursor=None):
+        queryset, backwards = self.page_queryset(cursor)
+        return self.make_page(list(queryset), cursor, backwards)
+
+    async def apage(self, cursor=None):
+        """ То же для async-views: строки читаются через async ORM """
+        queryset, backwards = self.page_queryset(cursor)
+        return self.make_page([row async for row in queryset], cursor, backwards)
+
+    def page_queryset(self, cursor):
+        if cursor:
+            values, backwards = self.decode(cursor)
+            try:
+                queryset = self.queryset.filter(self.position_filter(values, backwards))
+            except (ValueError, TypeError, ValidationError):
+                # Курсор от другой сортировки: значения не подходят к полям
+                raise InvalidCursor(cursor)
+        else:
+            backwards = False
+            queryset = self.queryset
+
+        ordering = [self.reverse(field) for field in self.ordering] if backwards else self.ordering
+        # Берём на одну строку больше: так узнаём, есть ли что-то дальше
+        return queryset.order_by(*ordering)[:self.per_page + 1], backwards
+
+    def make_page(self, rows, cursor, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        return CursorPage(
+            rows,
+            next_cursor=self.encode(rows[-1], backwards=False) if has_next and rows else None,
+            previous_cursor=self.encode(rows[0], backwards=True) if has_previous and rows else None,
+        )
+
+    def position_filter(self, values, backwards):
+        """ (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ... с учётом направления полей """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != backwards
+            condition |= equal & Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode(self, obj, backwards):
+        # строки из values() — словари, из обычного queryset — объекты
+        get = obj.get if isinstance(obj, dict) else lambda name: getattr(obj, name)
+        return self.encode_values([get(field.lstrip('-')) for field in self.ordering], backwards)
+
+    @classmethod
+    def encode_values(cls, values, backwards=False):
+        """ Курсор из значений полей сортировки """
+        values = [cls.serialize(value) for value in values]
+        payload = json.dumps({'v': values, 'b': int(backwards)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        return self.decode_values(cursor, len(self.ordering))
+
+    @staticmethod
+    def decode_values(cursor, size):
+        """ (значения полей, назад ли) из курсора с size полями """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values, backwards = payload['v'], bool(payload['b'])
+        except (ValueError, TypeError, KeyError):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != size:
+            raise InvalidCursor(cursor)
+        if not all(isinstance(value, (str, int, float)) for value in values):
+            raise InvalidCursor(cursor)
+        return values, backwards
+
+    @staticmethod
+    def serialize(value):
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def estimated_count(model, using='default'):
+    """ Примерное число строк таблицы без COUNT(*): на PostgreSQL — из
+        статистики планировщика, иначе — наибольший pk. Для журналов, из которых
+        почти не удаляют, это почти точное число и один поиск по индексу """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 — таблицу ещё ни разу не анализировали
+        if row and row[0] > 0:
+            return row[0]
+    return model._base_manager.using(using).order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """ Paginator для админки больших таблиц: без полного COUNT(*).
+        Без фильтров количество оценивается (estimated_count), с фильтрами
+        считается не дальше count_limit строк — страницы глубже всё равно
+        дороги из-за OFFSET. Небольшие таблицы считаются точно """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate > self.count_limit:
+                return estimate
+        return queryset[:self.count_limit].count()
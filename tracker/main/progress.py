@@ -0,0 +1,57 @@
+""" Отметка за сегодня и прогресс за период для списков привычек.
+
+    Карточке привычки нужны те же цифры, что детальной странице: выполнена
+    ли она сегодня и сколько дней выполнено за последние PERIOD_DAYS. Чтобы
+    не делать по запросу на карточку, они считаются коррелированными
+    подзапросами в том же SELECT, что и сами привычки, — по индексу
+    (habit, date, is_done). Привычки в режиме bitmap логов не имеют: их
+    цифры берутся из масок годов одним дополнительным запросом на страницу """
+from datetime import timedelta
+
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .bitmaps import HabitBitmap
+from .models import HabitLog
+
+
+# Тот же период, что на детальной странице привычки
+PERIOD_DAYS = 30
+
+
+def period_start(today):
+    return today - timedelta(days=PERIOD_DAYS)
+
+
+def _count_logs(start, **filters):
+    logs = HabitLog.objects.filter(habit=OuterRef('pk'), date__gte=start, **filters)
+    counts = logs.order_by().values('habit').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def with_progress(queryset, today):
+    """ Аннотирует привычки полями done_today, period_total и period_done """
+    start = period_start(today)
+    return queryset.annotate(
+        done_today=Exists(HabitLog.objects.filter(habit=OuterRef('pk'), date=today, is_done=True)),
+        period_total=_count_logs(start),
+        period_done=_count_logs(start, is_done=True),
+    )
+
+
+def fill_progress(habits, today):
+    """ Дополняет привычки из with_progress: цифры для режима bitmap
+        и progress_percent для всех. Возвращает тот же список """
+    start = period_start(today)
+    bitmap_ids = [habit.pk for habit in habits if habit.storage_mode == 'bitmap']
+    if bitmap_ids:
+        histories = HabitBitmap.load_many(bitmap_ids, range(start.year, today.year + 1))
+        for habit in habits:
+            if habit.pk in histories:
+                history = histories[habit.pk]
+                habit.done_today = history.test_day(today) is True
+                habit.period_total, habit.period_done = history.count(start, today)
+
+    for habit in habits:
+        habit.progress_percent = int(habit.period_done / habit.period_total * 100) if habit.period_total else 0
+    return habits
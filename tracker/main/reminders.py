@@ -0,0 +1,116 @@
+""" Напоминания о дедлайнах задач.
+
+    Обход идёт по всем пользователям сразу, пачками в порядке индекса
+    task_reminder_sweep_idx (status, reminder_stage, deadline, id). Для каждой
+    пары (открытый статус, стадия напоминания) нужные задачи лежат в индексе
+    одним диапазоном по дедлайну; пачка — один запрос с продолжением от
+    последней (deadline, id), без OFFSET и сортировки, поэтому её время не
+    зависит от размера таблицы. Задачи, о просрочке которых уже напомнили,
+    в обход не попадают вовсе.
+
+    Для задачи пишется не больше двух уведомлений: за REMINDER_LEAD_DAYS дней
+    до дедлайна и после него. Task.reminder_stage запоминает, что уже отправлено,
+    а ограничение (task, kind, deadline) в Notification не даёт задвоить их при
+    повторе. После переноса дедлайна стадия сбрасывается (signals.py), и о новом
+    дедлайне напоминания приходят заново """
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Task, Notification
+
+
+# За сколько дней до дедлайна напоминать
+REMINDER_LEAD_DAYS = getattr(settings, 'REMINDER_LEAD_DAYS', 1)
+# Задач в одной пачке обхода
+SWEEP_BATCH_SIZE = 1000
+
+
+def sweep_segments(today, lead_days):
+    """ (статус, стадия, последний дедлайн) — диапазоны индекса для обхода.
+        О близком дедлайне напоминаем, пока стадия NONE; после напоминания
+        задача снова нужна обходу, только когда дедлайн прошёл """
+    segments = []
+    for status in Task.OPEN_STATUSES:
+        segments.append((status, Task.REMINDER_NONE, today + timedelta(days=lead_days)))
+        segments.append((status, Task.REMINDER_DUE, today - timedelta(days=1)))
+    return segments
+
+
+def due_batch(status, stage, until, after=None, limit=SWEEP_BATCH_SIZE):
+    """ Следующая пачка задач диапазона после ключа after = (deadline, id):
+        кортежи (id, user_id, title, deadline, reminder_stage) """
+    queryset = Task.objects.filter(status=status, reminder_stage=stage, deadline__lte=until)
+    if after is not None:
+        deadline, pk = after
+        # deadline__gte отдельно — нижняя граница диапазона индекса для SQLite
+        queryset = queryset.filter(deadline__gte=deadline).filter(Q(deadline__gt=deadline) | Q(pk__gt=pk))
+    return list(queryset.order_by('deadline', 'pk').values_list(
+        'pk', 'user_id', 'title', 'deadline', 'reminder_stage'
+    )[:limit])
+
+
+def reminder_for(task_id, user_id, title, deadline, stage, today):
+    """ Уведомление, которое пора отправить по задаче, или None """
+    if deadline < today:
+        return Notification(
+            user_id=user_id, task_id=task_id, kind='task_overdue', deadline=deadline,
+            message=f'Дедлайн задачи «{title}» прошёл {deadline:%d.%m.%Y}',
+        )
+    if stage == Task.REMINDER_NONE:
+        return Notification(
+            user_id=user_id, task_id=task_id, kind='task_due', deadline=deadline,
+            message=f'Скоро дедлайн задачи «{title}»: {deadline:%d.%m.%Y}',
+        )
+    return None
+
+
+def sweep(today, lead_days=REMINDER_LEAD_DAYS, batch_size=SWEEP_BATCH_SIZE, stdout=None):
+    """ Ставит в очередь все назревшие напоминания.
+        Возвращает {'scanned', 'due', 'overdue', 'batches', 'max_batch_ms'} """
+    result = {'scanned': 0, 'due': 0, 'overdue': 0, 'batches': 0, 'max_batch_ms': 0.0}
+    for status, stage, until in sweep_segments(today, lead_days):
+        after = None
+        while True:
+            started = time.perf_counter()
+            rows = due_batch(status, stage, until, after, batch_size)
+            if not rows:
+                break
+            after = (rows[-1][3], rows[-1][0])
+            counts = enqueue(rows, today)
+
+            elapsed = (time.perf_counter() - started) * 1000
+            result['scanned'] += len(rows)
+            result['due'] += counts[Task.REMINDER_DUE]
+            result['overdue'] += counts[Task.REMINDER_OVERDUE]
+            result['batches'] += 1
+            result['max_batch_ms'] = max(result['max_batch_ms'], elapsed)
+            if stdout is not None:
+                stdout.write(f'{status}/{stage}: пачка из {len(rows)} задач, {elapsed:.1f} мс')
+    return result
+
+
+def enqueue(rows, today):
+    """ Уведомления по пачке задач и новая стадия задач — в одной транзакции.
+        Возвращает {стадия: сколько задач на неё переведено} """
+    notifications = []
+    stages = {Task.REMINDER_DUE: [], Task.REMINDER_OVERDUE: []}
+    for row in rows:
+        notification = reminder_for(*row, today)
+        if notification is None:
+            continue
+        notifications.append(notification)
+        stage = Task.REMINDER_OVERDUE if notification.kind == 'task_overdue' else Task.REMINDER_DUE
+        stages[stage].append(notification.task_id)
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+        for stage, ids in stages.items():
+            if ids:
+                # update без сигналов: стадия напоминания не видна в интерфейсе,
+                # сбрасывать кэш пользователя незачем
+                Task.objects.filter(pk__in=ids).update(reminder_stage=stage)
+    return {stage: len(ids) for stage, ids in stages.items()}
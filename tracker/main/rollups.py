@@ -0,0 +1,146 @@
+from django.contrib.auth.models import User
+from django.db.models import Count, Q, Sum
+
+from .bitmaps import archived_day_counts
+from .models import Habit, HabitLog, HabitDailyStat
+
+
+# Размер пачки для bulk_create при пересборке
+REBUILD_BATCH_SIZE = 2000
+# Сколько пользователей пересобирается за раз при полной пересборке
+REBUILD_USER_CHUNK_SIZE = 1000
+
+
+def refresh_daily_stats(pairs, with_archive=False):
+    """ Пересчитывает счётчики для набора пар (user_id, date).
+        Один агрегирующий запрос по логам и один upsert, сколько бы пар ни было.
+        with_archive — среди дней есть уже заархивированные (bitmaps.py) """
+    pairs = set(pairs)
+    if not pairs:
+        return
+
+    user_ids = {user_id for user_id, _ in pairs}
+    dates = {date for _, date in pairs}
+    counts = {
+        (row['habit__user_id'], row['date']): row
+        for row in HabitLog.objects.filter(
+            habit__user_id__in=user_ids,
+            date__in=dates
+        ).order_by().values('habit__user_id', 'date').annotate(
+            total=Count('pk'),
+            done=Count('pk', filter=Q(is_done=True))
+        )
+    }
+
+    archived = archived_day_counts(user_ids, dates=dates) if with_archive else {}
+
+    # Пары без логов тоже сохраняем (с нулями): строка не исчезает,
+    # а updated_at показывает, что данные менялись
+    stats = []
+    for user_id, date in pairs:
+        row = counts.get((user_id, date), {})
+        archived_total, archived_done = archived.get((user_id, date), (0, 0))
+        stats.append(HabitDailyStat(
+            user_id=user_id,
+            date=date,
+            total=row.get('total', 0) + archived_total,
+            done=row.get('done', 0) + archived_done,
+        ))
+
+    HabitDailyStat.objects.bulk_create(
+        stats,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=['total', 'done', 'updated_at'],
+    )
+
+
+def refresh_for_logs(keys):
+    """ То же, но по парам (habit_id, date) — как их знает сам HabitLog.
+        Возвращает id затронутых пользователей """
+    keys = set(keys)
+    if not keys:
+        return set()
+
+    owners = {
+        pk: (user_id, archived_until, storage_mode)
+        for pk, user_id, archived_until, storage_mode in Habit.objects.filter(
+            pk__in={habit_id for habit_id, _ in keys}
+        ).values_list('pk', 'user_id', 'archived_until', 'storage_mode')
+    }
+    keys = [(habit_id, date) for habit_id, date in keys if habit_id in owners]
+    refresh_daily_stats(
+        {(owners[habit_id][0], date) for habit_id, date in keys},
+        with_archive=any(
+            owners[habit_id][2] == 'bitmap' or owners[habit_id][1] is not None and date < owners[habit_id][1]
+            for habit_id, date in keys
+        ),
+    )
+    return {user_id for user_id, _, _ in owners.values()}
+
+
+def rebuild_daily_stats(user_ids=None, since=None):
+    """ Полная пересборка счётчиков (или только для части пользователей / дат).
+        Логи и архив читаются вместе, поэтому все пользователи пересобираются
+        пачками по REBUILD_USER_CHUNK_SIZE. Возвращает количество записанных строк """
+    if user_ids is None:
+        written = 0
+        last_id = 0
+        while True:
+            chunk = list(User.objects.filter(
+                pk__gt=last_id
+            ).order_by('pk').values_list('pk', flat=True)[:REBUILD_USER_CHUNK_SIZE])
+            if not chunk:
+                return written
+            written += rebuild_daily_stats(chunk, since)
+            last_id = chunk[-1]
+
+    stats = HabitDailyStat.objects.filter(user_id__in=user_ids)
+    logs = HabitLog.objects.filter(habit__user_id__in=user_ids)
+    if since is not None:
+        stats = stats.filter(date__gte=since)
+        logs = logs.filter(date__gte=since)
+
+    stats.delete()
+
+    rows = logs.order_by().values_list('habit__user_id', 'date').annotate(
+        total=Count('pk'),
+        done=Count('pk', filter=Q(is_done=True))
+    )
+
+    archived = archived_day_counts(user_ids, since=since)
+
+    written = 0
+    batch = []
+    for user_id, date, total, done in _with_archive(rows.iterator(chunk_size=REBUILD_BATCH_SIZE), archived):
+        batch.append(HabitDailyStat(user_id=user_id, date=date, total=total, done=done))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            HabitDailyStat.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        HabitDailyStat.objects.bulk_create(batch)
+        written += len(batch)
+
+    return written
+
+
+def _with_archive(rows, archived):
+    """ Строки (user_id, date, total, done) по логам плюс счётчики архива """
+    for user_id, date, total, done in rows:
+        archived_total, archived_done = archived.pop((user_id, date), (0, 0))
+        yield user_id, date, total + archived_total, done + archived_done
+    # дни, которые есть только в архиве
+    for (user_id, date), (total, done) in archived.items():
+        yield user_id, date, total, done
+
+
+def get_period_counts(user, start, end=None):
+    """ Сумма счётчиков пользователя за период: не больше одной строки на день,
+        поэтому стоимость не зависит от длины истории логов """
+    stats = HabitDailyStat.objects.filter(user=user, date__gte=start)
+    if end is not None:
+        stats = stats.filter(date__lte=end)
+
+    counts = stats.aggregate(total=Sum('total'), done=Sum('done'))
+    return counts['total'] or 0, counts['done'] or 0
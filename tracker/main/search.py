@@ -0,0 +1,183 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+
+from .models import SearchTerm
+
+
+# Сколько лучших совпадений отдаёт поиск
+SEARCH_RESULT_LIMIT = 500
+# Имя виртуальной таблицы FTS5 (создаётся миграцией только на SQLite)
+FTS_TABLE = 'main_search_index'
+# Код типа объекта: в FTS он зашит в rowid, в инвертированном индексе — поле kind
+KINDS = {'task': 0, 'habit': 1}
+# Вес слов из названия против слов из описания
+TITLE_WEIGHT = 3
+
+_word_re = re.compile(r'\w+')
+
+
+def normalize(text):
+    """ Регистр и «ё»: «Отчёт», «ОТЧЕТ» и «отчет» ищутся одинаково """
+    return (text or '').casefold().replace('ё', 'е')
+
+
+def tokenize(text):
+    return _word_re.findall(normalize(text))
+
+
+def document(kind, obj):
+    """ (название, описание) объекта для индекса """
+    if kind == 'task':
+        return obj.title, obj.description
+    return obj.title, ''
+
+
+class FTSBackend:
+    """ Полнотекстовый индекс SQLite FTS5. rowid = id * 2 + код типа, поэтому
+        обновление и удаление — поиск по первичному ключу, а владелец хранится
+        отдельной индексируемой колонкой и пересекается с запросом внутри FTS """
+
+    def index(self, kind, objects):
+        rows = []
+        for obj in objects:
+            title, description = document(kind, obj)
+            rows.append((self.rowid(kind, obj.pk), self.owner(obj.user_id), normalize(title), normalize(description)))
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, owner, title, description) VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+    def remove(self, kind, ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(self.rowid(kind, pk),) for pk in ids])
+
+    def search(self, user_id, kind, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Каждое слово запроса — префикс: «отч» найдёт «отчёт» и «отчетность»
+        terms = ' AND '.join('"%s"*' % token for token in tokens)
+        match = f'owner:{self.owner(user_id)} AND {{title description}}:({terms})'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid %% 2 = %s '
+                f'ORDER BY bm25({FTS_TABLE}, 0, {TITLE_WEIGHT}, 1) LIMIT %s',
+                [match, KINDS[kind], limit]
+            )
+            return [rowid // 2 for rowid, in cursor.fetchall()]
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    @staticmethod
+    def rowid(kind, pk):
+        return pk * 2 + KINDS[kind]
+
+    @staticmethod
+    def owner(user_id):
+        return f'u{user_id}'
+
+
+class InvertedIndexBackend:
+    """ Запасной вариант для других баз: таблица (пользователь, тип, слово, объект).
+        Префиксный поиск идёт диапазоном по индексу (user, kind, term) """
+
+    def index(self, kind, objects):
+        objects = list(objects)
+        if not objects:
+            return
+        self.remove(kind, [obj.pk for obj in objects])
+
+        terms = []
+        for obj in objects:
+            title, description = document(kind, obj)
+            weights = {}
+            for term in tokenize(description):
+                weights[term] = weights.get(term, 0) + 1
+            for term in tokenize(title):
+                weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+            terms.extend(
+                SearchTerm(user_id=obj.user_id, kind=kind, object_id=obj.pk, term=term[:64], weight=weight)
+                for term, weight in weights.items()
+            )
+        SearchTerm.objects.bulk_create(terms, batch_size=2000)
+
+    def remove(self, kind, ids):
+        SearchTerm.objects.filter(kind=kind, object_id__in=list(ids)).delete()
+
+    def search(self, user_id, kind, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Объект подходит, если каждое слово запроса совпало хотя бы с одним его словом
+        prefixes = [self.prefix(token) for token in tokens]
+        matched = {
+            f'token_{i}': Count('pk', filter=prefix)
+            for i, prefix in enumerate(prefixes)
+        }
+        any_token = Q()
+        for prefix in prefixes:
+            any_token |= prefix
+
+        rows = SearchTerm.objects.filter(user_id=user_id, kind=kind).filter(any_token).values(
+            'object_id'
+        ).annotate(
+            rank=Sum('weight'),
+            **matched
+        ).filter(
+            **{f'{name}__gt': 0 for name in matched}
+        ).order_by('-rank', '-object_id')[:limit]
+        return [row['object_id'] for row in rows]
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    @staticmethod
+    def prefix(token):
+        # Диапазон вместо LIKE 'слово%': так индекс работает на любой базе и collation
+        token = token[:64]
+        return Q(term__gte=token, term__lt=token + '\U0010ffff')
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return FTSBackend()
+    return InvertedIndexBackend()
+
+
+def index_objects(kind, objects):
+    get_backend().index(kind, objects)
+
+
+def remove_objects(kind, ids):
+    get_backend().remove(kind, ids)
+
+
+def search_ids(user_id, kind, query, limit=SEARCH_RESULT_LIMIT):
+    """ id найденных объектов пользователя, от лучшего совпадения к худшему """
+    return get_backend().search(user_id, kind, query, limit)
+
+
+def search_queryset(queryset, kind, query, user_id):
+    """ Фильтрует queryset по результатам поиска и добавляет search_rank
+        (0 — лучшее совпадение), по которому можно сортировать.
+        Возвращает (queryset, truncated): truncated — совпадений больше
+        SEARCH_RESULT_LIMIT и в queryset только лучшие из них """
+    ids = search_ids(user_id, kind, query, SEARCH_RESULT_LIMIT + 1)
+    truncated = len(ids) > SEARCH_RESULT_LIMIT
+    ids = ids[:SEARCH_RESULT_LIMIT]
+    if not ids:
+        return queryset.none(), truncated
+    return queryset.filter(pk__in=ids).annotate(
+        search_rank=Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+            output_field=IntegerField()
+        )
+    ), truncated
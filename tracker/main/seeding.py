@@ -0,0 +1,121 @@
+""" Синтетические данные для нагрузочных замеров: пользователи с задачами,
+    привычками и многолетней историей отметок. Всё пишется bulk_create,
+    поэтому сигналы не срабатывают — счётчики и поисковый индекс
+    обновляются здесь же, пачкой на пользователя """
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Task, Habit, HabitLog
+from .rollups import rebuild_daily_stats
+from .search import index_objects
+from .slugs import SlugAllocator
+from .streaks import FREQUENCY_PERIODS
+
+
+# Пароль всех сгенерированных пользователей
+SEED_PASSWORD = 'seed-pass-123'
+# Сколько логов пишет один bulk_create
+LOG_BATCH_SIZE = 5000
+
+WORDS = (
+    'отчёт план встреча звонок письмо бюджет проект задача релиз тест ревью '
+    'документ договор счёт оплата клиент дизайн макет сервер база миграция '
+    'спринт демо презентация аналитика метрика отпуск покупка ремонт врач спорт'
+).split()
+HABIT_TITLES = (
+    'Бег', 'Зарядка', 'Чтение', 'Английский', 'Медитация', 'Вода', 'Сон до 23:00',
+    'Без сахара', 'Прогулка', 'Дневник', 'Растяжка', 'Планка', 'Витамины', 'Уборка',
+)
+
+
+def seed_users(count, tasks_per_user, habits_per_user, years, prefix='seed', seed=None, stdout=None):
+    """ Создаёт count пользователей prefix0, prefix1 ... (уже существующие
+        пропускаются). Возвращает число созданных логов """
+    rnd = random.Random(seed)
+    today = timezone.now().date()
+    password = make_password(SEED_PASSWORD)
+
+    usernames = [f'{prefix}{i}' for i in range(count)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    logs_total = 0
+
+    for username in usernames:
+        if username in existing:
+            continue
+        with transaction.atomic():
+            user = User.objects.create(username=username, password=password)
+            seed_tasks(user, tasks_per_user, today, rnd)
+            habits = seed_habits(user, habits_per_user, today, years, rnd)
+            logs = seed_logs(habits, today, rnd)
+            rebuild_daily_stats(user_ids=[user.pk])
+        logs_total += logs
+        if stdout is not None:
+            stdout.write(f'{username}: задач {tasks_per_user}, привычек {len(habits)}, логов {logs}')
+    return logs_total
+
+
+def seed_tasks(user, count, today, rnd):
+    slugs = SlugAllocator(Task, user.pk)
+    statuses = [value for value, _ in Task.STATUS_CHOICES]
+    priorities = [value for value, _ in Task.PRIORITY_CHOICES]
+    tasks = []
+    for _ in range(count):
+        task = Task(
+            user=user,
+            title=' '.join(rnd.choices(WORDS, k=3)).capitalize(),
+            description=' '.join(rnd.choices(WORDS, k=rnd.randint(0, 20))),
+            status=rnd.choice(statuses),
+            priority=rnd.choice(priorities),
+            deadline=today + timedelta(days=rnd.randint(-60, 120)),
+        )
+        slugs.allocate(task)
+        tasks.append(task)
+    tasks = Task.objects.bulk_create(tasks, batch_size=LOG_BATCH_SIZE)
+    index_objects('task', tasks)
+
+
+def seed_habits(user, count, today, years, rnd):
+    slugs = SlugAllocator(Habit, user.pk)
+    frequencies = list(FREQUENCY_PERIODS)
+    habits = []
+    for i in range(count):
+        habit = Habit(
+            user=user,
+            title=HABIT_TITLES[i % len(HABIT_TITLES)] + (f' {i // len(HABIT_TITLES) + 1}' if i >= len(HABIT_TITLES) else ''),
+            frequency=rnd.choice(frequencies),
+            start_date=today - timedelta(days=rnd.randint(30, 365 * years)),
+            is_active=rnd.random() < 0.8,
+        )
+        slugs.allocate(habit)
+        habits.append(habit)
+    habits = Habit.objects.bulk_create(habits)
+    index_objects('habit', habits)
+    return habits
+
+
+def seed_logs(habits, today, rnd):
+    """ Отметка раз в период частоты привычки. У каждой привычки своя
+        «дисциплина», а серии прерываются пропусками """
+    batch = []
+    written = 0
+    for habit in habits:
+        period = FREQUENCY_PERIODS[habit.frequency]
+        discipline = rnd.uniform(0.4, 0.95)
+        day = habit.start_date
+        while day <= today:
+            if rnd.random() < 0.9:
+                batch.append(HabitLog(habit=habit, date=day, is_done=rnd.random() < discipline))
+            day += timedelta(days=period)
+            if len(batch) >= LOG_BATCH_SIZE:
+                HabitLog.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+    if batch:
+        HabitLog.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import bump_user_version
+from .database import apply_pragmas
+from .metrics import install_query_counter
+from .models import Task, Habit, HabitLog
+from .rollups import refresh_for_logs
+from .search import index_objects, remove_objects
+
+
+def invalidate_user_cache(user_ids):
+    # Версию меняем после коммита: иначе параллельный запрос успеет
+    # закэшировать ещё старые данные уже под новой версией
+    for user_id in user_ids:
+        transaction.on_commit(lambda user_id=user_id: bump_user_version(user_id))
+
+
+@receiver(post_init, sender=HabitLog)
+def remember_habit_log_key(sender, instance, **kwargs):
+    # Запоминаем (привычка, дата) на момент загрузки:
+    # если их поменяют в админке, нужно пересчитать и старый день
+    instance._rollup_key = (instance.habit_id, instance.date)
+
+
+@receiver(post_save, sender=HabitLog)
+def update_stats_on_log_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    user_ids = refresh_for_logs({(instance.habit_id, instance.date), instance._rollup_key})
+    instance._rollup_key = (instance.habit_id, instance.date)
+    invalidate_user_cache(user_ids)
+
+
+@receiver(post_delete, sender=HabitLog)
+def update_stats_on_log_delete(sender, instance, **kwargs):
+    user_ids = refresh_for_logs({(instance.habit_id, instance.date), instance._rollup_key})
+    invalidate_user_cache(user_ids)
+
+
+@receiver(post_init, sender=Task)
+def remember_task_deadline(sender, instance, **kwargs):
+    # Через __dict__: у задач из .only() без дедлайна не будет лишнего запроса
+    instance._loaded_deadline = instance.__dict__.get('deadline')
+
+
+@receiver(pre_save, sender=Task)
+def reset_reminder_on_new_deadline(sender, instance, raw=False, **kwargs):
+    # Дедлайн перенесли — напоминания по нему отправляются заново
+    if raw or instance._state.adding:
+        return
+    if instance._loaded_deadline is not None and instance.deadline != instance._loaded_deadline:
+        instance.reminder_stage = Task.REMINDER_NONE
+    instance._loaded_deadline = instance.deadline
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=Habit)
+@receiver(post_delete, sender=Habit)
+def invalidate_on_owner_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_user_cache({instance.user_id})
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Habit)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_objects(sender._meta.model_name, [instance])
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Habit)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_objects(sender._meta.model_name, [instance.pk])
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    apply_pragmas(connection)
+
+
+@receiver(connection_created)
+def count_request_queries(sender, connection, **kwargs):
+    install_query_counter(connection)
@@ -0,0 +1,90 @@
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, IntegerField, Max, Q
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+
+# Сколько раз пробуем заново, если параллельный запрос занял тот же slug
+SLUG_MAX_ATTEMPTS = 5
+
+
+def next_free_slug(model, user_id, base_slug, exclude_pk=None):
+    """ Свободный slug вида base, base-1, base-2 ... за один запрос:
+        база считает, занят ли base, и максимальный числовой суффикс """
+    queryset = model.objects.filter(user_id=user_id)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+
+    suffix = Cast(Substr('slug', len(base_slug) + 2), IntegerField())
+    taken = queryset.aggregate(
+        base_taken=Count('pk', filter=Q(slug=base_slug)),
+        max_suffix=Max(suffix, filter=Q(slug__regex=rf'^{re.escape(base_slug)}-[0-9]+$')),
+    )
+
+    if not taken['base_taken']:
+        return base_slug
+    return f"{base_slug}-{(taken['max_suffix'] or 0) + 1}"
+
+
+def base_slug_for(instance):
+    return slugify(instance.title, allow_unicode=True) or instance._meta.model_name
+
+
+class UserSlugMixin:
+    """ Заполняет slug при сохранении. Уникальность slug в пределах пользователя
+        обеспечивает ограничение в базе, а при гонке slug выбирается заново """
+
+    def save(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        base_slug = base_slug_for(self)
+        for attempt in range(SLUG_MAX_ATTEMPTS):
+            self.slug = next_free_slug(type(self), self.user_id, base_slug, exclude_pk=self.pk)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = type(self).objects.filter(user_id=self.user_id, slug=self.slug).exclude(pk=self.pk).exists()
+                self.slug = ''
+                if not taken or attempt == SLUG_MAX_ATTEMPTS - 1:
+                    raise
+
+
+class SlugAllocator:
+    """ Slug для пачки новых объектов одного пользователя без запроса на каждый:
+        занятые slug читаются один раз, дальше выдача идёт в памяти по тем же
+        правилам, что next_free_slug (base, base-1, base-2 ...) """
+
+    _suffix_re = re.compile(r'^(.+)-([0-9]+)$')
+
+    def __init__(self, model, user_id):
+        self.taken = set(model.objects.filter(user_id=user_id).values_list('slug', flat=True))
+        self.max_suffix = {}
+        for slug in self.taken:
+            match = self._suffix_re.match(slug)
+            if match:
+                base, suffix = match.group(1), int(match.group(2))
+                self.max_suffix[base] = max(self.max_suffix.get(base, 0), suffix)
+
+    def allocate(self, instance, preferred=None):
+        """ Проставляет instance.slug. preferred — slug из источника данных,
+            его сохраняем, если он свободен """
+        if preferred and preferred not in self.taken:
+            slug = preferred
+        else:
+            base = base_slug_for(instance)
+            if base not in self.taken:
+                slug = base
+            else:
+                suffix = self.max_suffix.get(base, 0) + 1
+                # preferred мог занять номер после base — пропускаем его
+                while f'{base}-{suffix}' in self.taken:
+                    suffix += 1
+                self.max_suffix[base] = suffix
+                slug = f'{base}-{suffix}'
+        self.taken.add(slug)
+        instance.slug = slug
+        return slug
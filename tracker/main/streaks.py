@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+
+import numpy as np
+from django.utils import timezone
+
+from .bitmaps import archived_logs
+from .models import HabitLog
+
+
+# Длина периода в днях для каждой частоты: за период нужна хотя бы одна отметка
+FREQUENCY_PERIODS = {
+    'Daily': 1,
+    'Day_about': 2,
+    'Weekly': 7,
+}
+
+
+@dataclass(frozen=True)
+class HabitStats:
+    current_streak: int
+    longest_streak: int
+    expected: int
+    actual: int
+
+    @property
+    def completion_percent(self):
+        return int(self.actual / self.expected * 100) if self.expected else 0
+
+
+def compute_streaks(start_days, periods, log_habits, log_days, today):
+    """ Серии сразу для пачки привычек.
+        start_days, periods  — массивы по привычкам (день начала как ordinal, длина периода);
+        log_habits, log_days — выполненные отметки: индекс привычки и день как ordinal.
+        Возвращает массивы current, longest, expected, actual """
+    start_days = np.asarray(start_days, dtype=np.int64)
+    periods = np.asarray(periods, dtype=np.int64)
+    log_habits = np.asarray(log_habits, dtype=np.int64)
+    log_days = np.asarray(log_days, dtype=np.int64)
+    count = len(start_days)
+
+    # Сколько периодов прошло с начала привычки, включая текущий
+    elapsed = today - start_days
+    expected = np.where(elapsed >= 0, elapsed // periods + 1, 0)
+    current_bucket = expected - 1
+
+    # Номер периода каждой отметки; отметки до начала и после сегодня не считаем
+    offsets = log_days - start_days[log_habits]
+    valid = (offsets >= 0) & (log_days <= today)
+    habits = log_habits[valid]
+    buckets = offsets[valid] // periods[habits]
+
+    current = np.zeros(count, dtype=np.int64)
+    longest = np.zeros(count, dtype=np.int64)
+    if not len(habits):
+        return current, longest, expected, np.zeros(count, dtype=np.int64)
+
+    # Несколько отметок в одном периоде считаются за одну: уникальные пары (привычка, период)
+    width = int(buckets.max()) + 2
+    keys = np.sort(habits * width + buckets)
+    keys = keys[np.append(True, keys[1:] != keys[:-1])]
+    habits, buckets = keys // width, keys % width
+    actual = np.bincount(habits, minlength=count)
+
+    # Серия рвётся при смене привычки или пропуске периода
+    starts = np.ones(len(keys), dtype=bool)
+    starts[1:] = (habits[1:] != habits[:-1]) | (buckets[1:] - buckets[:-1] != 1)
+    ends = np.append(starts[1:], True)
+    run_ids = np.cumsum(starts) - 1
+    run_lengths = np.bincount(run_ids)
+    run_habits = habits[starts]
+    run_end_buckets = buckets[ends]
+
+    np.maximum.at(longest, run_habits, run_lengths)
+
+    # Текущая серия — последняя серия привычки, если она дошла до текущего периода
+    # или до предыдущего (текущий период ещё не закончился)
+    last = np.append(run_habits[1:] != run_habits[:-1], True)
+    last_habits = run_habits[last]
+    alive = run_end_buckets[last] >= current_bucket[last_habits] - 1
+    current[last_habits[alive]] = run_lengths[last][alive]
+
+    return current, longest, expected, actual
+
+
+def get_habit_stats(habits, today=None):
+    """ Статистика для списка привычек одним запросом к логам
+        (и архиву, если часть истории уже там).
+        Возвращает словарь {pk привычки: HabitStats} """
+    habits = list(habits)
+    if not habits:
+        return {}
+    today = today or timezone.now().date()
+
+    index = {habit.pk: i for i, habit in enumerate(habits)}
+    rows = HabitLog.objects.filter(
+        habit_id__in=index,
+        is_done=True,
+        date__lte=today
+    ).order_by().values_list('habit_id', 'date')
+
+    log_habits = []
+    log_days = []
+    for habit_id, day in rows.iterator(chunk_size=5000):
+        log_habits.append(index[habit_id])
+        log_days.append(day.toordinal())
+
+    # История части привычек — в масках годов; запрос только если такие есть
+    archived = [habit.pk for habit in habits if habit.uses_bitmaps]
+    if archived:
+        for habit_id, _, day, is_done in archived_logs(archived, end=today):
+            if is_done:
+                log_habits.append(index[habit_id])
+                log_days.append(day.toordinal())
+
+    current, longest, expected, actual = compute_streaks(
+        [habit.start_date.toordinal() for habit in habits],
+        [FREQUENCY_PERIODS.get(habit.frequency, 1) for habit in habits],
+        log_habits,
+        log_days,
+        today.toordinal(),
+    )
+
+    return {
+        habit.pk: HabitStats(
+            current_streak=int(current[i]),
+            longest_streak=int(longest[i]),
+            expected=int(expected[i]),
+            actual=int(actual[i]),
+        )
+        for i, habit in enumerate(habits)
+    }
@@ -1,3 +1,1402 @@
-from django.test import TestCase
+import base64
+import importlib
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection, IntegrityError, transaction
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+from django.utils import timezone
+
+from .dashboard import get_habit_progress, get_near_deadlines
+from .forms import TaskFilterForm
+from .heatmap import build_heatmap
+from . import analytics, bitmaps, metrics, missed, notifications, reminders, search, slugs
+from .cache import get_user_version
+from .cache_backends import LRUCache
+from .bitmaps import HabitBitmap
+from .checkins import CHECK_IN_MAX_ITEMS, bulk_check_in
+from .database import ReplicaRouter, read_from_replica
+from .models import Task, Habit, HabitLog, HabitDailyStat, HabitYearBitmap, JobCheckpoint, Notification
+from .pagination import CursorPaginator, EstimatedCountPaginator
+from .rollups import rebuild_daily_stats
+from .streaks import compute_streaks, get_habit_stats
+from .transfer import export_rows, import_records, read_records
+
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'main.cache_backends.LRUCache',
+        'LOCATION': 'tests',
+    }
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TrackerTestCase(TestCase):
+    """ Общие данные: пользователь с задачами, привычками и логами """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.user = User.objects.create_user(username='daniil', password='secret-pass-123')
+        for i in range(10):
+            Task.objects.create(
+                title=f'Задача {i}',
+                user=cls.user,
+                deadline=cls.today + timedelta(days=i),
+            )
+        cls.habits = [
+            Habit.objects.create(title=f'Привычка {i}', user=cls.user, start_date=cls.today - timedelta(days=60))
+            for i in range(5)
+        ]
+        for habit in cls.habits:
+            for days_ago in range(10):
+                HabitLog.objects.create(
+                    habit=habit,
+                    date=cls.today - timedelta(days=days_ago),
+                    is_done=days_ago % 2 == 0,
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+
+class HomePageTests(TrackerTestCase):
+    # Бюджет запросов главной: сессия, пользователь, страница задач (без COUNT),
+    # активные привычки, выполненные логи для серий и один агрегат прогресса.
+    HOME_QUERY_BUDGET = 6
+
+    def test_home_query_budget(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(ctx.captured_queries), self.HOME_QUERY_BUDGET,
+            '\n'.join(q['sql'] for q in ctx.captured_queries)
+        )
+
+    def test_habit_progress_single_query(self):
+        with self.assertNumQueries(1):
+            progress = get_habit_progress(self.user, today=self.today)
+        # за 8 дней (сегодня и 7 прошлых) выполнено 4 из 8 у каждой привычки
+        self.assertEqual(progress, 50)
+
+
+class HabitDailyStatTests(TrackerTestCase):
+
+    def stat(self, date):
+        return HabitDailyStat.objects.get(user=self.user, date=date)
+
+    def test_counters_follow_log_writes(self):
+        stat = self.stat(self.today)
+        self.assertEqual((stat.total, stat.done), (5, 5))
+
+        log = HabitLog.objects.get(habit=self.habits[0], date=self.today)
+        log.is_done = False
+        log.save()
+        self.assertEqual((self.stat(self.today).total, self.stat(self.today).done), (5, 4))
+
+        # перенос лога на другой день пересчитывает оба дня
+        log.date = self.today - timedelta(days=30)
+        log.save()
+        self.assertEqual(self.stat(self.today).total, 4)
+        self.assertEqual(self.stat(log.date).total, 1)
+
+        log.delete()
+        self.assertEqual(self.stat(log.date).total, 0)
+
+    def test_mark_done_updates_counters(self):
+        habit = Habit.objects.create(title='Новая', user=self.user, start_date=self.today)
+        self.client.post(reverse('habit_mark_done', kwargs={'slug': habit.slug}))
+        stat = self.stat(self.today)
+        self.assertEqual((stat.total, stat.done), (6, 6))
+
+    def test_second_mark_done_keeps_single_log(self):
+        habit = self.habits[0]
+        HabitLog.objects.filter(habit=habit, date=self.today).delete()
+        for _ in range(2):
+            self.client.post(reverse('habit_mark_done', kwargs={'slug': habit.slug}))
+        self.assertEqual(HabitLog.objects.filter(habit=habit, date=self.today).count(), 1)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            HabitLog.objects.create(habit=habit, date=self.today)
+
+    def test_rebuild_command_matches_signals(self):
+        expected = set(HabitDailyStat.objects.values_list('user_id', 'date', 'total', 'done'))
+        HabitDailyStat.objects.all().delete()
+        call_command('rebuild_habit_stats', stdout=StringIO())
+        self.assertEqual(
+            set(HabitDailyStat.objects.values_list('user_id', 'date', 'total', 'done')),
+            expected
+        )
+
+
+class SlugAllocationTests(TrackerTestCase):
+
+    def create_task(self):
+        return Task.objects.create(title='Отчёт', user=self.user, deadline=self.today)
+
+    def test_query_count_does_not_grow_with_collisions(self):
+        with CaptureQueriesContext(connection) as first:
+            self.create_task()
+        for _ in range(48):
+            self.create_task()
+        with CaptureQueriesContext(connection) as fiftieth:
+            task = self.create_task()
+
+        self.assertEqual(task.slug, 'отчёт-49')
+        self.assertEqual(len(fiftieth.captured_queries), len(first.captured_queries))
+
+    def test_slugs_are_per_user(self):
+        other = User.objects.create_user(username='other', password='secret-pass-123')
+        habit = Habit.objects.create(title='Привычка 0', user=other, start_date=self.today)
+        self.assertEqual(habit.slug, 'привычка-0')
+
+    def test_retries_when_slug_taken_concurrently(self):
+        self.create_task()
+        allocate = slugs.next_free_slug
+        calls = []
+
+        def stale_then_fresh(*args, **kwargs):
+            # Первый вызов «не видит» параллельно созданную задачу
+            calls.append(args)
+            return 'отчёт' if len(calls) == 1 else allocate(*args, **kwargs)
+
+        with mock.patch.object(slugs, 'next_free_slug', side_effect=stale_then_fresh):
+            task = self.create_task()
+        self.assertEqual(task.slug, 'отчёт-1')
+        self.assertEqual(len(calls), 2)
+
+
+class HabitHeatmapTests(TrackerTestCase):
+
+    def url(self, **params):
+        return reverse('habit_heatmap', kwargs={'slug': self.habits[0].slug}), params
+
+    def test_bitsets(self):
+        start = self.today - timedelta(days=9)
+        url, params = self.url(start=start.isoformat(), end=self.today.isoformat())
+        data = self.client.get(url, params).json()
+
+        done = base64.b64decode(data['done'])
+        missed = base64.b64decode(data['missed'])
+        self.assertEqual(data['days'], 10)
+        self.assertEqual(data['done_count'], 5)
+        for offset in range(10):
+            days_ago = 9 - offset
+            bit = (done if days_ago % 2 == 0 else missed)[offset // 8] >> (offset % 8) & 1
+            self.assertEqual(bit, 1)
+
+    def test_conditional_get(self):
+        url, params = self.url()
+        response = self.client.get(url, params)
+        etag = response['ETag']
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        HabitLog.objects.create(habit=self.habits[0], date=self.today - timedelta(days=100))
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_bad_period(self):
+        url, params = self.url(start=self.today.isoformat(), end=(self.today - timedelta(days=1)).isoformat())
+        self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class StreakEngineTests(TrackerTestCase):
+
+    def test_daily_habit(self):
+        # выполнено сегодня, 2, 4, 6 и 8 дней назад: серии по одному дню
+        stats = get_habit_stats(self.habits, today=self.today)[self.habits[0].pk]
+        self.assertEqual((stats.current_streak, stats.longest_streak), (1, 1))
+        self.assertEqual((stats.expected, stats.actual), (61, 5))
+        self.assertEqual(stats.completion_percent, 8)
+
+    def test_frequencies_in_one_batch(self):
+        today = 100
+        current, longest, expected, actual = compute_streaks(
+            start_days=[0, 0, 0],
+            periods=[1, 2, 7],
+            # ежедневная: 97..99 (сегодня ещё не отмечена)
+            # через день: каждый второй день 60..98
+            # еженедельная: недели 0-3 и 10-13, 14-я (текущая) пока пустая
+            log_habits=[0, 0, 0] + [1] * 20 + [2] * 8,
+            log_days=[97, 98, 99] + list(range(60, 100, 2)) + [0, 7, 14, 21, 70, 77, 84, 91],
+            today=today,
+        )
+        self.assertEqual(list(current), [3, 20, 4])
+        self.assertEqual(list(longest), [3, 20, 4])
+        self.assertEqual(list(expected), [101, 51, 15])
+        self.assertEqual(list(actual), [3, 20, 8])
+
+    def test_broken_streak(self):
+        current, longest, _, _ = compute_streaks([0], [1], [0, 0, 0, 0], [1, 2, 3, 7], today=10)
+        self.assertEqual((current[0], longest[0]), (0, 3))
+
+
+class UserCacheTests(TrackerTestCase):
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        return len(ctx.captured_queries)
+
+    def test_home_served_from_cache_until_write(self):
+        url = reverse('home')
+        cold = self.count_queries(url)
+        warm = self.count_queries(url)
+        self.assertLess(warm, cold)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.create(title='Новая', user=self.user, start_date=self.today)
+        response = self.client.get(url)
+        self.assertContains(response, 'Новая')
+
+    def test_habit_detail_invalidated_by_mark_done(self):
+        habit = Habit.objects.create(title='Бег', user=self.user, start_date=self.today)
+        url = reverse('habit_detail', kwargs={'slug': habit.slug})
+        self.assertFalse(self.client.get(url).context['done_today'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('habit_mark_done', kwargs={'slug': habit.slug}))
+        self.assertTrue(self.client.get(url).context['done_today'])
+
+    def test_habit_detail_counts_from_history_rows(self):
+        habit = Habit.objects.create(title='Бег', user=self.user, start_date=self.today - timedelta(days=5))
+        for days_ago, is_done in [(0, True), (1, False), (2, True), (40, True)]:
+            HabitLog.objects.create(habit=habit, date=self.today - timedelta(days=days_ago), is_done=is_done)
+        url = reverse('habit_detail', kwargs={'slug': habit.slug})
+        with CaptureQueriesContext(connection) as ctx:
+            context = self.client.get(url).context
+        self.assertEqual((context['total_days'], context['done_days'], context['progress_percent']), (3, 2, 66))
+        self.assertTrue(context['done_today'])
+        # история за период и серии — по одному запросу к логам
+        self.assertEqual(sum('main_habitlog' in query['sql'] for query in ctx.captured_queries), 2)
+
+    def test_other_users_cache_untouched(self):
+        other = User.objects.create_user(username='other', password='secret-pass-123')
+        self.client.get(reverse('habit'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.create(title='Чужая', user=other, start_date=self.today)
+        self.assertEqual(self.count_queries(reverse('habit')), 2)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('habit'))
+        self.client.get(reverse('habit'))
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.get(reverse('metrics'))
+        self.assertContains(response, 'tracker_cache_requests_total{fragment="habits",result="hits"}')
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_access(self):
+        url = reverse('metrics')
+        # с 127.0.0.1 приходит и всё, что прошло через прокси на том же хосте
+        self.client.logout()
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class LRUCacheBackendTests(TestCase):
+
+    def make_cache(self, **options):
+        backend = LRUCache(f'test-{self._testMethodName}', {'OPTIONS': options})
+        backend.clear()
+        return backend
+
+    def test_evicts_least_recently_used(self):
+        lru = self.make_cache(MAX_ENTRIES=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+    def test_evicts_by_size(self):
+        lru = self.make_cache(MAX_BYTES=1000)
+        for i in range(10):
+            lru.set(i, 'x' * 300)
+        self.assertLessEqual(lru._store.size, 1000)
+        self.assertIsNotNone(lru.get(9))
+        self.assertIsNone(lru.get(0))
+
+    def test_ttl(self):
+        lru = self.make_cache()
+        with mock.patch('main.cache_backends.time.time', return_value=1000):
+            lru.set('key', 'value', timeout=10)
+        with mock.patch('main.cache_backends.time.time', return_value=1005):
+            self.assertEqual(lru.get('key'), 'value')
+        with mock.patch('main.cache_backends.time.time', return_value=1011):
+            self.assertIsNone(lru.get('key'))
+            self.assertEqual(lru._store.size, 0)
+
+    def test_incr_and_add(self):
+        lru = self.make_cache()
+        self.assertTrue(lru.add('counter', 1))
+        self.assertFalse(lru.add('counter', 5))
+        self.assertEqual(lru.incr('counter'), 2)
+        with self.assertRaises(ValueError):
+            lru.incr('missing')
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'main.cache_backends.TieredCache',
+        'OPTIONS': {'LOCAL': 'local', 'SHARED': 'shared', 'LOCAL_TIMEOUT': 5},
+    },
+    'local': {'BACKEND': 'main.cache_backends.LRUCache', 'LOCATION': 'tiered-local'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-shared'},
+})
+class TieredCacheBackendTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_reads_local_first_and_fills_it_from_shared(self):
+        caches['shared'].set('key', 'shared')
+        self.assertEqual(caches['default'].get('key'), 'shared')
+        caches['shared'].delete('key')
+        # локальная копия ещё жива
+        self.assertEqual(caches['default'].get('key'), 'shared')
+
+    def test_incr_drops_local_copy(self):
+        tiered = caches['default']
+        tiered.set('version', 1)
+        self.assertEqual(tiered.incr('version'), 2)
+        self.assertEqual(tiered.get('version'), 2)
+        self.assertEqual(caches['shared'].get('version'), 2)
+
+
+class SearchTests(TrackerTestCase):
+    backend_class = search.FTSBackend
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(search, 'get_backend', return_value=self.backend_class())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.report = self.add_task('Квартальный ОТЧЁТ', 'Собрать цифры')
+        self.mention = self.add_task('Позвонить', 'Обсудить отчет с руководителем')
+
+    def add_task(self, title, description):
+        return Task.objects.create(title=title, description=description, user=self.user, deadline=self.today)
+
+    def test_prefix_casefold_and_yo(self):
+        self.assertEqual(search.search_ids(self.user.pk, 'task', 'отче')[0], self.report.pk)
+        self.assertIn(self.mention.pk, search.search_ids(self.user.pk, 'task', 'ОТЧЕТ'))
+
+    def test_title_ranked_above_description(self):
+        self.assertEqual(search.search_ids(self.user.pk, 'task', 'отчёт'), [self.report.pk, self.mention.pk])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(search.search_ids(self.user.pk, 'task', 'отчет руковод'), [self.mention.pk])
+
+    def test_index_follows_updates_and_other_users(self):
+        self.report.title = 'Годовой план'
+        self.report.save()
+        self.assertEqual(search.search_ids(self.user.pk, 'task', 'квартальный'), [])
+
+        other = User.objects.create_user(username='other', password='secret-pass-123')
+        Habit.objects.create(title='Отчёт', user=other, start_date=self.today)
+        self.assertEqual(search.search_ids(self.user.pk, 'habit', 'отчет'), [])
+
+        self.mention.delete()
+        self.assertEqual(search.search_ids(self.user.pk, 'task', 'отчет'), [])
+
+    def test_task_list_search(self):
+        response = self.client.get(reverse('task'), {'search': 'отч'})
+        self.assertEqual(list(response.context['tasks']), [self.report, self.mention])
+        self.assertFalse(response.context['search_truncated'])
+
+    def test_truncated_search_is_shown(self):
+        with mock.patch.object(search, 'SEARCH_RESULT_LIMIT', 1):
+            response = self.client.get(reverse('task'), {'search': 'отч', 'sort': 'deadline'})
+        self.assertEqual(list(response.context['tasks']), [self.report])
+        self.assertTrue(response.context['search_truncated'])
+        self.assertContains(response, 'уточните запрос')
+
+
+class InvertedIndexSearchTests(SearchTests):
+    backend_class = search.InvertedIndexBackend
+
+
+class CursorPaginationTests(TrackerTestCase):
+
+    def walk(self, url, params):
+        """ Проходит страницы по ссылкам «Вперед», возвращает id объектов по порядку """
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page_obj']
+            seen.extend(obj.pk for obj in page)
+            if not page.has_next():
+                return seen
+            response = self.client.get(url + '?' + page.next_query)
+
+    def test_every_task_sort(self):
+        # одинаковые приоритеты проверяют добор порядка по id
+        Task.objects.filter(pk__in=Task.objects.order_by('pk').values('pk')[:5]).update(priority=3)
+        for sort, _ in TaskFilterForm.base_fields['sort'].choices:
+            expected = list(Task.objects.filter(user=self.user).order_by(
+                *CursorPaginator.resolve_ordering(Task.objects.order_by(sort))
+            ).values_list('pk', flat=True))
+            self.assertEqual(self.walk(reverse('task'), {'sort': sort}), expected, sort)
+
+    def test_habits_by_title(self):
+        for i in range(10):
+            Habit.objects.create(title=f'Бег {i % 3}', user=self.user, start_date=self.today)
+        expected = list(Habit.objects.filter(user=self.user).order_by('title', 'pk').values_list('pk', flat=True))
+        self.assertEqual(self.walk(reverse('habit'), {}), expected)
+
+    def test_previous_page(self):
+        first = self.client.get(reverse('task')).context['page_obj']
+        second = self.client.get(reverse('task') + '?' + first.next_query).context['page_obj']
+        back = self.client.get(reverse('task') + '?' + second.previous_query).context['page_obj']
+        self.assertEqual([t.pk for t in back], [t.pk for t in first])
+        self.assertFalse(back.has_previous())
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('task'))
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('task'), {'cursor': 'мусор'}).status_code, 404)
+        # курсор от сортировки по дате не подходит к сортировке по приоритету
+        page = self.client.get(reverse('task'), {'sort': 'deadline'}).context['page_obj']
+        response = self.client.get(reverse('task'), {'sort': 'priority', 'cursor': page.next_cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkCheckInTests(TrackerTestCase):
+
+    def post(self, items):
+        return self.client.post(
+            reverse('habit_check_in'), json.dumps({'items': items}), content_type='application/json'
+        )
+
+    def test_results_per_item(self):
+        habit = self.habits[0]
+        other = User.objects.create_user(username='other', password='x')
+        foreign = Habit.objects.create(title='Чужая', user=other, start_date=self.today)
+        items = [
+            {'habit': habit.slug, 'date': str(self.today - timedelta(days=20))},
+            {'habit': habit.slug, 'date': str(self.today)},
+            {'habit': habit.slug, 'date': str(self.today - timedelta(days=1))},
+            {'habit': habit.slug, 'date': str(self.today - timedelta(days=20))},
+            {'habit': foreign.slug, 'date': str(self.today)},
+            {'habit': habit.slug, 'date': str(self.today + timedelta(days=1))},
+            {'habit': habit.slug, 'date': '2026-02-30'},
+            {'habit': habit.slug, 'date': str(habit.start_date - timedelta(days=1))},
+        ]
+        response = self.post(items)
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.json()['results']]
+        # сегодня уже выполнено, вчера было пропущено
+        self.assertEqual(statuses, [
+            'created', 'exists', 'updated', 'duplicate', 'not_found', 'invalid', 'invalid', 'invalid'
+        ])
+        self.assertTrue(HabitLog.objects.get(habit=habit, date=self.today - timedelta(days=1)).is_done)
+        self.assertFalse(HabitLog.objects.filter(habit=foreign).exists())
+
+    def test_queries_do_not_grow_with_items(self):
+        items = [
+            {'habit': habit.slug, 'date': str(self.today - timedelta(days=days_ago))}
+            for habit in self.habits for days_ago in range(10, 40)
+        ]
+        version = get_user_version(self.user.pk)
+        # сессия, пользователь, привычки, логи, upsert, агрегат и upsert статистики
+        # (+ savepoint транзакции)
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(9):
+            response = self.post(items)
+        self.assertEqual(response.json()['created'], len(items))
+        self.assertNotEqual(get_user_version(self.user.pk), version)
+
+        stat = HabitDailyStat.objects.get(user=self.user, date=self.today - timedelta(days=15))
+        self.assertEqual((stat.total, stat.done), (5, 5))
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.post(
+            reverse('habit_check_in'), 'не json', content_type='application/json'
+        ).status_code, 400)
+        self.assertEqual(self.post({'habit': 'x'}).status_code, 400)
+        self.assertEqual(self.post([{}] * (CHECK_IN_MAX_ITEMS + 1)).status_code, 400)
+
+
+class AsyncViewsTests(TrackerTestCase):
+    """ Async-версии страниц отдают то же, что синхронные """
+
+    @classmethod
+    def reload_urls(cls, use_async):
+        # маршруты выбираются при импорте, поэтому перечитываем оба urls.py
+        from . import urls
+        from tracker import urls as root_urls
+        with override_settings(USE_ASYNC_VIEWS=use_async):
+            importlib.reload(urls)
+            importlib.reload(root_urls)
+        clear_url_caches()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reload_urls(True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.reload_urls(False)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.user)
+
+    async def test_home(self):
+        response = await self.async_client.get(reverse('home'), {'sort': 'deadline'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.resolver_match.func.view_class.__name__.startswith('Async'))
+        tasks = [task async for task in Task.objects.filter(user=self.user).order_by('deadline', 'pk')[:7]]
+        self.assertEqual(list(response.context['tasks']), tasks)
+        self.assertEqual(response.context['habit_progress'], 50)
+        self.assertEqual(len(response.context['near_deadlines']), 5)
+        # middleware метрик видит запросы async ORM из рабочего потока
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+    async def test_truncated_search_is_shown(self):
+        with mock.patch.object(search, 'SEARCH_RESULT_LIMIT', 3):
+            response = await self.async_client.get(reverse('task'), {'search': 'задача'})
+        self.assertEqual(len(response.context['tasks']), 3)
+        self.assertTrue(response.context['search_truncated'])
+        self.assertContains(response, 'уточните запрос')
+
+    async def test_habit_detail_and_mark_done(self):
+        # AsyncClient кодирует путь не так, как ASGI-сервер, — берём латинский slug
+        habit = await Habit.objects.acreate(title='Run', user=self.user, start_date=self.today - timedelta(days=9))
+        await HabitLog.objects.abulk_create(
+            HabitLog(habit=habit, date=self.today - timedelta(days=days_ago), is_done=days_ago % 2 == 1)
+            for days_ago in range(1, 10)
+        )
+        response = await self.async_client.get(reverse('habit_detail', args=[habit.slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['done_today'])
+        self.assertEqual((response.context['total_days'], response.context['done_days']), (9, 5))
+        # сессия, пользователь, привычка и по одному запросу к логам на историю
+        # и серии, как в sync-версии (запросы async ORM считает middleware метрик)
+        self.assertIn('desc="5 queries"', response['Server-Timing'])
+
+        response = await self.async_client.post(reverse('habit_mark_done', args=[habit.slug]))
+        self.assertRedirects(response, reverse('habit_detail', args=[habit.slug]), fetch_redirect_response=False)
+        self.assertTrue(await HabitLog.objects.filter(habit=habit, date=self.today, is_done=True).aexists())
+
+    async def test_login_required_and_404(self):
+        response = await self.async_client.get(reverse('habit_detail', args=['нет-такой']))
+        self.assertEqual(response.status_code, 404)
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('task'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+
+class TransferTests(TrackerTestCase):
+
+    def export(self, **params):
+        response = self.client.get(reverse('export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_ndjson_round_trip(self):
+        data = self.export(format='ndjson')
+        self.assertEqual(len(data.splitlines()), 10 + 5 + 50)
+
+        newcomer = User.objects.create_user(username='newcomer', password='x')
+        self.client.force_login(newcomer)
+        response = self.client.post(
+            reverse('import') + '?format=ndjson',
+            {'file': SimpleUploadedFile('data.ndjson', data)}
+        )
+        self.assertEqual(response.json()['imported'], {'tasks': 10, 'habits': 5, 'logs': 50})
+        self.assertEqual(
+            sorted(Habit.objects.filter(user=newcomer).values_list('slug', flat=True)),
+            sorted(habit.slug for habit in self.habits)
+        )
+        self.assertEqual(HabitLog.objects.filter(habit__user=newcomer, is_done=True).count(), 25)
+        # счётчики и поиск обновлены, хотя сигналы bulk_create не шлёт
+        self.assertEqual(get_habit_progress(newcomer, today=self.today), 50)
+        self.assertEqual(len(search.search_ids(newcomer.pk, 'task', 'задача')), 10)
+
+    def test_csv_import_into_existing_habits(self):
+        habits_csv = 'title,slug,frequency,start_date,is_active\n' \
+                     f'Привычка 0,привычка-0,Weekly,{self.today},false\n' \
+                     'Без даты,,Daily,,true\n'
+        summary = import_records(self.user, read_records(
+            SimpleUploadedFile('h.csv', habits_csv.encode()).file, 'csv', 'habits'
+        ))
+        self.assertEqual((summary['imported']['habits'], summary['updated']['habits']), (0, 1))
+        self.assertEqual([error['line'] for error in summary['errors']], [3])
+        # привычка с таким slug уже есть — она обновлена, а не задвоена
+        self.assertEqual(Habit.objects.filter(user=self.user).count(), 5)
+        self.assertTrue(Habit.objects.filter(user=self.user, slug='привычка-0', frequency='Weekly', is_active=False).exists())
+
+        logs_csv = 'habit,date,is_done\n' + ''.join(
+            f'привычка-1,{self.today - timedelta(days=days_ago)},true\n' for days_ago in range(30)
+        ) + 'нет-такой,2026-01-01,true\n'
+        summary = import_records(self.user, read_records(
+            SimpleUploadedFile('l.csv', logs_csv.encode()).file, 'csv', 'logs'
+        ))
+        self.assertEqual(summary['imported']['logs'], 30)
+        self.assertEqual(summary['error_count'], 1)
+        self.assertEqual(HabitLog.objects.filter(habit=self.habits[1]).count(), 30)
+        self.assertFalse(HabitLog.objects.filter(habit=self.habits[1], is_done=False).exists())
+
+    def test_reimport_of_export_updates_in_place(self):
+        Task.objects.filter(user=self.user, title='Задача 0').update(reminder_stage=Task.REMINDER_DUE)
+        data = self.export(format='ndjson').replace('Задача 1'.encode(), 'Задача один'.encode())
+        response = self.client.post(reverse('import') + '?format=ndjson', {'file': SimpleUploadedFile('d.ndjson', data)})
+        self.assertEqual(response.json()['imported'], {'tasks': 0, 'habits': 0, 'logs': 50})
+        self.assertEqual(response.json()['updated'], {'tasks': 10, 'habits': 5})
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(Habit.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(HabitLog.objects.filter(habit__user=self.user).count(), 50)
+        self.assertEqual(search.search_ids(self.user.pk, 'task', 'один'), [Task.objects.get(title='Задача один').pk])
+        # дедлайн не менялся — отправленное напоминание не сбрасывается
+        self.assertEqual(Task.objects.get(title='Задача 0').reminder_stage, Task.REMINDER_DUE)
+
+    def test_reimport_keeps_fields_missing_from_file(self):
+        task = Task.objects.get(user=self.user, title='Задача 3')
+        Task.objects.filter(pk=task.pk).update(status='done', description='Подробности', priority=3)
+        Habit.objects.filter(pk=self.habits[3].pk).update(frequency='Weekly', is_active=False)
+        lines = [
+            {'type': 'task', 'slug': task.slug, 'title': 'Задача три', 'deadline': str(task.deadline)},
+            {'type': 'habit', 'slug': self.habits[3].slug, 'title': 'Привычка три', 'start_date': str(self.today)},
+        ]
+        data = '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines).encode()
+        summary = import_records(self.user, read_records(iter(data.splitlines()), 'ndjson'))
+        self.assertEqual(summary['updated'], {'tasks': 1, 'habits': 1})
+
+        task.refresh_from_db()
+        self.assertEqual((task.title, task.status, task.description, task.priority), ('Задача три', 'done', 'Подробности', 3))
+        habit = Habit.objects.get(pk=self.habits[3].pk)
+        self.assertEqual((habit.title, habit.frequency, habit.is_active), ('Привычка три', 'Weekly', False))
+        # поиск видит описание из базы, а не значение по умолчанию
+        self.assertEqual(search.search_ids(self.user.pk, 'task', 'подробности'), [task.pk])
+
+    def test_repeated_slug_and_early_logs(self):
+        habits_csv = 'title,slug,frequency,start_date,is_active\n' \
+                     f'Чтение,чтение,Daily,{self.today - timedelta(days=5)},true\n' \
+                     'Чтение вслух,чтение,Weekly,,\n'
+        summary = import_records(self.user, read_records(
+            SimpleUploadedFile('h.csv', habits_csv.encode()).file, 'csv', 'habits'
+        ))
+        # вторая строка без даты начала — ошибка, привычка одна
+        self.assertEqual(summary['imported']['habits'], 1)
+
+        lines = [
+            {'type': 'habit', 'slug': 'сон', 'title': 'Сон', 'start_date': str(self.today - timedelta(days=3))},
+            {'type': 'habit', 'slug': 'сон', 'title': 'Сон до 23:00', 'start_date': str(self.today - timedelta(days=3))},
+            {'type': 'log', 'habit': 'сон', 'date': str(self.today)},
+            {'type': 'log', 'habit': 'сон', 'date': str(self.today - timedelta(days=4))},
+            {'type': 'log', 'habit': 'чтение', 'date': str(self.today - timedelta(days=6))},
+        ]
+        data = '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines).encode()
+        summary = import_records(self.user, read_records(iter(data.splitlines()), 'ndjson'))
+        self.assertEqual(summary['imported'], {'tasks': 0, 'habits': 1, 'logs': 1})
+        self.assertEqual([error['line'] for error in summary['errors']], [4, 5])
+        habit = Habit.objects.get(user=self.user, slug='сон')
+        self.assertEqual(habit.title, 'Сон до 23:00')
+        self.assertEqual(list(habit.habit_log.values_list('date', flat=True)), [self.today])
+
+    def test_import_errors(self):
+        tasks_csv = 'title,deadline\nОтчёт для бухгалтерии,2026-01-01\n'.encode('cp1251')
+        response = self.client.post(
+            reverse('import') + '?format=csv&kind=tasks', {'file': SimpleUploadedFile('t.csv', tasks_csv)}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.filter(title__startswith='Отчёт').exists())
+
+        data = self.export(format='ndjson', kind='tasks')
+        with mock.patch('main.transfer.Importer.flush', side_effect=IntegrityError('UNIQUE constraint failed')):
+            response = self.client.post(reverse('import'), {'file': SimpleUploadedFile('d.ndjson', data)})
+        self.assertEqual(response.status_code, 409)
+
+    def test_import_queries_do_not_depend_on_rows(self):
+        def import_logs(days):
+            lines = ''.join(
+                json.dumps({'type': 'log', 'habit': self.habits[2].slug, 'date': str(self.today - timedelta(days=d))}) + '\n'
+                for d in range(days)
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                import_records(self.user, read_records(iter(lines.encode().splitlines()), 'ndjson'))
+            return len(ctx.captured_queries)
+
+        # число запросов зависит только от пачек SQLite (лимит параметров), не от строк
+        self.assertLessEqual(import_logs(1000), 20)
+
+    def test_csv_export_requires_kind(self):
+        self.assertEqual(self.client.get(reverse('export'), {'format': 'csv'}).status_code, 400)
+        data = self.export(format='csv', kind='logs').decode()
+        self.assertEqual(data.splitlines()[0], 'habit,date,is_done')
+        self.assertEqual(len(data.splitlines()), 51)
+
+
+class RequestMetricsTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+
+    def test_server_timing_header(self):
+        self.client.get(reverse('habit'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('habit'))
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timing)
+        self.assertIn('cache;desc="hit=1 miss=0"', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_rolling_percentiles_in_metrics(self):
+        for _ in range(3):
+            self.client.get(reverse('task'))
+        self.assertEqual(metrics.snapshot()['task']['count'], 3)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertContains(response, 'tracker_request_duration_ms{view="task",quantile="0.95"}')
+        self.assertContains(response, 'tracker_request_duration_ms_count{view="task"} 3')
+
+    @override_settings(QUERY_BUDGETS={'task': 1})
+    def test_query_budget_warning(self):
+        with self.assertLogs('main.metrics', 'WARNING') as logs:
+            self.client.get(reverse('task'))
+        self.assertIn('View task', logs.output[0])
+        self.assertEqual(metrics.snapshot()['task']['over_budget'], 1)
+
+
+class BenchmarkCommandsTests(TestCase):
+
+    def test_seed_and_run_benchmarks(self):
+        call_command('seed_data', users=2, tasks=20, habits=3, years=1, prefix='bench', stdout=StringIO())
+        self.assertEqual(Task.objects.filter(user__username='bench1').count(), 20)
+        self.assertTrue(HabitLog.objects.filter(habit__user__username='bench0').exists())
+        # счётчики заполнены, хотя логи писались bulk_create
+        self.assertEqual(
+            sum(HabitDailyStat.objects.filter(user__username='bench0').values_list('total', flat=True)),
+            HabitLog.objects.filter(habit__user__username='bench0').count()
+        )
+
+        logs_before = HabitLog.objects.count()
+        output = StringIO()
+        call_command('run_benchmarks', user='bench0', repeat=2, stdout=output, stderr=StringIO())
+        results = json.loads(output.getvalue())['results']
+        self.assertEqual(results['home']['status'], 200)
+        self.assertGreater(results['home']['queries_cold'], results['home']['queries'])
+        self.assertEqual(results['habit_check_in']['status'], 200)
+        self.assertIn('peak_memory_kb', results['task?sort=deadline'])
+        # запросы прогона откатываются
+        self.assertEqual(HabitLog.objects.count(), logs_before)
+
+
+class MissedLogsTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='other', password='secret-pass-123')
+        start = self.today - timedelta(days=14)
+        self.daily = Habit.objects.create(title='Бег', user=self.other, start_date=start)
+        self.weekly = Habit.objects.create(title='Уборка', user=self.other, start_date=start, frequency='Weekly')
+        self.inactive = Habit.objects.create(title='Старая', user=self.other, start_date=start, is_active=False)
+        HabitLog.objects.create(habit=self.daily, date=start, is_done=True)
+        HabitLog.objects.create(habit=self.weekly, date=start + timedelta(days=3), is_done=True)
+        self.yesterday = self.today - timedelta(days=1)
+
+    def missed(self, habit):
+        return list(HabitLog.objects.filter(habit=habit, is_done=False).order_by('date').values_list('date', flat=True))
+
+    def test_missed_periods_per_frequency(self):
+        call_command('generate_missed_logs', date=self.yesterday, stdout=StringIO())
+        # 14 прошедших дней, один отмечен
+        self.assertEqual(len(self.missed(self.daily)), 13)
+        # вторая неделя без отметки: пропуск на её последний день
+        self.assertEqual(self.missed(self.weekly), [self.daily.start_date + timedelta(days=13)])
+        self.assertEqual(self.missed(self.inactive), [])
+        self.daily.refresh_from_db()
+        self.assertEqual(self.daily.missed_checked_until, self.yesterday)
+        # счётчики пересчитаны
+        self.assertEqual(
+            sum(HabitDailyStat.objects.filter(user=self.other).values_list('total', flat=True)),
+            HabitLog.objects.filter(habit__user=self.other).count()
+        )
+
+    def test_rerun_is_idempotent_and_incremental(self):
+        call_command('generate_missed_logs', date=self.yesterday - timedelta(days=1), stdout=StringIO())
+        count = HabitLog.objects.count()
+        call_command('generate_missed_logs', date=self.yesterday - timedelta(days=1),
+                     restart=True, stdout=StringIO())
+        self.assertEqual(HabitLog.objects.count(), count)
+        # следующая ночь добавляет только новый день
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('generate_missed_logs', date=self.yesterday, stdout=StringIO())
+        self.assertEqual(self.missed(self.daily)[-1], self.yesterday)
+        self.assertEqual(HabitLog.objects.count(), count + 2)
+
+    def test_reactivated_habit_not_backfilled(self):
+        week_ago = self.yesterday - timedelta(days=7)
+        missed.generate_for_users([self.other.pk], week_ago)
+        Habit.objects.filter(pk=self.inactive.pk).update(is_active=True)
+        missed.generate_for_users([self.other.pk], self.yesterday)
+        # пропуски только за дни после включения, а не с начала привычки
+        self.assertEqual(self.missed(self.inactive), [week_ago + timedelta(days=d) for d in range(1, 8)])
+
+    def test_resume_from_checkpoint(self):
+        JobCheckpoint.objects.create(
+            name=missed.JOB_NAME, target_date=self.yesterday, last_user_id=self.other.pk - 1
+        )
+        users, _ = missed.run(self.yesterday, chunk_size=1)
+        self.assertEqual(users, 1)
+        self.assertTrue(self.missed(self.daily))
+        self.assertFalse(HabitLog.objects.filter(habit__user=self.user, is_done=False, date__lt=self.today - timedelta(days=10)).exists())
+        self.assertEqual(missed.run(self.yesterday), (0, 0))
+
+    def test_created_counts_only_inserted_rows(self):
+        # отметка за последний день второй недели пришла задним числом,
+        # пока задание уже собрало пропуски: эту строку INSERT пропускает
+        last_day = self.weekly.start_date + timedelta(days=13)
+        bulk_create = HabitLog.objects.bulk_create
+
+        def check_in_then_insert(logs, **kwargs):
+            HabitLog.objects.create(habit=self.weekly, date=last_day, is_done=True)
+            return bulk_create(logs, **kwargs)
+
+        before = HabitLog.objects.count()
+        with mock.patch.object(HabitLog.objects, 'bulk_create', side_effect=check_in_then_insert):
+            created = missed.generate_for_users([self.other.pk], self.yesterday)
+        self.assertEqual(created, HabitLog.objects.count() - before - 1)
+        self.assertEqual(created, 13)
+        self.assertTrue(HabitLog.objects.get(habit=self.weekly, date=last_day).is_done)
+
+    def test_progress_counts_missed_days(self):
+        HabitLog.objects.create(habit=self.daily, date=self.today - timedelta(days=3), is_done=True)
+        before = get_habit_progress(self.other, self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            missed.run(self.yesterday)
+        self.assertLess(get_habit_progress(self.other, self.today), before)
+
+
+class DatabaseTuningTests(TestCase):
+
+    def test_pragmas_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_replica_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Habit), 'default')
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Habit), 'replica')
+            self.assertEqual(router.db_for_write(Habit), 'default')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_read(Session), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'main'))
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_recent_writer_reads_primary(self):
+        cache.clear()
+        user = User.objects.create_user(username='writer', password='secret-pass-123')
+        self.client.force_login(user)
+        with mock.patch('main.mixins.read_from_replica', wraps=read_from_replica) as replica:
+            self.client.get(reverse('habit'))
+            self.assertEqual(replica.call_count, 1)
+            # после записи страницы читают основную базу, пока реплика может отставать
+            with self.captureOnCommitCallbacks(execute=True):
+                Habit.objects.create(title='Новая', user=user, start_date=timezone.now().date())
+            self.assertContains(self.client.get(reverse('habit')), 'Новая')
+            self.assertEqual(replica.call_count, 1)
+
+
+class TemplateRenderingTests(TrackerTestCase):
+
+    def test_cached_loader_in_all_environments(self):
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIsInstance(loader, CachedLoader)
+
+    def test_habit_cards_fragment_follows_user_version(self):
+        response = self.client.get(reverse('habit'))
+        self.assertContains(response, 'Частота: Каждый день')
+        self.assertContains(response, '<option value="Daily"', count=1)
+
+        habit = self.habits[0]
+        habit.title = 'Переименованная'
+        with self.captureOnCommitCallbacks(execute=True):
+            habit.save()
+        self.assertContains(self.client.get(reverse('habit')), 'Переименованная')
+
+    def test_fragments_not_shared_between_users(self):
+        other = User.objects.create_user(username='other', password='secret-pass-123')
+        Habit.objects.create(title='Чужая привычка', user=other, start_date=self.today)
+        # версии двух пользователей совпали
+        with mock.patch('main.cache._fresh_version', return_value=42):
+            for url in (reverse('habit'), reverse('home')):
+                self.client.force_login(self.user)
+                self.assertContains(self.client.get(url), 'Привычка 0')
+                self.client.force_login(other)
+                response = self.client.get(url)
+                self.assertContains(response, 'Чужая привычка')
+                self.assertNotContains(response, 'Привычка 0')
+
+    def test_task_labels(self):
+        task = Task.objects.filter(user=self.user).first()
+        task.status, task.priority = 'in_progress', 3
+        self.assertEqual((task.status_label, task.priority_label), ('В процессе', 'Высокий'))
+        task.status = 'Todo'
+        self.assertEqual(task.status_label, 'Todo')
+
+
+class AnalyticsTests(TrackerTestCase):
+
+    def test_weekly_report_in_one_query_per_section(self):
+        with CaptureQueriesContext(connection) as ctx:
+            report = analytics.build_report(self.user, 'week', self.today)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        habits = report['habits']
+        self.assertEqual(sum(row['planned'] for row in habits), 50)
+        self.assertEqual(sum(row['completed'] for row in habits), 25)
+        self.assertEqual(habits[-1]['period'], str(self.today - timedelta(days=self.today.weekday())))
+
+        tasks = report['tasks']
+        self.assertEqual([(row['priority'], row['created'], row['done'], row['share']) for row in tasks],
+                         [(1, 10, 0, 100.0)])
+
+    def test_window_values(self):
+        Task.objects.filter(user=self.user, title__in=['Задача 0', 'Задача 1']).update(status='done', priority=3)
+        rows = analytics.build_report(self.user, 'month', self.today)['tasks']
+        self.assertEqual([(row['priority'], row['share'], row['done_rate']) for row in rows],
+                         [(1, 80.0, 0.0), (3, 20.0, 100.0)])
+        self.assertEqual(rows[-1]['cumulative_done'], 2)
+
+    def test_api_cached_until_next_write(self):
+        url = reverse('analytics_api')
+        first = self.client.get(url, {'period': 'month'}).json()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url, {'period': 'month'}).json(), first)
+        self.assertFalse(any('main_task' in query['sql'] for query in ctx.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Новая', user=self.user, deadline=self.today, priority=2)
+        tasks = self.client.get(url, {'period': 'month'}).json()['tasks']
+        self.assertEqual(sum(row['created'] for row in tasks), 11)
+
+        self.assertEqual(self.client.get(url, {'period': 'year'}).status_code, 400)
+        self.assertContains(self.client.get(reverse('analytics')), 'Задачи по приоритетам')
+
+
+@override_settings(NOTIFICATION_BACKEND='main.notifications.LocmemBackend')
+class ReminderTests(TrackerTestCase):
+    """ В общих данных дедлайны задач: сегодня, завтра, ... через 9 дней """
+
+    def setUp(self):
+        super().setUp()
+        notifications.outbox.clear()
+
+    def test_sweep_enqueues_each_reminder_once(self):
+        Task.objects.filter(user=self.user, title='Задача 2').update(status='done')
+        result = reminders.sweep(self.today, lead_days=2, batch_size=1)
+        self.assertEqual((result['due'], result['overdue'], result['batches']), (2, 0, 2))
+        self.assertEqual(
+            sorted(Notification.objects.values_list('task__title', 'kind')),
+            [('Задача 0', 'task_due'), ('Задача 1', 'task_due')]
+        )
+        self.assertEqual(reminders.sweep(self.today, lead_days=2)['scanned'], 0)
+
+        # через два дня обе задачи просрочены, а о «Задаче 3» пора напомнить («Задача 2» сделана)
+        result = reminders.sweep(self.today + timedelta(days=2), lead_days=1)
+        self.assertEqual((result['due'], result['overdue']), (1, 2))
+        self.assertEqual(Notification.objects.filter(kind='task_overdue').count(), 2)
+
+    def test_new_deadline_resets_reminder(self):
+        reminders.sweep(self.today, lead_days=0)
+        task = Task.objects.get(user=self.user, title='Задача 0')
+        self.assertEqual(task.reminder_stage, Task.REMINDER_DUE)
+        task.deadline = self.today + timedelta(days=30)
+        task.save()
+        self.assertEqual(Task.objects.get(pk=task.pk).reminder_stage, Task.REMINDER_NONE)
+
+        # о новом дедлайне напоминание приходит заново, старое остаётся в истории
+        reminders.sweep(task.deadline, lead_days=0)
+        self.assertEqual(Task.objects.get(pk=task.pk).reminder_stage, Task.REMINDER_DUE)
+        self.assertEqual(
+            sorted(Notification.objects.filter(task=task).values_list('kind', 'deadline')),
+            [('task_due', self.today), ('task_due', task.deadline)]
+        )
+
+    def test_deliver_pending(self):
+        reminders.sweep(self.today, lead_days=1)
+        failing = mock.Mock(send_messages=mock.Mock(side_effect=OSError('нет сети')))
+        self.assertEqual(notifications.deliver_pending(failing), (0, 2))
+        self.assertEqual(Notification.objects.filter(attempts=1, last_error='нет сети').count(), 2)
+
+        output = StringIO()
+        sent = notifications.deliver_pending(notifications.ConsoleBackend(output), batch_size=1)
+        self.assertEqual(sent, (2, 0))
+        self.assertIn('Скоро дедлайн задачи «Задача 0»', output.getvalue())
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True).exists())
+
+    def test_command_and_near_deadlines(self):
+        output = StringIO()
+        call_command('send_reminders', date=self.today, stdout=output)
+        self.assertIn('Отправлено уведомлений: 2', output.getvalue())
+        self.assertEqual(len(notifications.outbox), 2)
+        # задачи с новым статусом по умолчанию считаются открытыми
+        self.assertEqual(len(get_near_deadlines(self.user)), 5)
+
+
+class HabitLogAdminTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', password='secret-pass-123'))
+        self.url = reverse('admin:main_habitlog_changelist')
+
+    def changelist_queries(self, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return [item['sql'] for item in queries.captured_queries]
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        queries = self.changelist_queries()
+        # больше логов у другого пользователя — столько же запросов
+        other = User.objects.create_user(username='other', password='secret-pass-123')
+        habit = Habit.objects.create(title='Чужая', user=other, start_date=self.today)
+        HabitLog.objects.bulk_create(
+            HabitLog(habit=habit, date=self.today - timedelta(days=i)) for i in range(40)
+        )
+        self.assertEqual(len(self.changelist_queries()), len(queries))
+        self.assertFalse([sql for sql in queries if 'DISTINCT' in sql])
+
+    def test_date_hierarchy_from_index_range(self):
+        response = self.client.get(self.url, {'date__year': self.today.year, 'date__month': self.today.month})
+        self.assertContains(response, f'date__day={self.today.day}')
+        queries = self.changelist_queries(f'?date__year={self.today.year}')
+        self.assertFalse([sql for sql in queries if 'DISTINCT' in sql])
+
+    def test_estimated_count(self):
+        with mock.patch.object(EstimatedCountPaginator, 'count_limit', 10):
+            paginator = EstimatedCountPaginator(HabitLog.objects.order_by('pk'), 20)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(paginator.count, HabitLog.objects.order_by('-pk').first().pk)
+            self.assertNotIn('COUNT', queries[0]['sql'])
+            # с фильтром — не дальше count_limit
+            self.assertEqual(EstimatedCountPaginator(HabitLog.objects.filter(is_done=True), 20).count, 10)
+        # небольшие таблицы считаются точно
+        self.assertEqual(EstimatedCountPaginator(HabitLog.objects.all(), 20).count, 50)
+
+
+class ArchiveTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.habit = Habit.objects.create(title='Старая', user=self.user, start_date=self.today - timedelta(days=700))
+        HabitLog.objects.bulk_create(
+            HabitLog(habit=self.habit, date=self.today - timedelta(days=days_ago), is_done=days_ago % 3 != 0)
+            for days_ago in range(0, 700, 2)
+        )
+        rebuild_daily_stats(user_ids=[self.user.pk])
+
+    def history(self):
+        habit = Habit.objects.get(pk=self.habit.pk)
+        stats = get_habit_stats([habit], today=self.today)[habit.pk]
+        heatmap = build_heatmap(habit, self.today - timedelta(days=699), self.today)
+        exported = sorted(
+            (row['date'], row['is_done']) for row in export_rows(self.user, ['logs']) if row['habit'] == habit.slug
+        )
+        daily = list(HabitDailyStat.objects.filter(user=self.user).order_by('date').values_list('date', 'total', 'done'))
+        return stats, heatmap, exported, daily
+
+    def test_archive_keeps_history(self):
+        before = self.history()
+        call_command('archive_habit_logs', stdout=StringIO())
+
+        cutoff = bitmaps.archive_cutoff(self.today)
+        self.assertFalse(HabitLog.objects.filter(date__lt=cutoff).exists())
+        self.assertEqual(Habit.objects.get(pk=self.habit.pk).archived_until, cutoff)
+        self.assertTrue(all(
+            len(done) == len(missed) == bitmaps.YEAR_BYTES
+            for done, missed in HabitYearBitmap.objects.values_list('done', 'missed')
+        ))
+        self.assertEqual(self.history(), before)
+        # пересборка статистики читает архив
+        rebuild_daily_stats(user_ids=[self.user.pk])
+        self.assertEqual(self.history(), before)
+
+    def test_write_into_archived_day(self):
+        call_command('archive_habit_logs', stdout=StringIO())
+        day = self.today - timedelta(days=500)
+        self.assertEqual(HabitDailyStat.objects.get(user=self.user, date=day).done, 1)
+
+        bulk_check_in(self.user, [{'habit': self.habit.slug, 'date': str(day), 'is_done': False}], self.today)
+        stat = HabitDailyStat.objects.get(user=self.user, date=day)
+        self.assertEqual((stat.total, stat.done), (1, 0))
+
+        # следующий прогон переносит и эту строку, отметка из неё побеждает
+        bitmaps.run(bitmaps.archive_cutoff(self.today), restart=True)
+        self.assertFalse(HabitLog.objects.filter(date=day).exists())
+        rebuild_daily_stats(user_ids=[self.user.pk])
+        stat = HabitDailyStat.objects.get(user=self.user, date=day)
+        self.assertEqual((stat.total, stat.done), (1, 0))
+
+    def test_log_written_during_archive_is_kept(self):
+        # отметка пришла, пока прогон уже прочитал строки: её не удаляем, не перенеся
+        day = self.today - timedelta(days=501)
+        save_many = bitmaps.HabitBitmap.save_many
+
+        def check_in_then_save(histories):
+            HabitLog.objects.create(habit=self.habit, date=day, is_done=True)
+            return save_many(histories)
+
+        with mock.patch.object(bitmaps.HabitBitmap, 'save_many', side_effect=check_in_then_save):
+            moved = bitmaps.archive_users([self.user.pk], bitmaps.archive_cutoff(self.today))
+        self.assertEqual(moved, len([d for d in range(0, 700, 2) if d > bitmaps.ARCHIVE_AFTER_DAYS]))
+        self.assertTrue(HabitLog.objects.filter(habit=self.habit, date=day).exists())
+
+        bitmaps.run(bitmaps.archive_cutoff(self.today), restart=True)
+        self.assertFalse(HabitLog.objects.filter(habit=self.habit, date=day).exists())
+        self.assertIn((day, True), [(row['date'], row['is_done']) for row in export_rows(self.user, ['logs'])])
+
+    def test_missed_logs_respect_archive(self):
+        habit = Habit.objects.create(title='Марафон', user=self.user, start_date=self.today - timedelta(days=499))
+        HabitLog.objects.bulk_create(
+            HabitLog(habit=habit, date=self.today - timedelta(days=days_ago)) for days_ago in range(500)
+        )
+        call_command('archive_habit_logs', stdout=StringIO())
+        before = get_habit_stats([Habit.objects.get(pk=habit.pk)], today=self.today)[habit.pk]
+        self.assertEqual(before.current_streak, 500)
+
+        # привычку снова включили: проверка пропусков начинается с начала истории
+        Habit.objects.filter(pk=habit.pk).update(missed_checked_until=None)
+        missed.generate_for_users([self.user.pk], self.today - timedelta(days=1))
+        self.assertFalse(HabitLog.objects.filter(habit=habit, is_done=False).exists())
+        after = get_habit_stats([Habit.objects.get(pk=habit.pk)], today=self.today)[habit.pk]
+        self.assertEqual(after, before)
+
+
+class BitmapStorageTests(TrackerTestCase):
+
+    def test_bitmap_api(self):
+        history = HabitBitmap(self.habits[0].pk)
+        new_year = timezone.datetime(2025, 1, 1).date()
+        for days in range(-3, 4):
+            history.set_day(new_year + timedelta(days=days))
+        history.set_day(new_year + timedelta(days=10), False)
+
+        self.assertIs(history.test_day(new_year), True)
+        self.assertIs(history.test_day(new_year + timedelta(days=10)), False)
+        self.assertIsNone(history.test_day(new_year + timedelta(days=5)))
+        self.assertEqual(history.count(new_year - timedelta(days=10), new_year + timedelta(days=10)), (8, 7))
+        # серия через границу года
+        self.assertEqual(history.streak(new_year + timedelta(days=3)), 7)
+        self.assertEqual(history.streak(new_year + timedelta(days=5)), 0)
+        history.set_day(new_year + timedelta(days=4))
+        self.assertEqual(history.longest_streak(), 8)
+        self.assertEqual(history.set_day(new_year, None), True)
+        self.assertEqual(history.longest_streak(), 4)
+
+    def habit_page(self, habit):
+        cache.clear()
+        context = self.client.get(reverse('habit_detail', kwargs={'slug': habit.slug})).context
+        logs = [(log.date, log.is_done) for log in context['logs']]
+        return logs, context['total_days'], context['done_days'], context['done_today'], context['stats']
+
+    def test_convert_keeps_history(self):
+        habit = self.habits[0]
+        before = self.habit_page(habit)
+        stats = list(HabitDailyStat.objects.values_list('date', 'total', 'done'))
+
+        call_command('habit_storage', 'bitmap', habits=[habit.pk], stdout=StringIO())
+        habit.refresh_from_db()
+        self.assertEqual(habit.storage_mode, 'bitmap')
+        self.assertFalse(HabitLog.objects.filter(habit=habit).exists())
+        self.assertEqual(self.habit_page(habit), before)
+        rebuild_daily_stats(user_ids=[self.user.pk])
+        self.assertEqual(list(HabitDailyStat.objects.values_list('date', 'total', 'done')), stats)
+
+        call_command('habit_storage', 'rows', habits=[habit.pk], stdout=StringIO())
+        self.assertEqual(HabitLog.objects.filter(habit=habit).count(), 10)
+        self.assertFalse(HabitYearBitmap.objects.filter(habit=habit).exists())
+
+    def test_mark_done_and_check_in(self):
+        habit = Habit.objects.create(title='Маска', user=self.user, start_date=self.today - timedelta(days=5))
+        self.assertEqual(bitmaps.convert_storage(habit, 'bitmap'), 0)
+
+        for _ in range(2):
+            self.client.post(reverse('habit_mark_done', kwargs={'slug': habit.slug}))
+        self.assertFalse(HabitLog.objects.filter(habit=habit).exists())
+        self.assertIs(HabitBitmap.load(habit.pk).test_day(self.today), True)
+        stat = HabitDailyStat.objects.get(user=self.user, date=self.today)
+        self.assertEqual((stat.total, stat.done), (6, 6))
+
+        day = str(self.today - timedelta(days=1))
+        results = bulk_check_in(self.user, [
+            {'habit': habit.slug, 'date': day, 'is_done': False},
+            {'habit': habit.slug, 'date': str(self.today)},
+        ], self.today)
+        self.assertEqual([result['status'] for result in results], ['created', 'exists'])
+        stat = HabitDailyStat.objects.get(user=self.user, date=self.today - timedelta(days=1))
+        self.assertEqual((stat.total, stat.done), (6, 0))
+
+        # маски читаются под блокировкой в той же транзакции, что и запись
+        depth = len(connection.atomic_blocks)
+        calls = []
+        load_many = HabitBitmap.load_many
+
+        def recording_load_many(*args, **kwargs):
+            calls.append((len(connection.atomic_blocks) > depth, kwargs.get('for_update')))
+            return load_many(*args, **kwargs)
+
+        with mock.patch.object(HabitBitmap, 'load_many', side_effect=recording_load_many):
+            bulk_check_in(self.user, [{'habit': habit.slug, 'date': day, 'is_done': True}], self.today)
+        self.assertEqual(calls, [(True, True)])
+        bulk_check_in(self.user, [{'habit': habit.slug, 'date': day, 'is_done': False}], self.today)
+
+        # пропуски проставляются битами, не строками
+        missed.generate_for_users([self.user.pk], self.today - timedelta(days=1))
+        self.assertFalse(HabitLog.objects.filter(habit=habit).exists())
+        history = HabitBitmap.load(habit.pk)
+        self.assertEqual(history.count(habit.start_date, self.today), (6, 1))
+
+
+class HabitListProgressTests(TrackerTestCase):
+
+    def detail(self, habit):
+        context = self.client.get(reverse('habit_detail', kwargs={'slug': habit.slug})).context
+        return context['done_today'], context['done_days'], context['total_days'], context['progress_percent']
+
+    def cards(self, url_name, page_size=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            if page_size:
+                with mock.patch('main.views.HabitsListView.paginate_by', page_size):
+                    response = self.client.get(reverse(url_name))
+            else:
+                response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        habits = response.context['habits']
+        return {
+            habit.pk: (habit.done_today, habit.period_done, habit.period_total, habit.progress_percent)
+            for habit in habits
+        }, len(ctx.captured_queries)
+
+    def test_matches_detail_page(self):
+        bitmaps.convert_storage(self.habits[1], 'bitmap')
+        self.habits[1].refresh_from_db()
+        for url_name in ('habit', 'home'):
+            cards, _ = self.cards(url_name)
+            for habit in self.habits:
+                cache.clear()
+                self.assertEqual(cards[habit.pk], self.detail(habit), (url_name, habit.pk))
+        self.assertEqual(cards[self.habits[0].pk], (True, 5, 10, 50))
+
+    def test_queries_do_not_grow_with_page(self):
+        _, small = self.cards('habit', page_size=2)
+        for i in range(30):
+            Habit.objects.create(title=f'Ещё {i}', user=self.user, start_date=self.today)
+        _, large = self.cards('habit', page_size=30)
+        self.assertEqual(small, large)
+
+
+class ApiTests(TrackerTestCase):
+
+    def walk(self, url, params):
+        rows = []
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            rows.extend(data['results'])
+            if not data['next']:
+                return rows
+            params = {**params, 'cursor': data['next']}
+
+    def test_pages_and_fields(self):
+        logs = self.walk(reverse('api_logs'), {'limit': 7})
+        expected = HabitLog.objects.filter(habit__user=self.user).order_by('habit_id', 'date')
+        self.assertEqual([row['id'] for row in logs], [log.pk for log in expected])
+        self.assertEqual(logs[0]['habit'], expected[0].habit.slug)
+
+        tasks = self.walk(reverse('api_tasks'), {'fields': 'title,deadline', 'limit': 3})
+        self.assertEqual(len(tasks), 10)
+        self.assertEqual(tasks[0], {'title': 'Задача 0', 'deadline': str(self.today)})
+
+        habit = self.habits[0]
+        done = self.walk(reverse('api_logs'), {'habit': habit.slug, 'since': str(self.today - timedelta(days=3))})
+        self.assertEqual(len(done), 4)
+
+    def test_not_modified_until_write(self):
+        url = reverse('api_habits')
+        response = self.client.get(url, {'active': 'true'})
+        etag = response['ETag']
+        with self.assertNumQueries(2):
+            # сессия и пользователь — к таблицам привычек запросов нет
+            cached = self.client.get(url, {'active': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.create(title='Новая', user=self.user, start_date=self.today)
+        response = self.client.get(url, {'active': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новая', [row['title'] for row in response.json()['results']])
+
+    def test_bad_requests(self):
+        for url, params in (
+            ('api_tasks', {'fields': 'title,password'}),
+            ('api_tasks', {'status': 'lost'}),
+            ('api_habits', {'limit': '0'}),
+            ('api_logs', {'since': '2026-13-01'}),
+            ('api_logs', {'cursor': 'мусор'}),
+        ):
+            self.assertEqual(self.client.get(reverse(url), params).status_code, 400, (url, params))
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_tasks')).status_code, 401)
+
+    def test_logs_include_bitmap_history(self):
+        old = Habit.objects.create(title='Старая', user=self.user, start_date=self.today - timedelta(days=600))
+        HabitLog.objects.bulk_create(
+            HabitLog(habit=old, date=self.today - timedelta(days=days_ago), is_done=days_ago % 3 != 0)
+            for days_ago in range(0, 600, 5)
+        )
+        expected = [
+            (slug, str(day), is_done)
+            for slug, day, is_done in HabitLog.objects.filter(habit__user=self.user).order_by(
+                'habit_id', 'date'
+            ).values_list('habit__slug', 'date', 'is_done')
+        ]
+        # одна привычка целиком в масках, у другой старая история в архиве
+        bitmaps.convert_storage(self.habits[1], 'bitmap')
+        bitmaps.run(bitmaps.archive_cutoff(self.today), restart=True)
+        self.assertTrue(HabitYearBitmap.objects.filter(habit=old).exists())
+
+        logs = self.walk(reverse('api_logs'), {'limit': 7})
+        self.assertEqual([(row['habit'], row['date'], row['is_done']) for row in logs], expected)
+        archived = len([days_ago for days_ago in range(0, 600, 5) if days_ago > bitmaps.ARCHIVE_AFTER_DAYS])
+        self.assertEqual(sum(row['id'] is None for row in logs), 10 + archived)
+
+        since = str(self.today - timedelta(days=3))
+        logs = self.walk(reverse('api_logs'), {'habit': self.habits[1].slug, 'since': since, 'fields': 'date'})
+        self.assertEqual(logs, [{'date': str(self.today - timedelta(days=d))} for d in range(3, -1, -1)])
@@ -0,0 +1,417 @@
+""" Импорт и экспорт задач, привычек и логов пользователя.
+
+    Форматы:
+        ndjson — по объекту JSON на строку, все типы в одном потоке:
+                 {"type": "habit", "title": "Бег", "slug": "бег", ...}
+                 {"type": "log", "habit": "бег", "date": "2026-01-01", "is_done": true}
+        csv    — один тип на файл, первая строка — заголовок из FIELDS
+
+    Логи ссылаются на привычку по slug: на привычку из того же файла
+    (она должна идти раньше своих логов) или на уже существующую.
+    Задача или привычка, slug которой уже есть у пользователя, не создаётся
+    заново, а обновляется из файла — повторная загрузка выгрузки ничего не
+    задваивает; пустые и отсутствующие поля при этом не меняются. Повтор slug
+    внутри файла дополняет первую запись. created_at задач выгружается для справки, при загрузке ставится
+    заново. CSV читается в кодировке UTF-8 """
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.utils.text import slugify
+
+from .bitmaps import archived_logs, HabitBitmap
+from .cache import bump_user_version
+from .models import Task, Habit, HabitLog
+from .rollups import rebuild_daily_stats
+from .search import index_objects
+from .slugs import SlugAllocator
+
+
+FORMATS = ('ndjson', 'csv')
+KINDS = ('tasks', 'habits', 'logs')
+# Тип записи в ndjson для каждого набора
+RECORD_TYPES = {'tasks': 'task', 'habits': 'habit', 'logs': 'log'}
+
+# Поля, которые выгружаются и принимаются при загрузке
+FIELDS = {
+    'tasks': ['title', 'slug', 'description', 'status', 'priority', 'deadline', 'created_at'],
+    'habits': ['title', 'slug', 'frequency', 'start_date', 'is_active'],
+    'logs': ['habit', 'date', 'is_done'],
+}
+
+# Поля, которые загрузка меняет у уже существующих объектов
+UPDATE_FIELDS = {
+    'tasks': ['title', 'description', 'status', 'priority', 'deadline', 'reminder_stage'],
+    'habits': ['title', 'frequency', 'start_date', 'is_active'],
+}
+
+# Сколько строк читает из базы один запрос выгрузки
+EXPORT_CHUNK_SIZE = 2000
+# Сколько объектов пишет один bulk_create при загрузке
+IMPORT_CHUNK_SIZE = 2000
+# Сколько ошибок в строках возвращаем (остальные только считаем)
+MAX_REPORTED_ERRORS = 100
+
+
+class TransferError(ValueError):
+    """ Файл нельзя загрузить целиком (неизвестный формат или тип, не UTF-8) """
+
+
+class TransferConflict(TransferError):
+    """ Параллельная загрузка заняла те же slug: ничего не записано, можно повторить """
+
+
+# ---------- Экспорт ----------
+
+def export_rows(user, kinds=KINDS):
+    """ Словари для выгрузки. Строки читаются из базы пачками через iterator(),
+        поэтому память не растёт с размером истории """
+    if 'tasks' in kinds:
+        queryset = Task.objects.filter(user=user).order_by('pk').values(*FIELDS['tasks'])
+        for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield {'type': 'task', **row}
+    if 'habits' in kinds:
+        queryset = Habit.objects.filter(user=user).order_by('pk').values(*FIELDS['habits'])
+        for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield {'type': 'habit', **row}
+    if 'logs' in kinds:
+        # сначала старая история из архива, затем логи из HabitLog
+        slugs = None
+        for habit_id, _, day, is_done in archived_logs(user_ids=[user.pk]):
+            if slugs is None:
+                slugs = dict(Habit.objects.filter(user=user).values_list('pk', 'slug'))
+            yield {'type': 'log', 'habit': slugs[habit_id], 'date': day, 'is_done': is_done}
+        queryset = HabitLog.objects.filter(habit__user=user).order_by('habit_id', 'date').values_list(
+            'habit__slug', 'date', 'is_done'
+        )
+        for slug, day, is_done in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield {'type': 'log', 'habit': slug, 'date': day, 'is_done': is_done}
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=_json_value) + '\n'
+
+
+def csv_lines(rows, kind):
+    """ Строки CSV по одной: csv.writer пишет в буфер, который сразу очищается """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS[kind], extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+def export_lines(user, file_format, kind=None):
+    if file_format == 'ndjson':
+        return ndjson_lines(export_rows(user, [kind] if kind else KINDS))
+    if file_format == 'csv':
+        if kind not in KINDS:
+            raise TransferError(f'Для CSV нужен тип данных: {", ".join(KINDS)}')
+        return csv_lines(export_rows(user, [kind]), kind)
+    raise TransferError(f'Неизвестный формат: {file_format}')
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+# ---------- Импорт ----------
+
+def read_records(stream, file_format, kind=None):
+    """ Записи из бинарного файла: (номер строки, словарь) """
+    if file_format == 'ndjson':
+        return _read_ndjson(stream)
+    if file_format == 'csv':
+        if kind not in KINDS:
+            raise TransferError(f'Для CSV нужен тип данных: {", ".join(KINDS)}')
+        return _read_csv(stream, RECORD_TYPES[kind])
+    raise TransferError(f'Неизвестный формат: {file_format}')
+
+
+def _read_ndjson(stream):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record
+
+
+def _read_csv(stream, record_type):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    # Текст декодируется по ходу чтения, поэтому ошибка кодировки всплывает
+    # посреди загрузки — транзакция импорта откатывается целиком
+    try:
+        # строка 1 — заголовок
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, {'type': record_type, **row}
+    except UnicodeDecodeError:
+        raise TransferError('Файл CSV должен быть в кодировке UTF-8')
+
+
+def _to_python(field, value):
+    """ to_python поля, но терпимее к тому, что пишут в CSV руками:
+        true/false в любом регистре и значения choices без учёта регистра """
+    if isinstance(field, models.BooleanField) and isinstance(value, str):
+        value = {'true': True, 'false': False, 'yes': True, 'no': False}.get(value.strip().lower(), value)
+    value = field.to_python(value)
+    if field.choices and isinstance(value, str):
+        for choice, _ in field.flatchoices:
+            if isinstance(choice, str) and choice.lower() == value.lower():
+                return choice
+    return value
+
+
+class Importer:
+    """ Загрузка записей пользователю пачками по IMPORT_CHUNK_SIZE.
+
+        Вместо save() на каждую строку: slug считаются заранее (SlugAllocator),
+        объекты пишутся bulk_create, а счётчики, поисковый индекс и версия
+        кэша обновляются один раз на пачку или на весь импорт """
+
+    def __init__(self, user):
+        self.user = user
+        self.counts = {kind: 0 for kind in KINDS}
+        self.updated = {'tasks': 0, 'habits': 0}
+        self.errors = []
+        self.error_count = 0
+        self.min_log_date = None
+        # Задачи и привычки пачки по slug из файла: повтор slug дополняет
+        # объект из первой записи, а не создаёт второй
+        self._tasks, self._habits, self._logs = {}, {}, []
+        self._task_slugs = SlugAllocator(Task, user.pk)
+        # slug -> (id, дедлайн, стадия напоминания): такие задачи обновляются
+        self._existing_tasks = {
+            slug: (pk, deadline, stage)
+            for slug, pk, deadline, stage in Task.objects.filter(user=user).values_list(
+                'slug', 'pk', 'deadline', 'reminder_stage'
+            )
+        }
+        self._habit_slugs = SlugAllocator(Habit, user.pk)
+        # slug из файла -> id привычки; существующие привычки подгружаем один раз
+        habits = list(Habit.objects.filter(user=user).values_list('slug', 'pk', 'start_date', 'storage_mode'))
+        self._habit_ids = {slug: pk for slug, pk, _, _ in habits}
+        # логи раньше начала привычки отклоняются, как в bulk_check_in
+        self._habit_starts = {pk: start_date for _, pk, start_date, _ in habits}
+        # привычки, история которых хранится в масках годов
+        self._bitmap_habits = {pk for _, pk, _, storage_mode in habits if storage_mode == 'bitmap'}
+
+    def run(self, records):
+        with transaction.atomic():
+            for line_number, record in records:
+                try:
+                    self.add(record)
+                except ValidationError as error:
+                    self.error(line_number, '; '.join(error.messages))
+            self.flush()
+            if self.min_log_date is not None:
+                rebuild_daily_stats(user_ids=[self.user.pk], since=self.min_log_date)
+            transaction.on_commit(lambda: bump_user_version(self.user.pk))
+        return self.summary()
+
+    def add(self, record):
+        if not isinstance(record, dict):
+            raise ValidationError('Строка не является объектом')
+        record_type = record.get('type')
+        if record_type == 'task':
+            self.add_task(record)
+        elif record_type == 'habit':
+            self.add_habit(record)
+        elif record_type == 'log':
+            self._logs.append(self.build_log(record))
+        else:
+            raise ValidationError(f'Неизвестный тип записи: {record_type}')
+
+        if max(len(self._tasks), len(self._habits), len(self._logs)) >= IMPORT_CHUNK_SIZE:
+            self.flush()
+
+    def add_task(self, record):
+        task = self.build(Task, record, FIELDS['tasks'], exclude={'created_at'})
+        source_slug = record.get('slug') or ''
+        if source_slug in self._tasks:
+            self.merge(self._tasks[source_slug], task)
+            return
+        if source_slug in self._existing_tasks:
+            task.pk, task._saved_deadline, task._saved_stage = self._existing_tasks[source_slug]
+            task.slug = source_slug
+        else:
+            preferred = source_slug if source_slug and slugify(source_slug, allow_unicode=True) == source_slug else None
+            self._task_slugs.allocate(task, preferred)
+        # у записи без slug ключ — выданный slug: с ним она ни с чем не совпадёт
+        self._tasks[source_slug or ('', task.slug)] = task
+
+    def add_habit(self, record):
+        habit = self.build(Habit, record, FIELDS['habits'])
+        source_slug = record.get('slug') or ''
+        if source_slug in self._habits:
+            self.merge(self._habits[source_slug], habit)
+            return
+        if source_slug in self._habit_ids:
+            # логи найдут её через _habit_ids, как любую существующую привычку
+            habit.pk = self._habit_ids[source_slug]
+            habit.slug = source_slug
+        else:
+            preferred = source_slug if source_slug and slugify(source_slug, allow_unicode=True) == source_slug else None
+            self._habit_slugs.allocate(habit, preferred)
+        # логи из файла ссылаются на slug из файла, даже если он был занят
+        self._habits[source_slug or habit.slug] = habit
+
+    @staticmethod
+    def merge(first, repeat):
+        """ Повтор slug в файле: заполненные поля повтора переписывают первую запись """
+        for name in repeat._supplied:
+            setattr(first, name, getattr(repeat, name))
+        first._supplied |= repeat._supplied
+
+    def build_log(self, record):
+        slug = record.get('habit') or ''
+        habit = self._habits.get(slug)
+        if habit is not None:
+            habit_id, start_date = habit.pk, habit.start_date
+        else:
+            habit_id = self._habit_ids.get(slug)
+            if habit_id is None:
+                raise ValidationError(f'Привычка не найдена: {slug}')
+            start_date = self._habit_starts[habit_id]
+        log = self.build(HabitLog, record, ['date', 'is_done'])
+        if log.date < start_date:
+            raise ValidationError('Дата раньше начала привычки')
+        log.habit_id = habit_id
+        # привычка из этой же пачки ещё без id — проставим при записи
+        log._pending_habit = habit if habit_id is None else None
+        if self.min_log_date is None or log.date < self.min_log_date:
+            self.min_log_date = log.date
+        return log
+
+    def build(self, model, record, fields, exclude=()):
+        """ Объект из строк или значений JSON: пустые поля получают значение
+            по умолчанию, заполненные проверяются как в форме. Имена
+            заполненных полей — в _supplied: только их меняет обновление """
+        values = {}
+        for name in fields:
+            if name in exclude or name == 'slug':
+                continue
+            value = record.get(name)
+            if value is None or value == '':
+                continue
+            values[name] = _to_python(model._meta.get_field(name), value)
+        for name in fields:
+            field = model._meta.get_field(name)
+            if name not in values and name not in exclude and not field.blank and not field.has_default():
+                raise ValidationError({name: 'Обязательное поле'})
+        instance = model(**values)
+        if isinstance(instance, (Task, Habit)):
+            instance.user = self.user
+        skip = [field.name for field in model._meta.fields if field.name not in values]
+        instance.full_clean(exclude=skip, validate_unique=False, validate_constraints=False)
+        instance._supplied = set(values)
+        return instance
+
+    def flush(self):
+        if self._tasks:
+            tasks = self.save_objects(Task, list(self._tasks.values()), 'tasks')
+            index_objects('task', tasks)
+            # следующая пачка с тем же slug обновит уже записанную задачу
+            saved = {task.pk: task for task in tasks}
+            for source_slug, task in self._tasks.items():
+                if isinstance(source_slug, str):
+                    self._existing_tasks[source_slug] = (task.pk, saved[task.pk].deadline, saved[task.pk].reminder_stage)
+            self._tasks = {}
+        if self._habits:
+            habits = self.save_objects(Habit, list(self._habits.values()), 'habits')
+            index_objects('habit', habits)
+            for source_slug, habit in self._habits.items():
+                self._habit_ids[source_slug] = habit.pk
+            self._habit_starts.update((habit.pk, habit.start_date) for habit in habits)
+            self._habits = {}
+        if self._logs:
+            # повтор дня в файле или уже существующий лог — побеждает последнее значение
+            logs = {}
+            for log in self._logs:
+                if log._pending_habit is not None:
+                    log.habit_id = log._pending_habit.pk
+                logs[(log.habit_id, log.date)] = log
+            # у привычек в режиме bitmap отметки пишутся в маски годов
+            bits = {key: log for key, log in logs.items() if log.habit_id in self._bitmap_habits}
+            if bits:
+                histories = HabitBitmap.load_many(
+                    {habit_id for habit_id, _ in bits}, {day.year for _, day in bits}, for_update=True
+                )
+                for (habit_id, day), log in bits.items():
+                    histories[habit_id].set_day(day, log.is_done)
+                    del logs[(habit_id, day)]
+                HabitBitmap.save_many(histories.values())
+            HabitLog.objects.bulk_create(
+                list(logs.values()),
+                batch_size=IMPORT_CHUNK_SIZE,
+                update_conflicts=True,
+                unique_fields=['habit', 'date'],
+                update_fields=['is_done'],
+            )
+            self.counts['logs'] += len(logs) + len(bits)
+            self._logs = []
+
+    def save_objects(self, model, objects, kind):
+        """ Новые объекты — bulk_create, найденные по slug — bulk_update
+            только тех полей, что были в файле. Возвращает объекты из базы """
+        existing = [obj for obj in objects if obj.pk is not None]
+        created = model.objects.bulk_create([obj for obj in objects if obj.pk is None], batch_size=IMPORT_CHUNK_SIZE)
+
+        # Пустое поле в файле — «не менять», а не значение по умолчанию:
+        # объекты с одинаковым набором полей обновляются одним bulk_update
+        groups = {}
+        for obj in existing:
+            fields = obj._supplied & set(UPDATE_FIELDS[kind])
+            if model is Task and 'deadline' in fields:
+                # bulk_update не шлёт pre_save: перенос дедлайна сбрасывает стадию здесь
+                changed = obj.deadline != obj._saved_deadline
+                obj.reminder_stage = Task.REMINDER_NONE if changed else obj._saved_stage
+                fields.add('reminder_stage')
+            groups.setdefault(frozenset(fields), []).append(obj)
+        for fields, group in groups.items():
+            if fields:
+                model.objects.bulk_update(group, sorted(fields), batch_size=IMPORT_CHUNK_SIZE)
+
+        self.counts[kind] += len(created)
+        self.updated[kind] += len(existing)
+        # у обновлённых в памяти значения по умолчанию вместо пропущенных полей
+        updated = list(model.objects.filter(pk__in=[obj.pk for obj in existing])) if existing else []
+        return created + updated
+
+    def error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'error': message})
+
+    def summary(self):
+        return {
+            'imported': self.counts,
+            'updated': self.updated,
+            'errors': self.errors,
+            'error_count': self.error_count,
+        }
+
+
+def import_records(user, records):
+    """ Загружает записи и возвращает сводку: сколько загружено, обновлено
+        и ошибки по строкам """
+    try:
+        return Importer(user).run(records)
+    except IntegrityError:
+        # slug заняты параллельной загрузкой после того, как мы их прочитали;
+        # транзакция откатилась целиком
+        raise TransferConflict('Данные изменились во время загрузки, повторите её')
@@ -1,5 +1,15 @@
+from django.conf import settings
 from django.urls import path
 from .views import *
+from .api import TaskApiView, HabitApiView, HabitLogApiView
+
+if settings.USE_ASYNC_VIEWS:
+    from .async_views import (
+        AsyncHomeListView as HomeListView,
+        AsyncTasksListView as TasksListView,
+        AsyncHabitsDetailView as HabitsDetailView,
+        AsyncHabitMarkDoneView as HabitMarkDoneView,
+    )
 
 
 urlpatterns = [
@@ -14,5 +24,15 @@ urlpatterns = [
     path('signup/', UserSignUpView.as_view(), name='signup'),
     path('task/<str:slug>/', TaskDetailView.as_view(), name='task_detail'),
     path('habit/<str:slug>/done/', HabitMarkDoneView.as_view(), name='habit_mark_done'),
+    path('api/check-ins/', HabitCheckInView.as_view(), name='habit_check_in'),
+    path('api/tasks/', TaskApiView.as_view(), name='api_tasks'),
+    path('api/habits/', HabitApiView.as_view(), name='api_habits'),
+    path('api/logs/', HabitLogApiView.as_view(), name='api_logs'),
+    path('export/', ExportView.as_view(), name='export'),
+    path('import/', ImportView.as_view(), name='import'),
+    path('habit/<str:slug>/heatmap/', HabitHeatmapView.as_view(), name='habit_heatmap'),
+    path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('api/analytics/', AnalyticsApiView.as_view(), name='analytics_api'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
 ]
\ No newline at end of file
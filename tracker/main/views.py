@@ -5,12 +5,31 @@ from django.contrib.auth.views import LoginView, LogoutView
 from django.views.generic import ListView, DetailView, CreateView
 from django.utils import timezone
 from datetime import timedelta
+import hmac
+import json
 from .mixins import *
+from .cache import cached_for_user, cache_stats
+from . import metrics
+from .dashboard import get_dashboard_context
+from .analytics import get_report, REPORT_PERIODS, REPORT_PERIOD_LABELS, DEFAULT_REPORT_PERIOD
+from .streaks import get_habit_stats
+from .progress import PERIOD_DAYS, fill_progress, with_progress
+from .search import SEARCH_RESULT_LIMIT
+from .checkins import bulk_check_in, mark_done, CheckInError, CREATED, UPDATED
+from .bitmaps import HabitBitmap
+from .transfer import export_lines, import_records, read_records, TransferConflict, TransferError
+from .heatmap import build_heatmap, default_period, get_heatmap_validators, HEATMAP_MAX_DAYS
 from django.contrib import messages
 from django.views import View
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
 
 
-class HomeListView(LoginRequiredMixin, ListView, TaskFilterMixin):
+class HomeListView(ReplicaReadMixin, LoginRequiredMixin, CursorPaginationMixin, ListView, TaskFilterMixin):
     """ Главная страница. Отображает:
                         активные задачи
                         ближайшие дедлайны
@@ -26,48 +45,18 @@ class HomeListView(LoginRequiredMixin, ListView, TaskFilterMixin):
         queryset = Task.objects.filter(user=self.request.user)
         return self.get_filtered_queryset(queryset)
 
-    def get_habit_progress(self, user):
-        week_ago = timezone.now().date() - timedelta(days=7)
-
-        total = HabitLog.objects.filter(
-            habit__user=user,
-            date__gte=week_ago
-        ).count()
-
-        done = HabitLog.objects.filter(
-            habit__user=user,
-            date__gte=week_ago,
-            is_done=True
-        ).count()
-
-        if total == 0:
-            return 0
-
-        return int(done / total * 100)
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
         context['title'] = 'Главная страница'
         # форма
         context['form'] = self.form_class(self.request.GET)
-        # активные привычки
-        context['habits'] = Habit.objects.filter(
-            user=user,
-            is_active=True
-        )
-        # ближайшие дедлайны (например 5)
-        context['near_deadlines'] = Task.objects.filter(
-            user=user,
-            status__in=['Todo', 'In_progress']
-        ).order_by('deadline')[:5]
-        # процент выполнения привычек за неделю
-        context['habit_progress'] = self.get_habit_progress(user)
+        # активные привычки, ближайшие дедлайны и процент выполнения за неделю
+        context.update(get_dashboard_context(self.request.user))
 
         return context
 
 
-class TasksListView(LoginRequiredMixin, ListView, TaskFilterMixin):
+class TasksListView(ReplicaReadMixin, LoginRequiredMixin, CursorPaginationMixin, ListView, TaskFilterMixin):
     """ Список задач. Функционал:
                     фильтр по статусу
                     сортировка по дедлайну / приоритету
@@ -88,10 +77,12 @@ class TasksListView(LoginRequiredMixin, ListView, TaskFilterMixin):
 
         context['form'] = self.form_class(self.request.GET)
         context['title'] = 'Задачи'
+        context['search_truncated'] = self.search_truncated
+        context['search_limit'] = SEARCH_RESULT_LIMIT
 
         return context
 
-class TaskDetailView(LoginRequiredMixin, DetailView):
+class TaskDetailView(ReplicaReadMixin, LoginRequiredMixin, DetailView):
     model = Task
     template_name = 'main/task_detail.html'
     context_object_name = 'task'
@@ -119,23 +110,43 @@ class TaskAddView(LoginRequiredMixin, CreateView):
         context['title'] = 'Добавление задачи'
         return context
 
-class HabitsListView(LoginRequiredMixin, ListView):
+class HabitsListView(ReplicaReadMixin, LoginRequiredMixin, CursorPaginationMixin, ListView):
     """ Список привычек с поиском и фильтрацией """
     model = Habit
     template_name = 'main/habits.html'
     context_object_name = 'habits'
     paginate_by = 7
     form_class = HabitFilterForm
+    search_truncated = False
 
     def get_queryset(self):
+        self.today = timezone.now().date()
+        # Отметка за сегодня и прогресс карточек — подзапросами в том же SELECT
+        return with_progress(self.get_filtered_queryset(self.form_class(self.request.GET)), self.today)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Кэшируем готовую страницу: ключ — фильтры вместе с курсором и день
+        page = cached_for_user(
+            self.request.user.pk, 'habits',
+            lambda: self.get_progress_page(queryset, page_size),
+            sorted(self.request.GET.lists()), self.today
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
+    def get_progress_page(self, queryset, page_size):
+        page = self.get_page(queryset, page_size)
+        fill_progress(page.object_list, self.today)
+        return page
+
+    def get_filtered_queryset(self, form):
         queryset = Habit.objects.filter(user=self.request.user)
 
-        form = self.form_class(self.request.GET)
         if form.is_valid():
             cd = form.cleaned_data
 
             if cd.get('search'):
-                queryset = queryset.filter(title__icontains=cd['search'])
+                queryset, self.search_truncated = search_queryset(queryset, 'habit', cd['search'], self.request.user.pk)
+                queryset = queryset.order_by('search_rank')
 
             if cd.get('active') == 'true':
                 queryset = queryset.filter(is_active=True)
@@ -150,7 +161,11 @@ class HabitsListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = self.form_class(self.request.GET)
+        context['frequency_choices'] = Habit.FREQUENCY_CHOICES
+        context['period_days'] = PERIOD_DAYS
         context['title'] = 'Привычки'
+        context['search_truncated'] = self.search_truncated
+        context['search_limit'] = SEARCH_RESULT_LIMIT
         return context
 
 class HabitsAddView(LoginRequiredMixin, CreateView):
@@ -171,7 +186,7 @@ class HabitsAddView(LoginRequiredMixin, CreateView):
         return context
 
 
-class HabitsDetailView(LoginRequiredMixin, DetailView):
+class HabitsDetailView(ReplicaReadMixin, LoginRequiredMixin, DetailView):
     """ Показ детальной страницы для привычки пользователя """
     model = Habit
     template_name = 'main/habit_detail.html'
@@ -187,37 +202,55 @@ class HabitsDetailView(LoginRequiredMixin, DetailView):
         # Текущая привычка, которую показывает DetailView.
         # И сохраняем в переменную, чтобы удобнее работать
         habit = self.object
+        today = timezone.now().date()
 
-        period_days = 30
-        start_date = timezone.now().date() - timedelta(days=period_days)
+        # История и прогресс кэшируются до следующего изменения данных пользователя
+        context.update(cached_for_user(
+            habit.user_id, 'habit_detail',
+            lambda: self.get_habit_history(habit, today),
+            habit.pk, today
+        ))
+        context['title'] = f'История привычки: {habit.title}'
 
-        # Логи привычки за период
-        logs = HabitLog.objects.filter(
-            habit=habit, # Берем логи только для текущей привычки.
-            date__gte=start_date
-        ).order_by('date')
+        return context
 
-        # Прогресс
-        total_days = logs.count() # Сколько всего дней есть логов за период.
-        done_days = logs.filter(is_done=True).count()
+    def get_habit_history(self, habit, today):
+        period_days = 30
+        start_date = today - timedelta(days=period_days)
+
+        if habit.storage_mode == 'bitmap':
+            # История в масках годов: один запрос вместо трёх запросов к логам
+            history = HabitBitmap.load(habit.pk, start_date, today)
+            logs = [HabitLog(habit=habit, date=day, is_done=is_done) for day, is_done in history.days(start_date, today)]
+            total_days, done_days = history.count(start_date, today)
+            done_today = history.test_day(today) is True
+        else:
+            # Логи привычки за период: не больше одной строки на день,
+            # по индексу (habit, date)
+            logs = list(HabitLog.objects.filter(
+                habit=habit, # Берем логи только для текущей привычки.
+                date__gte=start_date
+            ).order_by('date'))
+
+            # Прогресс и отметка за сегодня — по тем же строкам, что идут
+            # в историю на странице, без отдельных запросов
+            total_days = len(logs)
+            done_days = sum(log.is_done for log in logs)
+            done_today = any(log.date == today and log.is_done for log in logs)
         progress_percent = int(done_days / total_days * 100) if total_days else 0
 
-        # Проверяем, отмечена ли привычка сегодня
-        today = timezone.now().date()
-        done_today = HabitLog.objects.filter(habit=habit, date=today, is_done=True).exists()
+        # Серии и выполнение с учётом частоты привычки
+        stats = get_habit_stats([habit], today=today)[habit.pk]
 
-        # Передаем в шаблон
-        context.update({
-            'logs': logs,
+        return {
+            'stats': stats,
+            'logs': list(logs),
             'total_days': total_days,
             'done_days': done_days,
             'progress_percent': progress_percent,
             'period_days': period_days,
             'done_today': done_today,
-            'title': f'История привычки: {habit.title}'
-        })
-
-        return context
+        }
 
 # View:
 # Здесь View — это класс из Django, точнее базовый класс для всех классовых представлений (Class-Based Views):
@@ -230,14 +263,9 @@ class HabitMarkDoneView(LoginRequiredMixin, View):
         habit = get_object_or_404(Habit, slug=slug, user=request.user)
         today = timezone.now().date()
 
-        # Проверяем, есть ли лог за сегодня
-        # Проверяет, есть ли уже запись для этой привычки на сегодня.
-        # Если нет — создает новую с is_done=True
-        log, created = HabitLog.objects.get_or_create(
-            habit=habit,
-            date=today,
-            defaults={'is_done': True}
-        )
+        # Проверяет, есть ли уже отметка для этой привычки на сегодня.
+        # Если нет — создает новую с is_done=True (лог или бит в маске года)
+        created = mark_done(habit, today)
         if not created:
             messages.info(request, "Вы уже отметили эту привычку сегодня!")
         else:
@@ -246,6 +274,174 @@ class HabitMarkDoneView(LoginRequiredMixin, View):
         return redirect('habit_detail', slug=habit.slug)
 
 
+class HabitCheckInView(LoginRequiredMixin, View):
+    """ Пакетные отметки привычек одним запросом (синхронизация с телефона).
+        POST JSON: {"items": [{"habit": "slug", "date": "YYYY-MM-DD", "is_done": true}, ...]}
+        Ответ: результат по каждой отметке в том же порядке """
+    def post(self, request):
+        try:
+            payload = json.loads(request.body)
+            items = payload['items']
+        except (ValueError, TypeError, KeyError):
+            return HttpResponseBadRequest('Ожидается JSON вида {"items": [...]}')
+
+        try:
+            results = bulk_check_in(request.user, items, timezone.now().date())
+        except CheckInError as error:
+            return HttpResponseBadRequest(str(error))
+
+        return JsonResponse({
+            'results': results,
+            'created': sum(result['status'] == CREATED for result in results),
+            'updated': sum(result['status'] == UPDATED for result in results),
+        })
+
+
+class ExportView(LoginRequiredMixin, View):
+    """ Выгрузка данных пользователя потоком: ?format=ndjson|csv&kind=tasks|habits|logs
+        (для csv тип обязателен, для ndjson без типа выгружается всё) """
+    content_types = {
+        'ndjson': 'application/x-ndjson; charset=utf-8',
+        'csv': 'text/csv; charset=utf-8',
+    }
+
+    def get(self, request):
+        file_format = request.GET.get('format', 'ndjson')
+        kind = request.GET.get('kind') or None
+        try:
+            lines = export_lines(request.user, file_format, kind)
+        except TransferError as error:
+            return HttpResponseBadRequest(str(error))
+
+        response = StreamingHttpResponse(lines, content_type=self.content_types[file_format])
+        filename = f"tracker-{kind or 'all'}.{file_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ImportView(LoginRequiredMixin, View):
+    """ Загрузка файла (поле file) в формате ?format=ndjson|csv&kind=...
+        Ответ — сколько объектов загружено и ошибки по строкам """
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return HttpResponseBadRequest('Не передан файл')
+        try:
+            records = read_records(upload.file, request.GET.get('format', 'ndjson'), request.GET.get('kind'))
+            summary = import_records(request.user, records)
+        except TransferConflict as error:
+            return HttpResponse(str(error), status=409)
+        except TransferError as error:
+            return HttpResponseBadRequest(str(error))
+
+        return JsonResponse(summary)
+
+
+class AnalyticsView(ReplicaReadMixin, LoginRequiredMixin, View):
+    """ Отчёт по неделям или месяцам: выполнение привычек и задачи по приоритетам """
+    template_name = 'main/analytics.html'
+
+    def get(self, request):
+        period = request.GET.get('period')
+        if period not in REPORT_PERIODS:
+            period = DEFAULT_REPORT_PERIOD
+        report = get_report(request.user, period, timezone.now().date())
+        return render(request, self.template_name, {
+            'title': 'Аналитика',
+            'periods': REPORT_PERIOD_LABELS.items(),
+            **report,
+        })
+
+
+class AnalyticsApiView(ReplicaReadMixin, LoginRequiredMixin, View):
+    """ Тот же отчёт в JSON: ?period=week|month """
+    def get(self, request):
+        period = request.GET.get('period', DEFAULT_REPORT_PERIOD)
+        if period not in REPORT_PERIODS:
+            return HttpResponseBadRequest('Неверный период')
+        return JsonResponse(get_report(request.user, period, timezone.now().date()))
+
+
+class HabitHeatmapView(LoginRequiredMixin, View):
+    """ JSON с историей привычки для календаря-тепловой карты.
+        Период: ?start=YYYY-MM-DD&end=YYYY-MM-DD (по умолчанию последний год) """
+    def get(self, request, slug):
+        habit = get_object_or_404(Habit, slug=slug, user=request.user)
+
+        default_start, default_end = default_period(timezone.now().date())
+        try:
+            start = parse_date(request.GET.get('start', '')) or default_start
+            end = parse_date(request.GET.get('end', '')) or default_end
+        except ValueError:
+            return HttpResponseBadRequest('Неверная дата')
+        if start > end or (end - start).days >= HEATMAP_MAX_DAYS:
+            return HttpResponseBadRequest('Неверный период')
+
+        # Если у клиента актуальная версия — отвечаем 304 без сборки данных
+        etag, last_modified = get_heatmap_validators(habit, start, end)
+        last_modified_ts = last_modified.timestamp() if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+        if response is not None:
+            return response
+
+        response = JsonResponse(build_heatmap(habit, start, end))
+        response['ETag'] = etag
+        if last_modified_ts is not None:
+            response['Last-Modified'] = http_date(last_modified_ts)
+        return response
+
+
+class MetricsView(View):
+    """ Метрики процесса (кэш, время и запросы к БД по view) в формате Prometheus.
+        Доступны сотрудникам или по токену METRICS_TOKEN """
+    def get(self, request):
+        if not (request.user.is_staff or self.has_token(request)):
+            raise PermissionDenied
+
+        lines = [
+            '# HELP tracker_cache_requests_total Обращения к кэшу пользователя',
+            '# TYPE tracker_cache_requests_total counter',
+        ]
+        for name, counts in cache_stats().items():
+            for result in ('hits', 'misses'):
+                lines.append(
+                    f'tracker_cache_requests_total{{fragment="{name}",result="{result}"}} {counts[result]}'
+                )
+
+        # Время и запросы к БД по view за последние METRICS_WINDOW запросов
+        views = metrics.snapshot()
+        lines += [
+            '# HELP tracker_request_duration_ms Время ответа view (скользящее окно)',
+            '# TYPE tracker_request_duration_ms summary',
+        ]
+        for name, data in views.items():
+            for quantile, value in data['quantiles'].items():
+                lines.append(f'tracker_request_duration_ms{{view="{name}",quantile="{quantile}"}} {value:.3f}')
+            lines.append(f'tracker_request_duration_ms_count{{view="{name}"}} {data["count"]}')
+        lines += [
+            '# HELP tracker_request_queries_avg Среднее число SQL-запросов на запрос',
+            '# TYPE tracker_request_queries_avg gauge',
+        ]
+        lines += [f'tracker_request_queries_avg{{view="{name}"}} {data["avg_queries"]:.2f}' for name, data in views.items()]
+        lines += [
+            '# HELP tracker_request_db_ms_avg Среднее время в БД на запрос',
+            '# TYPE tracker_request_db_ms_avg gauge',
+        ]
+        lines += [f'tracker_request_db_ms_avg{{view="{name}"}} {data["avg_db_ms"]:.3f}' for name, data in views.items()]
+        lines += [
+            '# HELP tracker_query_budget_exceeded_total Запросы сверх бюджета SQL-запросов',
+            '# TYPE tracker_query_budget_exceeded_total counter',
+        ]
+        lines += [f'tracker_query_budget_exceeded_total{{view="{name}"}} {data["over_budget"]}' for name, data in views.items()]
+        return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4')
+
+    @staticmethod
+    def has_token(request):
+        token = settings.METRICS_TOKEN
+        scheme, _, value = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        return bool(token) and scheme == 'Bearer' and hmac.compare_digest(value.encode(), token.encode())
+
+
 
 class UserLoginView(LoginView):
     """ Вход пользователя в систему """
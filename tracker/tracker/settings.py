@@ -48,6 +48,7 @@ CAPTCHA_LENGTH = 5         # количество символов
 CAPTCHA_TIMEOUT = 5        # время жизни (в минутах)
 
 MIDDLEWARE = [
+    'main.metrics.RequestMetricsMiddleware', # Число запросов к БД и время по каждому view
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,13 +64,21 @@ ROOT_URLCONF = 'tracker.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR, 'templates'],
-        'APP_DIRS': True,
+        'DIRS': [BASE_DIR / 'templates'],
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main.context_processors.fragment_cache', # Версия пользователя для {% cache %}
+            ],
+            # Скомпилированные шаблоны хранятся в памяти процесса во всех окружениях,
+            # а не разбираются заново на каждый запрос
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -85,9 +94,42 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами; перед повторным использованием проверяется
+        'CONN_MAX_AGE': int(os.environ.get('TRACKER_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Транзакция сразу берёт блокировку на запись (BEGIN IMMEDIATE). Иначе
+            # get_or_create в HabitMarkDoneView начинает с чтения и при записи
+            # получает «database is locked», не дожидаясь busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# PRAGMA для каждого нового соединения SQLite (main/database.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',            # чтение не блокируется записью
+    'busy_timeout': 5000,             # мс ожидания блокировки вместо ошибки
+    'synchronous': 'NORMAL',          # в WAL достаточно, fsync только при checkpoint
+    'mmap_size': 256 * 1024 * 1024,   # чтение страниц через mmap
+    'cache_size': -20000,             # ~20 МБ кэша страниц на соединение
+    'temp_store': 'MEMORY',
+}
+
+# Необязательная реплика для чтения: путь к копии базы.
+# Списки и страницы просмотра (ReplicaReadMixin) читают из неё
+REPLICA_DB = os.environ.get('TRACKER_REPLICA')
+if REPLICA_DB:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': REPLICA_DB,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['main.database.ReplicaRouter']
+# Сколько секунд после записи пользователь читает из основной базы:
+# не меньше, чем отстаёт реплика
+REPLICA_MAX_LAG = int(os.environ.get('TRACKER_REPLICA_MAX_LAG', 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,9 +181,83 @@ INTERNAL_IPS = [ # Оптимизация сайта в дебаге
 ]
 
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': os.path.join( BASE_DIR, 'tracker_cache'),
+# Кэш выбирается переменной окружения TRACKER_CACHE:
+#   lru    — LRU в памяти процесса (по умолчанию)
+#   tiered — локальный LRU перед общим кэшем (Redis из REDIS_URL, иначе locmem-заглушка)
+#   file   — прежний файловый кэш в tracker_cache/
+CACHE_MODE = os.environ.get('TRACKER_CACHE', 'lru')
+
+LRU_CACHE = {
+    'BACKEND': 'main.cache_backends.LRUCache',
+    'LOCATION': 'tracker',
+    'OPTIONS': {
+        'MAX_ENTRIES': 10000,
+        'MAX_BYTES': 64 * 1024 * 1024,
+    },
+}
+
+if CACHE_MODE == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join( BASE_DIR, 'tracker_cache'),
+        }
     }
+elif CACHE_MODE == 'tiered':
+    CACHES = {
+        'default': {
+            'BACKEND': 'main.cache_backends.TieredCache',
+            'OPTIONS': {
+                'LOCAL': 'local',
+                'SHARED': 'shared',
+                'LOCAL_TIMEOUT': 5,
+            },
+        },
+        'local': LRU_CACHE,
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        } if os.environ.get('REDIS_URL') else {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tracker-shared',
+        },
+    }
+else:
+    CACHES = {
+        'default': LRU_CACHE,
+    }
+
+# Сколько секунд живут закэшированные страницы/фрагменты пользователя.
+# Инвалидация точная: при любом изменении данных версия пользователя растёт
+USER_CACHE_TIMEOUT = 300
+
+# Бюджет SQL-запросов на HTTP-запрос: при превышении — предупреждение в лог main.metrics.
+# QUERY_BUDGETS задаёт бюджет отдельным view по имени маршрута
+QUERY_BUDGET = 30
+QUERY_BUDGETS = {
+    'home': 10,
+    'task': 10,
+    'habit': 10,
+    'habit_detail': 10,
 }
+
+# /metrics/ отдаётся сотрудникам или по заголовку «Authorization: Bearer <токен>»
+# (для Prometheus). Без токена — только сотрудникам: за прокси на том же
+# хосте все запросы приходят с 127.0.0.1, поэтому IP не проверяется
+METRICS_TOKEN = os.environ.get('TRACKER_METRICS_TOKEN', '')
+
+# Async-версии главной, списка задач, привычки и отметки «Выполнено»
+# (main/async_views.py). Имеет смысл только при запуске через ASGI
+USE_ASYNC_VIEWS = os.environ.get('TRACKER_ASYNC_VIEWS') == '1'
+
+# Уведомления (main/notifications.py): куда доставляются записи из очереди Notification.
+#   main.notifications.ConsoleBackend — в stdout
+#   main.notifications.FileBackend    — JSON-строками в NOTIFICATIONS_FILE_PATH
+NOTIFICATION_BACKEND = os.environ.get('TRACKER_NOTIFICATION_BACKEND', 'main.notifications.ConsoleBackend')
+NOTIFICATIONS_FILE_PATH = BASE_DIR / 'notifications.log'
+# За сколько дней до дедлайна напоминать о задаче (manage.py send_reminders)
+REMINDER_LEAD_DAYS = 1
+# Логи привычек старше стольких дней manage.py archive_habit_logs переносит
+# в годовые битовые маски (main/bitmaps.py). Больше года: тепловая карта
+# по умолчанию и страницы привычек читают только горячую таблицу
+HABITLOG_ARCHIVE_AFTER_DAYS = 400